@@ -22,7 +22,7 @@ from matchnames import matchNames, groupObjects
 from node import Node
 from attribute import Attribute
 
-from transferobject import TransferObject
+from transferobject import TransferObject, setStatCache
 
 from selectionset import SelectionSet, saveSelectionSet
 from pose import Pose, savePose, loadPose
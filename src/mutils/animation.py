@@ -485,6 +485,14 @@ class Animation(mutils.Pose):
         mutils.Pose.read(self, path=path)
         logger.debug("Reading Done")
 
+    def readSummary(self, path=None):
+        """
+        Return the metadata, object count and namespaces from the pose.json.
+
+        :rtype: dict
+        """
+        return mutils.Pose.readSummary(self, path=self.poseJsonPath())
+
     def isAscii(self, s):
         """Check if the given string is a valid ascii string."""
         return all(ord(c) < 128 for c in s)
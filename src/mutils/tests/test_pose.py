@@ -136,6 +136,29 @@ class TestPose(test_base.TestBase):
         pose = mutils.Pose.fromPath(self.dstPath)
         self.assertEqual(pose.count(), len(self.srcObjects))
 
+    def test_read_summary(self):
+        """
+        Test reading the summary without parsing the objects.
+        """
+        self.open()
+        pose = mutils.Pose.fromObjects(self.srcObjects)
+        pose.save(self.dstPath)
+
+        metadata = mutils.Pose.readJsonMetadata(self.dstPath)
+        self.assertEqual(metadata["objectCount"], len(self.srcObjects))
+
+        pose = mutils.Pose.fromPath(self.dstPath)
+        summary = mutils.Pose.summaryFromPath(self.dstPath)
+
+        self.assertEqual(summary["objectCount"], pose.count())
+        self.assertEqual(sorted(summary["namespaces"]), sorted(pose.namespaces()))
+
+        # Older files are read in full
+        srcPath = self.dataPath("test_older_version.dict")
+        summary = mutils.Pose.summaryFromPath(srcPath)
+
+        self.assertEqual(summary["objectCount"], mutils.Pose.fromPath(srcPath).count())
+
 
 def testSuite():
     """
@@ -26,6 +26,7 @@ Example:
     t.read("/tmp/pose.json")
 """
 import os
+import re
 import abc
 import json
 import time
@@ -44,6 +45,27 @@ except Exception:
 
 logger = logging.getLogger(__name__)
 
+# Matches the start of a file that was saved with the metadata first
+_MetadataHeader = re.compile(r'\s*\{\s*"metadata"\s*:\s*')
+
+# An optional cache of os.stat results shared with the library, such as
+# studiolibrary.statCache(). The file times are read from disc when it
+# isn't set, so mutils can be used without studiolibrary.
+_statCache = None
+
+
+def setStatCache(cache):
+    """
+    Set the cache used for the modified and created times of the files.
+
+    The cache needs the mtime, ctime and invalidate methods.
+
+    :type cache: object or None
+    :rtype: None
+    """
+    global _statCache
+    _statCache = cache
+
 
 class TransferObject(object):
 
@@ -73,6 +95,49 @@ class TransferObject(object):
             t.add(obj)
         return t
 
+    @classmethod
+    def summaryFromPath(cls, path):
+        """
+        Return the metadata, object count and namespaces for the given path.
+
+        :type path: str
+        :rtype: dict
+        """
+        t = cls()
+        t.setPath(path)
+        return t.readSummary()
+
+    @staticmethod
+    def readJsonMetadata(path, chunkSize=65536):
+        """
+        Read only the metadata at the top of the given json path.
+
+        The objects are not parsed. Return None if the metadata is not
+        the first key in the file.
+
+        :type path: str
+        :type chunkSize: int
+        :rtype: dict or None
+        """
+        decoder = json.JSONDecoder()
+
+        with open(path, "r") as f:
+            text = f.read(chunkSize)
+
+            match = _MetadataHeader.match(text)
+            if not match:
+                return None
+
+            while True:
+                try:
+                    metadata, end = decoder.raw_decode(text, match.end())
+                    return metadata
+                except ValueError:
+                    chunk = f.read(chunkSize)
+                    if not chunk:
+                        return None
+                    text += chunk
+
     @staticmethod
     def readJson(path):
         """
@@ -179,6 +244,9 @@ class TransferObject(object):
         
         :rtype: float
         """
+        if _statCache is not None:
+            return _statCache.mtime(self.path())
+
         return os.path.getmtime(self.path())
 
     def ctime(self):
@@ -187,6 +255,9 @@ class TransferObject(object):
         
         :rtype: float
         """
+        if _statCache is not None:
+            return _statCache.ctime(self.path())
+
         return os.path.getctime(self.path())
 
     def data(self):
@@ -328,6 +399,39 @@ class TransferObject(object):
 
         self.setData(data)
 
+    def readSummary(self, path=""):
+        """
+        Return the metadata, object count and namespaces for the path.
+
+        Only the metadata at the top of the file is parsed when the
+        count and namespaces were saved with it. Older files are read
+        in full.
+
+        :type path: str
+        :rtype: dict
+        """
+        path = path or self.path()
+
+        metadata = None
+
+        if path.endswith(".json"):
+            metadata = self.readJsonMetadata(path)
+
+        if metadata and "objectCount" in metadata and "namespaces" in metadata:
+            return {
+                "metadata": metadata,
+                "objectCount": metadata["objectCount"],
+                "namespaces": metadata["namespaces"],
+            }
+
+        self.read(path)
+
+        return {
+            "metadata": self.metadata(),
+            "objectCount": self.count(),
+            "namespaces": list(self.namespaces()),
+        }
+
     @abc.abstractmethod
     def load(self, *args, **kwargs):
         pass
@@ -357,6 +461,10 @@ class TransferObject(object):
         self.setMetadata("mayaVersion", maya.cmds.about(v=True))
         self.setMetadata("mayaSceneFile", maya.cmds.file(q=True, sn=True))
 
+        # Used by readSummary to avoid parsing the objects
+        self.setMetadata("objectCount", self.count())
+        self.setMetadata("namespaces", list(self.namespaces()))
+
         # Move the metadata information to the top of the file
         metadata = {"metadata": self.metadata()}
         data = self.dump(metadata)[:-1] + ","
@@ -373,6 +481,9 @@ class TransferObject(object):
         with open(path, "w") as f:
             f.write(str(data))
 
+        if _statCache is not None:
+            _statCache.invalidate(path)
+
         logger.info("Saved pose: %s" % path)
 
     def dump(self, data=None):
@@ -115,6 +115,20 @@ def resource():
 import studioqt
 
 from studiolibrary.utils import *
+from studiolibrary.librarytrie import *
+from studiolibrary.librarystatcache import *
+from studiolibrary.librarystore import *
+from studiolibrary.librarysnapshot import *
+from studiolibrary.libraryindexfile import *
+from studiolibrary.librarywatcher import *
+from studiolibrary.libraryindex import *
+from studiolibrary.libraryfulltext import *
+from studiolibrary.libraryquery import *
+from studiolibrary.libraryqueryparser import *
+from studiolibrary.librarycolumns import *
+from studiolibrary.libraryrecord import *
+from studiolibrary.libraryprofile import *
+from studiolibrary.librarysearch import *
 from studiolibrary.library import Library
 from studiolibrary.libraryitem import LibraryItem
 from studiolibrary.librarywindow import LibraryWindow
@@ -0,0 +1,27 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Measure how the library operations scale with the size of the library.
+
+# Example:
+# RUN THE BENCHMARK FROM A SHELL
+python -m studiolibrary.benchmark.run --items 1000 10000 --output results.json
+
+# COMPARE WITH THE RESULTS FROM ANOTHER VERSION
+python -m studiolibrary.benchmark.run --items 10000 --compare results.json
+
+# RUN THE BENCHMARK FROM PYTHON
+import studiolibrary.benchmark
+studiolibrary.benchmark.run(itemCount=10000, output="results.json")
+"""
+from .generator import generateLibrary
+from .run import run, compareResults
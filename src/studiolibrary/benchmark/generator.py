@@ -0,0 +1,350 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Generate a synthetic library with the same layout as the NAS libraries.
+
+    <root>/global.user/<character>.lib/<category>/<item>
+    <root>/user/<name>.user/<character>.lib/<category>/[<folder>/]<item>
+
+Each item contains the same transfer files that are saved from Maya,
+such as "pose.json" for poses and "set.json" for selection sets. The
+library is generated from a seed so the same library can be generated
+again when comparing versions.
+
+Example:
+    from studiolibrary.benchmark import generator
+
+    generator.generateLibrary("/tmp/benchmark", itemCount=10000)
+"""
+import os
+import json
+import time
+import random
+import logging
+
+
+__all__ = [
+    "generateLibrary",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# The item extensions and how often they are used in a library
+ItemTypes = [
+    (".pose", 70),
+    (".anim", 20),
+    (".set", 7),
+    (".mirror", 3),
+]
+
+ItemExtensions = [extension for extension, weight in ItemTypes]
+
+Characters = [
+    "hero", "villain", "sidekick", "dog", "bird", "crowdMale", "crowdFemale",
+    "robot",
+]
+
+Categories = [
+    "faces", "hands", "body", "cycles", "fight", "props", "lipsync", "poses",
+]
+
+Folders = [
+    "wip", "approved", "seq010", "seq020", "seq030", "blocking", "old",
+]
+
+Words = [
+    "smile", "angry", "happy", "sad", "walk", "run", "jump", "idle", "fist",
+    "point", "relax", "grab", "look", "blink", "talk", "shout", "punch",
+    "kick", "fall", "sit", "stand", "wave", "turn", "climb",
+]
+
+Parts = [
+    "hand", "arm", "leg", "foot", "eye", "brow", "lip", "finger", "spine",
+    "head", "neck", "clavicle",
+]
+
+Attributes = [
+    "translateX", "translateY", "translateZ",
+    "rotateX", "rotateY", "rotateZ",
+]
+
+
+def controlNames(character, count):
+    """
+    Return the names of the rig controls for the given character.
+
+    :type character: str
+    :type count: int
+    :rtype: list[str]
+    """
+    names = []
+
+    for i in range(count):
+        side = ["L", "R", "C"][i % 3]
+        part = Parts[(i // 3) % len(Parts)]
+        names.append("{0}:{1}_{2}{3}_ctrl".format(character, side, part, i // 36))
+
+    return names
+
+
+def metadata(rng, user, description):
+    """
+    Return the metadata saved with each transfer file.
+
+    :type rng: random.Random
+    :type user: str
+    :type description: str
+    :rtype: dict
+    """
+    return {
+        "user": user,
+        "description": description,
+        "ctime": str(int(time.time()) - rng.randint(0, 30000000)),
+        "version": "1.0.0",
+        "mayaVersion": "2018",
+        "mayaSceneFile": "/nwave/projects/BENCH/seq010/sh0010/anim.ma",
+    }
+
+
+def poseData(rng, controls, user, description):
+    """
+    Return the contents of a "pose.json" file.
+
+    :type rng: random.Random
+    :type controls: list[str]
+    :type user: str
+    :type description: str
+    :rtype: dict
+    """
+    objects = {}
+
+    for name in controls:
+        attrs = {}
+        for attr in Attributes:
+            attrs[attr] = {
+                "type": "doubleLinear" if attr.startswith("t") else "doubleAngle",
+                "value": round(rng.uniform(-90, 90), 3),
+            }
+        objects[name] = {"attrs": attrs}
+
+    return {
+        "metadata": metadata(rng, user, description),
+        "objects": objects,
+    }
+
+
+def writeJson(path, data):
+    """
+    Write the given data to the given json file.
+
+    :type path: str
+    :type data: dict
+    :rtype: None
+    """
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def writeItem(path, extension, rng, controls, user):
+    """
+    Create the item directory and the transfer files for the item type.
+
+    :type path: str
+    :type extension: str
+    :type rng: random.Random
+    :type controls: list[str]
+    :type user: str
+    :rtype: None
+    """
+    os.makedirs(path)
+
+    description = " ".join(rng.sample(Words, 3))
+
+    if extension == ".pose":
+        data = poseData(rng, controls, user, description)
+        writeJson(os.path.join(path, "pose.json"), data)
+
+    elif extension == ".anim":
+        data = poseData(rng, controls, user, description)
+        data["metadata"]["startTime"] = 1
+        data["metadata"]["endTime"] = rng.randint(24, 240)
+        writeJson(os.path.join(path, "pose.json"), data)
+
+        with open(os.path.join(path, "animation.ma"), "w") as f:
+            f.write("//Maya ASCII 2018 scene\n")
+
+    elif extension == ".set":
+        data = {
+            "metadata": metadata(rng, user, description),
+            "objects": dict((name, {}) for name in controls),
+        }
+        writeJson(os.path.join(path, "set.json"), data)
+
+    elif extension == ".mirror":
+        data = {
+            "metadata": metadata(rng, user, description),
+            "left": "L_",
+            "right": "R_",
+            "objects": dict((name, {"mirrorAxis": [-1, 1, 1]}) for name in controls),
+        }
+        data["metadata"]["mirrorPlane"] = [-1, 1, 1]
+        writeJson(os.path.join(path, "mirrortable.json"), data)
+
+
+def generateFolders(path, rng, folderCount, userCount):
+    """
+    Return the folders for the items in the library layout.
+
+    Each folder is returned with the user that owns it.
+
+    :type path: str
+    :type rng: random.Random
+    :type folderCount: int
+    :type userCount: int
+    :rtype: list[(str, str, str)]
+    """
+    users = ["user{0:03d}".format(i) for i in range(userCount)]
+    folders = {}
+
+    # The number of unique folders that can be generated
+    maxCount = (userCount + 1) * len(Characters) * len(Categories) * (len(Folders) + 1)
+    folderCount = min(folderCount, maxCount)
+
+    while len(folders) < folderCount:
+
+        # A quarter of the items are saved by the supervisors
+        if rng.random() < 0.25:
+            user = "global"
+            dirname = os.path.join(path, "global.user")
+        else:
+            user = rng.choice(users)
+            dirname = os.path.join(path, "user", user + ".user")
+
+        character = rng.choice(Characters)
+
+        dirname = os.path.join(dirname, character + ".lib", rng.choice(Categories))
+
+        if rng.random() < 0.3:
+            dirname = os.path.join(dirname, rng.choice(Folders))
+
+        folders[dirname] = (dirname, user, character)
+
+    return sorted(folders.values())
+
+
+def generateLibrary(
+        path,
+        itemCount=1000,
+        userCount=20,
+        objectCount=30,
+        itemsPerFolder=40,
+        seed=0,
+):
+    """
+    Generate a library with the given number of items.
+
+    The path must not exist. Return the number of items and folders.
+
+    :type path: str
+    :type itemCount: int
+    :type userCount: int
+    :type objectCount: int
+    :type itemsPerFolder: int
+    :type seed: int
+    :rtype: dict
+    """
+    if os.path.exists(path):
+        raise IOError("The path already exists: {0}".format(path))
+
+    t = time.time()
+    rng = random.Random(seed)
+
+    folderCount = max(1, itemCount // itemsPerFolder)
+    folders = generateFolders(path, rng, folderCount, userCount)
+
+    controls = dict(
+        (character, controlNames(character, objectCount))
+        for character in Characters
+    )
+
+    types = []
+    for extension, weight in ItemTypes:
+        types.extend([extension] * weight)
+
+    for dirname, user, character in folders:
+        os.makedirs(dirname)
+
+    for i in range(itemCount):
+        dirname, user, character = rng.choice(folders)
+        extension = rng.choice(types)
+
+        name = "{0}_{1}_{2}{3}".format(
+            rng.choice(Words), rng.choice(Parts), i, extension
+        )
+
+        writeItem(
+            os.path.join(dirname, name),
+            extension,
+            rng,
+            controls[character],
+            user,
+        )
+
+    logger.info(
+        "Generated %s items in %s folders in %.2fs",
+        itemCount, len(folders), time.time() - t,
+    )
+
+    return {"items": itemCount, "folders": len(folders)}
+
+
+def testGenerateLibrary():
+    """
+    Test generating a small library.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = tempfile.mkdtemp()
+    path = os.path.join(root, "library")
+
+    try:
+        result = generateLibrary(path, itemCount=50, userCount=3, objectCount=3)
+        assert result == {"items": 50, "folders": 1}
+
+        items = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            for dirname in dirnames:
+                if os.path.splitext(dirname)[1] in ItemExtensions:
+                    items.append(os.path.join(dirpath, dirname))
+
+        assert len(items) == 50
+
+        # The same seed generates the same library
+        path2 = os.path.join(root, "library2")
+        generateLibrary(path2, itemCount=50, userCount=3, objectCount=3)
+        assert sorted(os.listdir(path)) == sorted(os.listdir(path2))
+
+    finally:
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testGenerateLibrary()
+
+
+if __name__ == "__main__":
+    runTests()
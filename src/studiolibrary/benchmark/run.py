@@ -0,0 +1,423 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Time the library operations on generated libraries of different sizes.
+
+The operations are run headless using the "offscreen" Qt platform and
+the results are written as json, so the results from different versions
+can be compared.
+
+# Example:
+# RUN THE BENCHMARK FROM A SHELL
+python -m studiolibrary.benchmark.run --items 1000 10000 100000 --output results.json
+
+# COMPARE WITH THE RESULTS FROM ANOTHER VERSION
+python -m studiolibrary.benchmark.run --items 10000 --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+
+# The offscreen platform has to be set before the application is created
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import studiolibrary
+import studiolibrary.widgets
+
+from studioqt import QtWidgets
+from studioqt.vendor import Qt
+
+from . import generator
+
+
+__all__ = [
+    "run",
+    "compareResults",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def registerItems():
+    """
+    Register the item classes for the generated items.
+
+    The Maya items are used when running in Maya. Otherwise a plain
+    LibraryItem is registered for each item type, so the library can be
+    synced without Maya.
+
+    :rtype: None
+    """
+    if studiolibrary.isMaya():
+        import studiolibrarymaya
+        studiolibrarymaya.registerItems()
+        return
+
+    for extension in generator.ItemExtensions:
+        name = extension[1:].title() + "BenchmarkItem"
+        cls = type(str(name), (studiolibrary.LibraryItem,), {"Extensions": [extension]})
+        studiolibrary.registerItem(cls)
+
+
+class Benchmark(object):
+
+    def __init__(self, path, itemCount, repeat=3):
+        """
+        :type path: str
+        :type itemCount: int
+        :type repeat: int
+        """
+        self._path = path
+        self._itemCount = itemCount
+        self._repeat = repeat
+        self._library = None
+        self._results = {}
+
+    def library(self):
+        """
+        Return the library being timed.
+
+        :rtype: studiolibrary.Library
+        """
+        return self._library
+
+    def results(self):
+        """
+        Return the timings for each operation.
+
+        :rtype: dict
+        """
+        return self._results
+
+    def time(self, name, func, setup=None):
+        """
+        Time the given function and return the result of the last run.
+
+        The setup function is called before each run and isn't timed.
+
+        :type name: str
+        :type func: func
+        :type setup: func or None
+        :rtype: object
+        """
+        times = []
+        result = None
+
+        for i in range(self._repeat):
+            if setup:
+                setup()
+
+            start = time.time()
+            result = func()
+            times.append(time.time() - start)
+
+        count = None
+        if isinstance(result, list):
+            count = len(result)
+
+        self._results[name] = {
+            "min": min(times),
+            "mean": sum(times) / len(times),
+            "times": times,
+            "count": count,
+        }
+
+        logger.info("%s: %.4fs", name, min(times))
+
+        return result
+
+    def createLibrary(self):
+        """
+        Create a new library with an empty database.
+
+        :rtype: None
+        """
+        path = os.path.join(self._path, ".studiolibrary")
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+        self._library = studiolibrary.Library(self._path)
+
+    def clearRecords(self):
+        """
+        Force the records and the cached counts to be created again.
+
+        :rtype: None
+        """
+        self._library.setDirty(True)
+        self._library.createRecords()
+
+    def run(self):
+        """
+        Time all the library operations.
+
+        :rtype: dict
+        """
+        self.time(
+            "sync",
+            lambda: self._library.sync(incremental=False),
+            setup=self.createLibrary,
+        )
+
+        library = self._library
+
+        self.time("syncIncremental", library.sync)
+
+        self.time(
+            "createRecords",
+            library.createRecords,
+            setup=lambda: library.setDirty(True),
+        )
+
+        items = self.time("createItems", library.createItems)
+
+        self.time(
+            "findItemsText",
+            lambda: library.findItems([{"filters": [("*", "contains", "smile")]}]),
+        )
+
+        folder = studiolibrary.normPath(os.path.join(self._path, "global.user"))
+
+        queries = [{
+            "operator": "or",
+            "filters": [
+                ("folder", "startswith", folder + "/"),
+                ("folder", "is", folder),
+            ]
+        }]
+
+        self.time("findItemsFolder", lambda: library.findItems(queries))
+
+        def search():
+            library.addQuery({"name": "text", "filters": [("*", "contains", "hand")]})
+            library.addQuery(dict(queries[0], name="sidebar"))
+            library.setSortBy(["category", "name"])
+            library.setGroupBy(["type"])
+            library.search()
+            return library.results()
+
+        self.time("search", search)
+
+        self.time(
+            "sorted",
+            lambda: studiolibrary.Library.sorted(items, ["category", "name:dsc"]),
+        )
+
+        self.time(
+            "groupItems",
+            lambda: studiolibrary.Library.groupItems(items, ["category"]),
+        )
+
+        self.time("distinct", lambda: library.distinct("type"), setup=self.clearRecords)
+
+        sidebar = studiolibrary.widgets.SidebarWidget()
+        sidebar.setDataset(library)
+
+        self.time("sidebarFilteredData", sidebar._filteredData)
+
+        return self._results
+
+
+def run(
+        path=None,
+        itemCount=1000,
+        repeat=3,
+        output=None,
+        keep=False,
+        seed=0,
+):
+    """
+    Generate a library with the given number of items and time it.
+
+    A temporary library is generated when no path is given. An existing
+    library is reused, so large libraries only have to be generated once.
+
+    :type path: str or None
+    :type itemCount: int
+    :type repeat: int
+    :type output: str or None
+    :type keep: bool
+    :type seed: int
+    :rtype: dict
+    """
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+
+    registerItems()
+
+    tempDir = None
+    if not path:
+        tempDir = tempfile.mkdtemp(prefix="studiolibrary_benchmark_")
+        path = os.path.join(tempDir, "library")
+
+    try:
+        generateTime = None
+
+        if not os.path.exists(path):
+            start = time.time()
+            generator.generateLibrary(path, itemCount=itemCount, seed=seed)
+            generateTime = time.time() - start
+
+        benchmark = Benchmark(path, itemCount, repeat=repeat)
+
+        results = {
+            "version": studiolibrary.version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt": Qt.__binding__,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "itemCount": itemCount,
+            "repeat": repeat,
+            "seed": seed,
+            "generateTime": generateTime,
+            "config": dict(
+                (key, studiolibrary.config().get(key))
+                for key in ["databaseBackend", "searchIndex", "asyncSearch"]
+            ),
+            "operations": benchmark.run(),
+        }
+
+    finally:
+        if tempDir and not keep:
+            shutil.rmtree(tempDir)
+
+    if output:
+        writeResults(output, results)
+
+    return results
+
+
+def writeResults(path, results):
+    """
+    Add the given results to the given json file.
+
+    The file contains a list of results so several library sizes can be
+    written to the same file.
+
+    :type path: str
+    :type results: dict
+    :rtype: None
+    """
+    data = []
+
+    if os.path.exists(path):
+        data = readResults(path)
+
+    data.append(results)
+
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def readResults(path):
+    """
+    Return the results in the given json file.
+
+    :type path: str
+    :rtype: list[dict]
+    """
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compareResults(previous, results):
+    """
+    Return the speed up of each operation compared to the previous results.
+
+    The results are compared by the number of items. A value larger than
+    1 means the operation is faster than before.
+
+    :type previous: list[dict]
+    :type results: list[dict]
+    :rtype: list[dict]
+    """
+    previous = dict((r["itemCount"], r) for r in previous)
+    rows = []
+
+    for result in results:
+        previous_ = previous.get(result["itemCount"])
+        if not previous_:
+            continue
+
+        for name, timing in sorted(result["operations"].items()):
+            timing_ = previous_["operations"].get(name)
+            if not timing_:
+                continue
+
+            rows.append({
+                "itemCount": result["itemCount"],
+                "operation": name,
+                "previous": timing_["min"],
+                "current": timing["min"],
+                "speedup": timing_["min"] / max(timing["min"], 1e-9),
+            })
+
+    return rows
+
+
+def main(args=None):
+    """
+    Run the benchmark from the command line.
+
+    :type args: list[str] or None
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--items", type=int, nargs="+", default=[1000],
+                        help="The number of items in each generated library")
+    parser.add_argument("--path",
+                        help="The directory for the generated libraries")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="The number of times each operation is run")
+    parser.add_argument("--output",
+                        help="The json file to add the results to")
+    parser.add_argument("--compare",
+                        help="A json file with results from another version")
+    parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    results = []
+
+    for itemCount in args.items:
+        path = None
+        if args.path:
+            path = os.path.join(args.path, "library{0}".format(itemCount))
+
+        result = run(
+            path=path,
+            itemCount=itemCount,
+            repeat=args.repeat,
+            output=args.output,
+            keep=bool(args.path),
+            seed=args.seed,
+        )
+        results.append(result)
+
+    if args.compare:
+        rows = compareResults(readResults(args.compare), results)
+
+        for row in rows:
+            print("{itemCount:>8} {operation:<20} {previous:>9.4f}s "
+                  "{current:>9.4f}s {speedup:>6.2f}x".format(**row))
+
+
+if __name__ == "__main__":
+    main()
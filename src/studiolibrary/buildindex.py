@@ -0,0 +1,130 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Sync a library without any widgets and write the prebuilt index.
+
+The job keeps its own database and snapshot in the library, so each run
+only lists the directories that have changed since the last run. The
+sessions using the "indexed" backend then read the index instead of
+walking the library.
+
+The Maya items are only indexed when the job is run with mayapy.
+
+# Example:
+# BUILD THE INDEX FROM A SHELL
+mayapy -m studiolibrary.buildindex /library
+
+# BUILD THE INDEX FROM PYTHON
+import studiolibrary.buildindex
+studiolibrary.buildindex.buildIndex("/library")
+"""
+import os
+import time
+import logging
+import argparse
+
+# The offscreen platform has to be set before the application is created
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import studiolibrary
+
+
+__all__ = [
+    "buildIndex",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def registerItems():
+    """
+    Register the Maya items when running in mayapy.
+
+    :rtype: bool
+    """
+    try:
+        import maya.standalone
+        maya.standalone.initialize()
+    except ImportError:
+        logger.warning("Cannot find Maya, so only the folders will be indexed")
+        return False
+
+    import studiolibrarymaya
+    studiolibrarymaya.registerItems()
+
+    return True
+
+
+def buildIndex(path, backend=None, incremental=True):
+    """
+    Sync the library at the given path and write the prebuilt index.
+
+    The given backend is used for the database of the job. It cannot be
+    the "indexed" backend, since the job writes the index.
+
+    :type path: str
+    :type backend: str or None
+    :type incremental: bool
+    :rtype: int
+    """
+    start = time.time()
+
+    library = studiolibrary.Library(studiolibrary.normPath(path))
+
+    if backend:
+        library.setDatabaseBackend(backend)
+
+    elif library.databaseBackend() == studiolibrary.IndexedLibraryStore.Name:
+        library.setDatabaseBackend("journal")
+
+    if library.databaseBackend() == studiolibrary.IndexedLibraryStore.Name:
+        raise ValueError("The index cannot be built with the indexed backend")
+
+    library.sync(incremental=incremental)
+
+    count = studiolibrary.writeIndexFile(
+        library.databasePath(studiolibrary.IndexedLibraryStore.Name),
+        library.store().readAll(),
+        library.snapshot().entries(),
+    )
+
+    logger.info("Built the index in %.2fs", time.time() - start)
+
+    return count
+
+
+def main(args=None):
+    """
+    Build the index from the command line.
+
+    :type args: list[str] or None
+    :rtype: None
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("path",
+                        help="The root path of the library")
+    parser.add_argument("--backend",
+                        help="The database backend used by the job")
+    parser.add_argument("--full", action="store_true",
+                        help="Walk the whole library instead of an incremental sync")
+
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    registerItems()
+
+    buildIndex(args.path, backend=args.backend, incremental=not args.full)
+
+
+if __name__ == "__main__":
+    main()
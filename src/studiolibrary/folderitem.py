@@ -23,6 +23,7 @@ class FolderItem(studiolibrary.LibraryItem):
 
     RegisterOrder = 100
     EnableNestedItems = True
+    MatchDirectories = True
 
     MenuName = "Folder"
     MenuOrder = 1
@@ -31,28 +32,21 @@ class FolderItem(studiolibrary.LibraryItem):
     DefaultThumbnailPath = studiolibrary.resource().get("icons/folder_item.png")
     TrashIconPath = studiolibrary.resource().get("icons", "delete_96.png")
 
-    @classmethod
-    def match(cls, path):
-        """
-        Return True if the given path is supported by the item.
-
-        :type path: str 
-        :rtype: bool 
-        """
-        if os.path.isdir(path):
-            return True
-
     def info(self):
         """
         Get the info to display to user.
         
         :rtype: list[dict]
         """
-        created = os.stat(self.path()).st_ctime
-        created = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M %p")
+        stat = studiolibrary.statCache().stat(self.path())
+
+        created = ""
+        modified = ""
 
-        modified = os.stat(self.path()).st_mtime
-        modified = datetime.fromtimestamp(modified).strftime("%Y-%m-%d %H:%M %p")
+        # The folder can be removed by another session
+        if stat is not None:
+            created = datetime.fromtimestamp(stat.st_ctime).strftime("%Y-%m-%d %H:%M %p")
+            modified = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M %p")
 
         return [
             {
@@ -38,24 +38,14 @@ class FolderLibraryItem(studiolibrary.LibraryItem):
     RegisterOrder = 95
     EnableNestedItems = True
 
+    Extensions = [".lib"]
+
     MenuName = "Library"
     MenuOrder = 1
     MenuIconPath = studiolibrary.resource().get("icons/library.png")
     PreviewWidgetClass = studiolibrary.widgets.PreviewWidget
     DefaultThumbnailPath = studiolibrary.resource().get("icons/library_item.png")
 
-    @classmethod
-    def match(cls, path):
-        """
-        Return True if the given path is supported by the item.
-
-        :type path: str 
-        :rtype: bool 
-        """
-        if path.endswith(".lib"):
-            return True
-        return False
-
     def info(self):
         """
         Get the info to display to user.
@@ -15,24 +15,14 @@ class FolderUserItem(studiolibrary.LibraryItem):
     RegisterOrder = 90
     EnableNestedItems = True
 
+    Extensions = [".user"]
+
     MenuName = "User"
     MenuOrder = 1
     MenuIconPath = studiolibrary.resource().get("icons/user.png")
     PreviewWidgetClass = studiolibrary.widgets.PreviewWidget
     DefaultThumbnailPath = studiolibrary.resource().get("icons/user_item.png")
 
-    @classmethod
-    def match(cls, path):
-        """
-        Return True if the given path is supported by the item.
-
-        :type path: str 
-        :rtype: bool 
-        """
-        if path.endswith(".user"):
-            return True
-        return False
-
     def info(self):
         """
         Get the info to display to user.
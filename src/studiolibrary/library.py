@@ -13,6 +13,7 @@
 import os
 import copy
 import time
+import weakref
 import logging
 import collections
 
@@ -47,6 +48,7 @@ class Library(QtCore.QObject):
         "type",
         "folder",
         "category",
+        "score",
         "Custom Order",  # legacy case
         # "modified"
     ]
@@ -57,7 +59,26 @@ class Library(QtCore.QObject):
         # "modified",
     ]
 
+    # The number of facet counts to cache before the cache is cleared
+    MaxFacetCacheSize = 100
+
+    # The number of changes kept for the views that apply the changes later
+    MaxChanges = 100
+
+    # The number of changed paths that are matched without a full search
+    MaxSearchChanges = 1000
+
+    # The sidebar queries used for choosing which shards to load
+    ShardQueryNames = ["FolderFilterLibrary", "FolderFilterUser"]
+
+    # The whole data has changed, such as after a full sync
     dataChanged = QtCore.Signal()
+
+    # The paths that have been added, removed or changed in the database
+    itemsAdded = QtCore.Signal(object)
+    itemsRemoved = QtCore.Signal(object)
+    itemsChanged = QtCore.Signal(object)
+
     searchStarted = QtCore.Signal()
     searchFinished = QtCore.Signal()
     searchTimeFinished = QtCore.Signal()
@@ -68,16 +89,41 @@ class Library(QtCore.QObject):
 
         self._path = path
         self._mtime = None
+        self._store = None
+        self._databaseBackend = None
+        self._snapshot = None
+        self._index = None
+        self._fullText = None
+        self._watcher = None
+        self._dataVersion = 0
+        self._changes = collections.deque(maxlen=self.MaxChanges)
         self._data = {}
-        self._items = []
+        self._records = []
+        self._recordsData = None
+        self._recordPositions = {}
+        self._scores = {}
+        self._itemCache = weakref.WeakValueDictionary()
+        self._columns = studiolibrary.LibraryColumns()
+        self._facetCache = {}
         self._fields = []
         self._sortBy = []
         self._groupBy = []
         self._results = []
+        self._resultRecords = []
+        self._lastSearch = None
         self._queries = {}
         self._globalQueries = {}
         self._groupedResults = {}
         self._searchTime = 0
+        self._searchQueueTime = 0
+        self._searchComputeTime = 0
+        self._searchRequestTime = None
+        self._searchWorkers = {}
+        self._searchProfile = studiolibrary.NullSearchProfile()
+        self._searchProfileEnabled = studiolibrary.config().get('searchProfile', False)
+        self._lastSearchProfile = None
+        self._currentSearch = None
+        self._currentSearchState = None
         self._searchEnabled = True
         self._libraryWindow = libraryWindow
 
@@ -85,6 +131,13 @@ class Library(QtCore.QObject):
         self._zefir_all_users = zefir_allusers()
         self._activeCharacter = ""
 
+        self._searchTimer = QtCore.QTimer(self)
+        self._searchTimer.setSingleShot(True)
+        self._searchTimer.timeout.connect(self._startScheduledSearch)
+
+        self._searchThreadPool = QtCore.QThreadPool(self)
+        self._searchThreadPool.setMaxThreadCount(1)
+
         self.setPath(path)
         self.setDirty(True)
 
@@ -258,17 +311,214 @@ class Library(QtCore.QObject):
 
         :type path: str
         """
+        watching = self.isWatchEnabled()
+
+        if watching:
+            self.setWatchEnabled(False)
+
         self._path = path
+        self._store = None
+        self._snapshot = None
+        self._index = None
+        self._fullText = None
+
+        self.addChange(reset=True)
+
+        if watching and path:
+            self.setWatchEnabled(True)
+
+    def databaseBackend(self):
+        """
+        Return the name of the backend used for storing the database.
+
+        :rtype: str
+        """
+        return self._databaseBackend or studiolibrary.config().get('databaseBackend', 'json')
+
+    def setDatabaseBackend(self, backend):
+        """
+        Set the backend used for storing the database.
+
+        The backend in the config is used when the backend is None.
+
+        :type backend: str or None
+        :rtype: None
+        """
+        self._databaseBackend = backend
+        self._store = None
+        self._snapshot = None
+        self.setDirty(True)
 
-    def databasePath(self):
+    def databasePath(self, backend=None):
         """
         Return the path to the database.
         
+        :type backend: str or None
         :rtype: str 
         """
-        formatString = studiolibrary.config().get('databasePath')
+        backend = backend or self.databaseBackend()
+        cls = studiolibrary.librarystore.storeClass(backend)
+
+        formatString = studiolibrary.config().get(cls.PathConfigKey)
+        return studiolibrary.formatPath(formatString, path=self.path())
+
+    def store(self):
+        """
+        Return the storage backend for the database.
+
+        The sqlite backend imports the legacy json database the first
+        time it is used.
+
+        :rtype: studiolibrary.LibraryStore
+        """
+        if not self._store:
+            backend = self.databaseBackend()
+
+            self._store = studiolibrary.createStore(
+                backend,
+                self.databasePath(backend),
+                root=self.path(),
+            )
+
+            if isinstance(self._store, studiolibrary.ShardedLibraryStore):
+                self._store.setLoadedShards(self.matchShards(self._store))
+
+            path = self.databasePath("json")
+
+            if path != self._store.path() and self._store.isEmpty():
+                if os.path.exists(path):
+                    self._store.importJson(path)
+
+        return self._store
+
+    def matchShards(self, store):
+        """
+        Return the shards that match the library and user folder filters.
+
+        Return None when all the shards should be loaded.
+
+        :type store: studiolibrary.ShardedLibraryStore
+        :rtype: list[str] or None
+        """
+        queries = [self._queries[name] for name in self.ShardQueryNames if name in self._queries]
+
+        if not queries:
+            return None
+
+        match = studiolibrary.compileQueries(queries)
+
+        return [
+            key for key in store.shardKeys()
+            if match({"path": store.shardFolder(key)})
+        ]
+
+    def updateShards(self):
+        """
+        Load the shards that match the current folder filters.
+
+        The library is only read again when the loaded shards change.
+
+        :rtype: None
+        """
+        if not self.path():
+            return
+
+        store = self.store()
+
+        if not isinstance(store, studiolibrary.ShardedLibraryStore):
+            return
+
+        keys = self.matchShards(store)
+        loaded = store.loadedShards()
+
+        store.setLoadedShards(keys)
+
+        if store.loadedShards() != loaded:
+            logger.debug("Loading %s shards", len(store.loadedShards()))
+            self.setDirty(True)
+            self.addChange(reset=True)
+
+    def databaseFolder(self):
+        """
+        Return the folder that contains the database files.
+
+        :rtype: str
+        """
+        return os.path.dirname(self.store().path())
+
+    def isSearchIndexEnabled(self):
+        """
+        Return True if text searches should use the trigram index.
+
+        :rtype: bool
+        """
+        return studiolibrary.config().get('searchIndex', False)
+
+    def index(self):
+        """
+        Return the trigram index used to narrow down text searches.
+
+        :rtype: studiolibrary.LibraryIndex
+        """
+        if not self._index:
+            records = self.createRecords()
+            self._index = studiolibrary.LibraryIndex()
+            self._index.sync(dict((r.path(), r.itemData()) for r in records))
+
+        return self._index
+
+    def isFullTextEnabled(self):
+        """
+        Return True if the text of each item should be indexed when syncing.
+
+        :rtype: bool
+        """
+        return studiolibrary.config().get('fullTextSearch', False)
+
+    def fullTextPath(self):
+        """
+        Return the path to the full text index.
+
+        :rtype: str
+        """
+        formatString = studiolibrary.config().get('fullTextPath')
         return studiolibrary.formatPath(formatString, path=self.path())
 
+    def fullText(self):
+        """
+        Return the text fields, such as the comment and object names.
+
+        :rtype: studiolibrary.FullTextIndex
+        """
+        if not self._fullText:
+            self._fullText = studiolibrary.FullTextIndex(self.fullTextPath())
+
+        return self._fullText
+
+    def updateFullText(self, items, removed=None):
+        """
+        Read the text fields for the given items that have changed.
+
+        The records are created again when any text has changed.
+
+        :type items: list[studiolibrary.LibraryItem]
+        :type removed: list[str] or None
+        :rtype: None
+        """
+        if not self.path() or not self.isFullTextEnabled():
+            return
+
+        fullText = self.fullText()
+
+        if removed:
+            fullText.remove(removed)
+
+        fullText.updateItems(items)
+
+        if fullText.isChanged():
+            fullText.save()
+            self.setDirty(True)
+
     def distinct(self, field, queries=None, sortBy="name"):
         """
         Get all the values for the given field.
@@ -278,23 +528,87 @@ class Library(QtCore.QObject):
         :type sortBy: str
         :rtype: list 
         """
-        results = {}
-        queries = queries or []
-        queries.extend(self._globalQueries.values())
-
-        items = self.createItems()
-        for item in items:
-            value = item.itemData().get(field)
-            if value:
-                results.setdefault(value, {'count': 0, 'name': value})
-                match = self.match(item.itemData(), queries)
-                if match:
-                    results[value]['count'] += 1
+        facets = self.facets([field], queries=queries)[field]
 
         def sortKey(facet):
             return facet.get(sortBy)
 
-        return sorted(results.values(), key=sortKey)
+        return sorted(facets, key=sortKey)
+
+    def facets(self, fields, queries=None):
+        """
+        Return the values and the number of matching items for each field.
+
+        The counts for all the fields are found in a single pass over the
+        items that match the queries. The counts are cached until the
+        database changes, so showing the same menu again is free.
+
+        Example:
+            facets = library.facets(["type", "category"])
+            print(facets["type"])
+            # [{"name": ".anim", "count": 6}, {"name": ".pose", "count": 30}]
+
+        :type fields: list[str]
+        :type queries: list[dict] or None
+        :rtype: dict[str, list[dict]]
+        """
+        queries = list(queries or []) + list(self._globalQueries.values())
+
+        records = self.createRecords()
+        columns = self.columns()
+
+        key = studiolibrary.queriesKey(queries)
+        counts = {}
+
+        for field in fields:
+            if key is not None and (key, field) in self._facetCache:
+                counts[field] = self._facetCache[(key, field)]
+
+        missing = [field for field in fields if field not in counts]
+
+        if missing:
+            t = time.time()
+
+            records, residual = self.planQueries(queries, score=False)
+            match = studiolibrary.compileQueries(residual)
+            positions = self._recordPositions
+
+            rows = [
+                positions[record.path()]
+                for record in records
+                if match(record.itemData())
+            ]
+
+            facets = []
+
+            for field in missing:
+                counts[field] = dict.fromkeys(columns.distinctValues(field), 0)
+                facets.append((columns.column(field), counts[field]))
+
+            for row in rows:
+                for column, counts_ in facets:
+                    value = column[row]
+                    if value:
+                        counts_[value] += 1
+
+            if key is not None:
+                if len(self._facetCache) > self.MaxFacetCacheSize:
+                    self._facetCache = {}
+
+                for field in missing:
+                    self._facetCache[(key, field)] = counts[field]
+
+            logger.debug("Facets %s took %s", missing, time.time() - t)
+
+        results = {}
+
+        for field in fields:
+            results[field] = [
+                {'name': value, 'count': count}
+                for value, count in counts[field].items()
+            ]
+
+        return results
 
     def mtime(self):
         """
@@ -302,13 +616,7 @@ class Library(QtCore.QObject):
 
         :rtype: float or None
         """
-        path = self.databasePath()
-        mtime = None
-
-        if os.path.exists(path):
-            mtime = os.path.getmtime(path)
-
-        return mtime
+        return self.store().mtime()
 
     def setDirty(self, value):
         """
@@ -325,9 +633,34 @@ class Library(QtCore.QObject):
         """
         Return True if the database has changed on disc.
 
+        The database isn't checked on disc when the watcher reports
+        the changes to the database files.
+
+        :rtype: bool
+        """
+        if self._watcher is not None and self._watcher.isDatabaseWatched():
+            return not self._records or self._mtime is None
+
+        return not self._records or self._mtime != self.mtime()
+
+    def checkDirty(self):
+        """
+        Set the library dirty if the database has changed on disc.
+
+        This is called by the watcher when the database files change.
+
         :rtype: bool
         """
-        return not self._items or self._mtime != self.mtime()
+        studiolibrary.statCache().invalidate(self.databaseFolder())
+
+        if self._mtime is not None and self._mtime != self.mtime():
+            self.setDirty(True)
+
+            # Another session has changed the database, so the changed
+            # paths are not known
+            self.addChange(reset=True)
+
+        return self._mtime is None
 
     def read(self):
         """
@@ -337,8 +670,15 @@ class Library(QtCore.QObject):
         """
         if self.path():
             if self.isDirty():
-                self._data = studiolibrary.readJson(self.databasePath())
+                # The changes made by this library set the mtime to None
+                external = self._mtime is not None and self._mtime != self.mtime()
+
+                self._data = self.store().read()
                 self.setDirty(False)
+
+                # The paths changed by another session are not known
+                if external:
+                    self.addChange(reset=True)
         else:
             logger.info('No path set for reading the data from disc.')
 
@@ -348,150 +688,845 @@ class Library(QtCore.QObject):
         """
         Write the given dict object to the database on disc.
 
+        The database is only set dirty when the data has been written.
+
         :type data: dict
+        :raises: studiolibrary.StoreLockedError
         :rtype: None
         """
         if self.path():
-            studiolibrary.saveJson(self.databasePath(), data)
+            self.store().save(data)
+            studiolibrary.statCache().invalidate(self.databaseFolder())
             self.setDirty(True)
         else:
             logger.info('No path set for saving the data to disc.')
 
+    def update(self, data):
+        """
+        Insert or update the given item data in the database on disc.
+
+        Only the given paths are written when the backend supports it.
+
+        :type data: dict
+        :rtype: None
+        """
+        if self.path():
+            # The paths that are not in the last read of the database
+            added = [p for p in data if p not in self._data and p not in self._recordPositions]
+            changed = [p for p in data if p in self._data or p in self._recordPositions]
+
+            self.store().update(data)
+            studiolibrary.statCache().invalidate(self.databaseFolder())
+            self.setDirty(True)
+
+            if self._index:
+                self._index.update(data)
+
+            self.addChange(added=added, changed=changed)
+        else:
+            logger.info('No path set for updating the data on disc.')
+
     def clear(self):
         """Clear all the item data."""
-        self._items = []
+        self._records = []
         self._results = []
+        self._resultRecords = []
         self._groupedResults = {}
+        self.addChange(reset=True)
         self.dataChanged.emit()
 
-    def sync(self, percentCallback=lambda message, percent: None):
-        """Sync the file system with the database."""
-        if not self.path():
-            logger.info('No path set for syncing data')
-            return
+    def dataVersion(self):
+        """
+        Return the version of the data.
 
-        if percentCallback:
-            percentCallback("Syncing", -1)
+        The version is increased for every change to the database, so
+        views can tell which changes they haven't applied yet.
 
-        data = self.read()
+        :rtype: int
+        """
+        return self._dataVersion
 
-        for path in data.keys():
-            if not os.path.exists(path):
-                del data[path]
+    def addChange(self, added=None, removed=None, changed=None, reset=False):
+        """
+        Add a change to the change feed and emit the items signals.
 
-        depth = self.recursiveDepth()
-        items = studiolibrary.findItems(
-            self.path(),
-            depth=depth,
-        )
+        A reset change is used when the changed paths are not known, so
+        the views have to be updated from scratch.
 
-        items = list(items)
-        count = len(items)
+        :type added: list[str] or None
+        :type removed: list[str] or None
+        :type changed: list[str] or None
+        :type reset: bool
+        :rtype: int
+        """
+        added = list(added or [])
+        removed = list(removed or [])
+        changed = list(changed or [])
 
-        for i, item in enumerate(items):
-            percent = (float(i+1)/float(count))
-            percentCallback("", percent)
+        if not (added or removed or changed or reset):
+            return self._dataVersion
 
-            path = item.path()
+        self._dataVersion += 1
 
-            itemData = data.get(path, {})
-            itemData.update(item.itemData())
+        self._changes.append({
+            "version": self._dataVersion,
+            "added": added,
+            "removed": removed,
+            "changed": changed,
+            "reset": reset,
+        })
 
-            data[path] = itemData
+        if removed:
+            self.itemsRemoved.emit(removed)
 
-        if percentCallback:
-            percentCallback("Post Sync", -1)
-        self.postSync(data)
+        if added:
+            self.itemsAdded.emit(added)
 
-        if percentCallback:
-            percentCallback("Saving Cache", -1)
-        self.save(data)
+        if changed:
+            self.itemsChanged.emit(changed)
 
-        self.dataChanged.emit()
+        return self._dataVersion
 
-    def postSync(self, data):
+    def changesSince(self, version):
         """
-        Use this function to execute code on the data after sync, but before save and dataChanged.emit
+        Return the paths that have changed since the given data version.
 
-        :type data: dict
-        :rtype: None
-        """
-        pass
+        Return None when the changes are not known, such as after a full
+        sync or when the version is older than the kept changes.
 
-    def createItems(self):
-        """
-        Create all the items for the model.
+        Example:
+            version = library.dataVersion()
+            library.sync()
 
-        :rtype: list[studiolibrary.LibraryItem] 
+            changes = library.changesSince(version)
+            if changes is None:
+                print("Update everything")
+            else:
+                print(changes["added"], changes["removed"], changes["changed"])
+
+        :type version: int
+        :rtype: dict or None
         """
-        # Check if the database has changed since the last read call
-        if self.isDirty():
+        if version == self._dataVersion:
+            return {"added": [], "removed": [], "changed": []}
 
-            paths = self.read().keys()
-            items = studiolibrary.itemsFromPaths(
-                paths,
-                library=self,
-                libraryWindow=self._libraryWindow
-            )
+        changes = [c for c in self._changes if c["version"] > version]
 
-            self._items = list(items)
-            self.loadItemData(self._items)
+        if not changes or changes[0]["version"] != version + 1:
+            return None
 
-        return self._items
+        added = collections.OrderedDict()
+        removed = collections.OrderedDict()
+        changed = collections.OrderedDict()
 
-    def findItems(self, queries):
-        """
-        Get the items that match the given queries.
-        
-        Examples:
-            
-            queries = [
-                {
-                    'operator': 'or',
-                    'filters': [
-                        ('folder', 'is' '/library/proj/test'),
-                        ('folder', 'startswith', '/library/proj/test'),
-                    ]
-                },
-                {
-                    'operator': 'and',
-                    'filters': [
-                        ('path', 'contains' 'test'),
-                        ('path', 'contains', 'run'),
-                    ]
-                }
-            ]
-            
-            print(library.find(queries))
-            
-        :type queries: list[dict]            
-        :rtype: list[studiolibrary.LibraryItem]
-        """
-        fields = []
-        results = []
+        for change in changes:
+            if change["reset"]:
+                return None
 
-        queries = copy.copy(queries)
-        queries.extend(self._globalQueries.values())
+            for path in change["removed"]:
+                added.pop(path, None)
+                changed.pop(path, None)
+                removed[path] = True
 
-        logger.debug("Search queries:")
-        for query in queries:
-            logger.debug('Query: %s', query)
+            for path in change["added"]:
+                added[path] = True
 
-        items = self.createItems()
-        for item in items:
-            match = self.match(item.itemData(), queries)
-            if match:
-                results.append(item)
-            fields.extend(item.itemData().keys())
+            for path in change["changed"]:
+                if path not in added:
+                    changed[path] = True
 
-        self._fields = list(set(fields))
+        return {
+            "added": list(added),
+            "removed": list(removed),
+            "changed": list(changed),
+        }
 
-        if self.sortBy():
-            results = self.sorted(results, self.sortBy())
+    def snapshotPath(self):
+        """
+        Return the path to the directory snapshot used for incremental sync.
 
-        return results
+        The indexed backend keeps a local snapshot for each index build.
 
-    def queries(self, exclude=None):
+        :rtype: str
+        """
+        if self.path() and self.databaseBackend() == studiolibrary.IndexedLibraryStore.Name:
+            return self.store().snapshotPath()
+
+        formatString = studiolibrary.config().get('snapshotPath')
+        return studiolibrary.formatPath(formatString, path=self.path())
+
+    def snapshot(self):
+        """
+        Return the directory snapshot used for incremental sync.
+
+        :rtype: studiolibrary.LibrarySnapshot
+        """
+        path = self.snapshotPath()
+
+        if not self._snapshot or self._snapshot.path() != path:
+            self._snapshot = studiolibrary.LibrarySnapshot(path)
+            self._snapshot.read()
+
+            # Start from the snapshot saved with the prebuilt index
+            if self._snapshot.isEmpty() and isinstance(self.store(), studiolibrary.IndexedLibraryStore):
+                self._snapshot.setEntries(self.store().snapshotEntries())
+
+        return self._snapshot
+
+    def isIncrementalSyncEnabled(self):
+        """
+        Return True if sync should only list the changed directories.
+
+        :rtype: bool
+        """
+        return studiolibrary.config().get('incrementalSync', False)
+
+    def sync(self, percentCallback=lambda message, percent: None, incremental=None):
+        """
+        Sync the file system with the database.
+
+        An incremental sync only lists the directories that have changed
+        since the last sync. A full sync walks the whole library and also
+        rebuilds the directory snapshot.
+
+        :type percentCallback: func
+        :type incremental: bool or None
+        :rtype: dict
+        """
+        if not self.path():
+            logger.info('No path set for syncing data')
+            return
+
+        if incremental is None:
+            incremental = self.isIncrementalSyncEnabled()
+
+        if incremental and not self.snapshot().isEmpty():
+            return self.incrementalSync(percentCallback)
+
+        return self.fullSync(percentCallback)
+
+    def incrementalSync(self, percentCallback=lambda message, percent: None):
+        """
+        Sync only the directories that have changed since the last sync.
+
+        :type percentCallback: func
+        :rtype: dict
+        """
+        if percentCallback:
+            percentCallback("Syncing", -1)
+
+        snapshot = self.snapshot()
+        result = snapshot.update(self.path(), depth=self.recursiveDepth())
+
+        counts = {
+            "added": len(result.added),
+            "removed": len(result.removed),
+            "changed": len(result.changed),
+        }
+
+        logger.debug("Incremental sync: %s", counts)
+
+        self._applySnapshotResult(result, percentCallback)
+
+        return counts
+
+    def syncFolders(self, folders):
+        """
+        Sync only the given folders with the database.
+
+        The given folders are listed again, together with any new folders
+        below them. This is used by the watcher, which already knows the
+        folders that have changed, so the library isn't walked.
+
+        :type folders: list[str]
+        :rtype: dict
+        """
+        snapshot = self.snapshot()
+
+        result = snapshot.updateFolders(
+            self.path(),
+            folders,
+            depth=self.recursiveDepth(),
+        )
+
+        return self._applySnapshotResult(result)
+
+    def _applySnapshotResult(self, result, percentCallback=None):
+        """
+        Write the changes found by the snapshot to the database.
+
+        Return the added, removed and changed paths.
+
+        :type result: studiolibrary.SnapshotResult
+        :type percentCallback: func or None
+        :rtype: dict
+        """
+        snapshot = self.snapshot()
+
+        paths = {
+            "added": sorted(result.added),
+            "removed": [],
+            "changed": sorted(result.changed),
+        }
+
+        if result.isEmpty():
+            if result.isSnapshotChanged():
+                snapshot.save()
+            return paths
+
+        data = {}
+        existing = self.read()
+
+        for item in result.items():
+            # Only read the summary of the items that have changed on disc
+            if item.isSummaryChanged(existing.get(item.path(), {})):
+                item.updateSummaryData()
+            data[item.path()] = item.itemData()
+
+        if percentCallback:
+            percentCallback("Post Sync", -1)
+        self.postSync(data)
+
+        if percentCallback:
+            percentCallback("Saving Cache", -1)
+
+        # Remove any children that were stored below a removed folder
+        folders = tuple(path + "/" for path in result.removed)
+        removed = list(result.removed)
+
+        if folders:
+            for path in self.read():
+                if path.startswith(folders):
+                    removed.append(path)
+
+        self.updateFullText(result.items())
+
+        if removed:
+            self.removePaths(removed)
+
+        if data:
+            self.update(data)
+
+        snapshot.save()
+
+        paths["removed"] = removed
+
+        return paths
+
+    def fullSync(self, percentCallback=lambda message, percent: None):
+        """
+        Walk the whole library and sync the file system with the database.
+
+        The snapshot isn't saved when the database cannot be written, so
+        the next sync walks the whole library again.
+
+        :type percentCallback: func
+        :raises: studiolibrary.StoreLockedError
+        :rtype: dict
+        """
+        if percentCallback:
+            percentCallback("Syncing", -1)
+
+        # Keep the item data in the shards that are not loaded
+        data = self.store().readAll()
+        counts = {"added": 0, "removed": 0, "changed": 0}
+
+        for path in data.keys():
+            if not os.path.exists(path):
+                del data[path]
+                counts["removed"] += 1
+
+        # Collect the directory entries while walking, so the snapshot
+        # doesn't need to walk the library again
+        entries = None
+        if self.isIncrementalSyncEnabled() or self._watcher is not None:
+            entries = {}
+
+        items = studiolibrary.findItems(
+            self.path(),
+            depth=self.recursiveDepth(),
+            entries=entries,
+        )
+
+        items = list(items)
+        count = len(items)
+
+        for i, item in enumerate(items):
+            percent = (float(i+1)/float(count))
+            percentCallback("", percent)
+
+            path = item.path()
+
+            if path not in data:
+                counts["added"] += 1
+
+            itemData = data.get(path, {})
+
+            # Only read the summary of the items that have changed on disc
+            if item.isSummaryChanged(itemData):
+                item.updateSummaryData()
+
+            itemData_ = dict(itemData)
+            itemData.update(item.itemData())
+
+            if path in data and itemData != itemData_:
+                counts["changed"] += 1
+
+            data[path] = itemData
+
+        if percentCallback:
+            percentCallback("Post Sync", -1)
+        self.postSync(data)
+
+        if self.isFullTextEnabled():
+            if percentCallback:
+                percentCallback("Indexing Text", -1)
+
+            removed = [path for path in self.fullText().entries() if path not in data]
+            self.updateFullText(items, removed=removed)
+
+        if percentCallback:
+            percentCallback("Saving Cache", -1)
+        self.save(data)
+        self.addChange(reset=True)
+
+        # Save the directory snapshot so the next sync can be incremental
+        if entries is not None:
+            snapshot = self.snapshot()
+            snapshot.setFolderEntries(self.path(), entries)
+            snapshot.save()
+
+        self.dataChanged.emit()
+
+        return counts
+
+    def watcher(self):
+        """
+        Return the watcher that syncs the changes on disc.
+
+        :rtype: studiolibrary.LibraryWatcher or None
+        """
+        return self._watcher
+
+    def isWatchEnabled(self):
+        """
+        Return True if the library folders are being watched.
+
+        :rtype: bool
+        """
+        return self._watcher is not None
+
+    def setWatchEnabled(self, value):
+        """
+        Watch the library folders and sync the changes as they happen.
+
+        The library is synced before watching, so any changes made while
+        the library wasn't watched are found.
+
+        :type value: bool
+        :rtype: None
+        """
+        if value and self._watcher is None and self.path():
+            self._watcher = studiolibrary.LibraryWatcher(self, parent=self)
+
+            # The snapshot is used for knowing which folders to watch
+            self.sync(incremental=True)
+
+            self._watcher.start()
+            self.dataChanged.connect(self._watcher.updateWatches)
+            self.itemsAdded.connect(self._watcher.updateWatches)
+            self.itemsRemoved.connect(self._watcher.updateWatches)
+
+        elif not value and self._watcher is not None:
+            self.dataChanged.disconnect(self._watcher.updateWatches)
+            self.itemsAdded.disconnect(self._watcher.updateWatches)
+            self.itemsRemoved.disconnect(self._watcher.updateWatches)
+            self._watcher.stop()
+            self._watcher = None
+
+    def postSync(self, data):
+        """
+        Use this function to execute code on the data after sync, but before save and dataChanged.emit
+
+        For an incremental sync the data only contains the added and
+        changed items.
+
+        :type data: dict
+        :rtype: None
+        """
+        pass
+
+    def createRecords(self):
+        """
+        Create a lightweight record for each path in the database.
+
+        The records are only created again when the database has changed.
+
+        :rtype: list[studiolibrary.LibraryRecord]
+        """
+        # Check if the database has changed since the records were created
+        with self._searchProfile.span("isDirty"):
+            isDirty = self.isDirty() or self._recordsData is not self._data
+
+        if isDirty:
+            with self._searchProfile.span("createRecords"):
+                data = self.read()
+                self._recordsData = data
+
+                # The text fields are searched like any other field
+                texts = {}
+                if self.isFullTextEnabled():
+                    texts = self.fullText().data()
+
+                fields = set()
+                records = []
+                self._recordPositions = {}
+                self._scores = {}
+
+                for i, path in enumerate(data.keys()):
+                    itemData = data[path]
+
+                    if path in texts:
+                        itemData = dict(itemData, **texts[path])
+
+                    records.append(studiolibrary.LibraryRecord(path, itemData))
+                    self._recordPositions[path] = i
+                    fields.update(itemData.keys())
+
+                self._records = records
+                self._fields = list(fields)
+                self._columns = studiolibrary.LibraryColumns(self._records)
+                self._facetCache = {}
+
+                # Only the paths that have changed are indexed again
+                if self._index:
+                    self._index.sync(dict((r.path(), r.itemData()) for r in records))
+
+        return self._records
+
+    def createItems(self):
+        """
+        Create all the items for the model.
+
+        This creates a LibraryItem for every path in the database, so
+        use createRecords when only the item data is needed.
+
+        :rtype: list[studiolibrary.LibraryItem] 
+        """
+        return self.itemsFromRecords(self.createRecords())
+
+    def itemsFromRecords(self, records):
+        """
+        Return the LibraryItem for each of the given records.
+
+        The items are cached for as long as they are used, so showing
+        the same records again returns the same items.
+
+        The score of the last fuzzy search is added to the item data of
+        the items, so they can be sorted by the "score" field.
+
+        :type records: list[studiolibrary.LibraryRecord]
+        :rtype: list[studiolibrary.LibraryItem]
+        """
+        items = []
+        cache = self._itemCache
+        scores = self._scores
+
+        for record in records:
+            path = record.path()
+            item = cache.get(path)
+
+            if item is None:
+                # The database only contains items, which are directories
+                item = studiolibrary.itemFromPath(
+                    path,
+                    isDir=True,
+                    library=self,
+                    libraryWindow=self._libraryWindow
+                )
+
+                if item is None:
+                    continue
+
+                cache[path] = item
+
+            itemData = record.itemData()
+
+            # The item data of the records is shared with the database
+            if path in scores:
+                itemData = dict(itemData, score=scores[path])
+
+            item.setItemData(itemData)
+            items.append(item)
+
+        return items
+
+    def columns(self):
+        """
+        Return the column store for the current records.
+
+        :rtype: studiolibrary.LibraryColumns
+        """
+        self.createRecords()
+        return self._columns
+
+    def candidateRecords(self, queries):
+        """
+        Return the records that could match the given queries.
+
+        The "is" and "startswith" filters, such as the sidebar folder
+        filters, are found with a range lookup in the sorted columns.
+        The trigram index is used to skip the records that cannot match
+        any other text filters. The returned records still need to be
+        matched.
+
+        :type queries: list[dict]
+        :rtype: list[studiolibrary.LibraryRecord]
+        """
+        records = self.createRecords()
+
+        if not self.isSearchIndexEnabled():
+            return records
+
+        rows = studiolibrary.findQueryCandidates(queries, self._findCandidateRows)
+
+        if rows is None:
+            return records
+
+        return [records[i] for i in sorted(rows)]
+
+    def planQueries(self, queries, score=True):
+        """
+        Return the candidate records and the queries left to match them.
+
+        The filters listed in the "indexed" key of a query, such as the
+        ones from studiolibrary.parseQuery, are looked up in the sorted
+        columns first. These lookups are exact, so the filters are
+        removed from the returned queries and only the residual filters
+        are matched on the candidates.
+
+        The "fuzzy" filters are always looked up in the trigram index.
+        The sum of their scores for each record is kept for sorting the
+        results when score is True.
+
+        :type queries: list[dict]
+        :type score: bool
+        :rtype: (list[studiolibrary.LibraryRecord], list[dict])
+        """
+        records = self.createRecords()
+
+        useIndex = self.isSearchIndexEnabled()
+
+        columns = self.columns()
+        rows = None
+        scores = {}
+        residual = []
+
+        fuzzyRows = {}
+        positions = self._recordPositions
+
+        for query in queries:
+            for field, cond, value in query.get('filters') or []:
+                if cond == 'fuzzy' and (field, value) not in fuzzyRows:
+                    paths = self.findFuzzy(field, value)
+                    fuzzyRows[(field, value)] = set(
+                        positions[path] for path in paths if path in positions
+                    )
+
+                    for path in paths:
+                        scores[path] = scores.get(path, 0) + paths[path]
+
+        if score:
+            self._scores = scores
+
+        if not useIndex and not fuzzyRows:
+            return records, queries
+
+        for query in queries:
+            indexed = query.get('indexed')
+
+            if not indexed or query.get('if') or query.get('operator', 'and') != 'and':
+                residual.append(query)
+                continue
+
+            found = set()
+
+            for filter_ in indexed:
+                field, cond, value = filter_
+
+                if cond == 'fuzzy':
+                    rows_ = fuzzyRows[(field, value)]
+                elif useIndex:
+                    rows_ = columns.findRows(field, cond, value)
+                else:
+                    rows_ = None
+
+                if rows_ is not None:
+                    found.add(tuple(filter_))
+                    rows = rows_ if rows is None else rows & rows_
+
+            query = dict(query)
+            query['filters'] = [f for f in query.get('filters') or [] if tuple(f) not in found]
+            del query['indexed']
+
+            residual.append(query)
+
+        if useIndex:
+            candidates = studiolibrary.findQueryCandidates(residual, self._findCandidateRows)
+
+            if candidates is not None:
+                rows = candidates if rows is None else rows & candidates
+
+        if rows is None:
+            return records, residual
+
+        return [records[i] for i in sorted(rows)], residual
+
+    def findFuzzy(self, field, value):
+        """
+        Return the score of each path for a fuzzy search of the field.
+
+        Values shorter than a trigram can only match the start of the
+        field, so they are found with a range lookup instead.
+
+        :type field: str
+        :type value: str
+        :rtype: dict[str, float]
+        """
+        paths = self.index().findFuzzy(field, value)
+
+        if paths is not None:
+            return paths
+
+        fuzzyScore = studiolibrary.LibraryIndex.fuzzyScore
+        records = self.createRecords()
+        columns = self.columns()
+        column = columns.column(field)
+
+        return dict(
+            (records[row].path(), fuzzyScore(value, column[row]))
+            for row in columns.findRows(field, 'startswith', value) or []
+        )
+
+    def scores(self):
+        """
+        Return the fuzzy search score for each path of the last search.
+
+        :rtype: dict[str, float]
+        """
+        return self._scores
+
+    @staticmethod
+    def isFuzzySearch(queries):
+        """
+        Return True if any of the given queries have a fuzzy filter.
+
+        :type queries: list[dict]
+        :rtype: bool
+        """
+        for query in queries:
+            for filter_ in query.get('filters') or []:
+                if filter_[1] == 'fuzzy':
+                    return True
+        return False
+
+    def _findCandidateRows(self, field, cond, value):
+        """
+        Return the record rows that could match the given filter.
+
+        :type field: str
+        :type cond: str
+        :type value: object
+        :rtype: set[int] or None
+        """
+        rows = self.columns().findRows(field, cond, value)
+
+        if rows is None:
+            paths = self.index().find(field, cond, value)
+
+            if paths is None:
+                return None
+
+            positions = self._recordPositions
+            rows = set(positions[path] for path in paths if path in positions)
+
+        return rows
+
+    def findItems(self, queries, paths=None):
+        """
+        Get the items that match the given queries.
+
+        Only the given paths are matched when paths is not None, such as
+        the paths from the itemsAdded signal.
+        
+        Examples:
+            
+            queries = [
+                {
+                    'operator': 'or',
+                    'filters': [
+                        ('folder', 'is' '/library/proj/test'),
+                        ('folder', 'startswith', '/library/proj/test'),
+                    ]
+                },
+                {
+                    'operator': 'and',
+                    'filters': [
+                        ('path', 'contains' 'test'),
+                        ('path', 'contains', 'run'),
+                    ]
+                }
+            ]
+            
+            print(library.find(queries))
+            
+        :type queries: list[dict]            
+        :type paths: list[str] or None
+        :rtype: list[studiolibrary.LibraryItem]
+        """
+        results = []
+
+        queries = copy.copy(queries)
+        queries.extend(self._globalQueries.values())
+
+        logger.debug("Search queries:")
+        for query in queries:
+            logger.debug('Query: %s', query)
+
+        isFuzzy = self.isFuzzySearch(queries)
+
+        if paths is None:
+            records, queries = self.planQueries(queries)
+        else:
+            records = self.createRecords()
+            positions = self._recordPositions
+            records = [records[positions[p]] for p in paths if p in positions]
+
+        # Compile the queries once for all the records
+        match = studiolibrary.compileQueries(queries)
+
+        for record in records:
+            if match(record.itemData()):
+                results.append(record)
+
+        if self.sortBy():
+            columns = self.columns().prepare(self.sortBy(), scores=self._scores)
+            results = columns.sortItems(results, self.sortBy())
+
+        # The closest fuzzy matches are shown first unless a sort is set
+        elif isFuzzy:
+            scores = self._scores
+
+            def sortKey(record):
+                return scores.get(record.path(), 0)
+
+            results = sorted(results, key=sortKey, reverse=True)
+
+        results = self.itemsFromRecords(results)
+
+        return results
+
+    def queries(self, exclude=None):
         """
         Get all the queries for the dataset excluding the given ones.
         
@@ -534,6 +1569,9 @@ class Library(QtCore.QObject):
         """
         self._queries[query["name"]] = query
 
+        if query["name"] in self.ShardQueryNames:
+            self.updateShards()
+
     def removeQuery(self, name):
         """
         Remove the query with the given name.
@@ -543,6 +1581,9 @@ class Library(QtCore.QObject):
         if name in self._queries:
             del self._queries[name]
 
+            if name in self.ShardQueryNames:
+                self.updateShards()
+
     def queryExists(self, name):
         """
         Check if the given query name exists.
@@ -552,29 +1593,393 @@ class Library(QtCore.QObject):
         """
         return name in self._queries
 
+    def isAsyncSearchEnabled(self):
+        """
+        Return True if scheduled searches should run on a worker thread.
+
+        :rtype: bool
+        """
+        return studiolibrary.config().get('asyncSearch', False)
+
+    def searchDelay(self):
+        """
+        Return the time in milliseconds to wait for more query changes.
+
+        :rtype: int
+        """
+        return studiolibrary.config().get('searchDelay', 0)
+
     def search(self):
         """Run a search using the queries added to this dataset."""
         if not self.isSearchEnabled():
             logger.debug('Search is disabled')
             return
 
-        t = time.time()
+        # The results of any scheduled search would be out of date
+        self.cancelSearch()
+
+        search = self.createSearch(time.time())
+        search.run()
+
+        self._setSearchResults(search, self._currentSearchState)
+
+    def scheduleSearch(self):
+        """
+        Run a search on a worker thread after the search delay.
+
+        Calling this again before the search has started restarts the
+        delay, and any search that is still running is cancelled. The
+        results are set on the main thread before searchFinished is
+        emitted.
+
+        This is the same as search() when async search is disabled.
+
+        :rtype: None
+        """
+        if not self.isAsyncSearchEnabled():
+            self.search()
+            return
+
+        if not self.isSearchEnabled():
+            logger.debug('Search is disabled')
+            return
+
+        if self._searchRequestTime is None:
+            self._searchRequestTime = time.time()
+
+        if self._currentSearch:
+            self._currentSearch.cancel()
+            self._currentSearch = None
+
+        self._searchTimer.start(self.searchDelay())
+
+    def cancelSearch(self):
+        """
+        Cancel any scheduled or running search.
+
+        :rtype: None
+        """
+        self._searchTimer.stop()
+        self._searchRequestTime = None
+
+        if self._currentSearch:
+            self._currentSearch.cancel()
+            self._currentSearch = None
+
+    def isSearching(self):
+        """
+        Return True if a search is scheduled or running.
+
+        :rtype: bool
+        """
+        return bool(self._searchTimer.isActive() or self._currentSearch)
+
+    def flushSearch(self):
+        """
+        Run any scheduled or running search now so the results are current.
+
+        :rtype: None
+        """
+        if self.isSearching():
+            self.search()
+
+    def _startScheduledSearch(self):
+        """
+        Triggered when the search delay has passed.
+
+        :rtype: None
+        """
+        if not self.isSearchEnabled():
+            self._searchRequestTime = None
+            return
+
+        search = self.createSearch(self._searchRequestTime)
+        self._searchRequestTime = None
+
+        worker = studiolibrary.SearchWorker(search)
+        worker.signals.finished.connect(self._searchWorkerFinished)
+
+        # Keep a reference to the worker until the search has finished
+        self._searchWorkers[id(search)] = worker
+        self._searchThreadPool.start(worker)
+
+    def _searchWorkerFinished(self, search):
+        """
+        Triggered on the main thread when a worker search has finished.
+
+        :type search: studiolibrary.LibrarySearch
+        :rtype: None
+        """
+        self._searchWorkers.pop(id(search), None)
+
+        if search is not self._currentSearch:
+            logger.debug("Ignoring the results of a cancelled search")
+            return
+
+        self._currentSearch = None
+
+        if not search.isFinished():
+            return
+
+        # The records have been created again since the search started
+        if self._currentSearchState["records"] is not self.createRecords():
+            self.scheduleSearch()
+            return
+
+        self._setSearchResults(search, self._currentSearchState)
+
+    def createSearch(self, requestTime=None):
+        """
+        Create a search for the current queries.
+
+        The records, queries and columns are prepared on the main thread,
+        so the returned search can be run on a worker thread.
+
+        :type requestTime: float or None
+        :rtype: studiolibrary.LibrarySearch
+        """
+        t = time.time()
+
+        logger.debug("Searching items")
+
+        if self.isSearchProfileEnabled():
+            profile = studiolibrary.SearchProfile()
+        else:
+            profile = studiolibrary.NullSearchProfile()
+
+        self._searchProfile = profile
+
+        with profile.span("searchStarted"):
+            self.searchStarted.emit()
+
+        queries = self.queries()
+        queries_ = queries + list(self._globalQueries.values())
+
+        logger.debug("Search queries:")
+        for query in queries_:
+            logger.debug('Query: %s', query)
+
+        with profile.span("compileQueries"):
+            match = studiolibrary.compileQueries(queries_)
+
+        # The scores of a fuzzy search are set when planning the queries,
+        # so the previous results cannot be reused
+        isFuzzy = self.isFuzzySearch(queries_)
+
+        changes = None
+        if not isFuzzy:
+            self._scores = {}
+            changes = self.searchChanges(queries)
+
+        matched = None
+
+        if changes is not None:
+            # Only the changed records need to be matched again
+            logger.debug("Updating the previous search results")
+            with profile.span("candidates"):
+                records, matched = self.changedRecords(changes)
+            sortBy = self.sortBy()
+
+        elif not isFuzzy and self.isNarrowerSearch(queries):
+            # The previous results are already sorted
+            logger.debug("Refining the previous search results")
+            records = self._resultRecords
+            sortBy = []
+        else:
+            with profile.span("candidates"):
+                records, residual = self.planQueries(queries_)
+
+            # Only the residual filters are matched on the candidates
+            with profile.span("compileQueries"):
+                match = studiolibrary.compileQueries(residual)
+
+            sortBy = self.sortBy()
+
+        # Each search sorts with its own copy of the scores and sort keys,
+        # since a cancelled search can still be running on a worker thread
+        with profile.span("prepare"):
+            columns = self.columns().prepare(sortBy, self.groupBy(), scores=self._scores)
+
+        self._searchProfile = studiolibrary.NullSearchProfile()
+
+        profile.setInfo("recordCount", len(records))
+        profile.setInfo("refined", not sortBy and bool(self.sortBy()))
+
+        search = studiolibrary.LibrarySearch(
+            records,
+            match,
+            columns,
+            sortBy=sortBy,
+            groupBy=self.groupBy(),
+            requestTime=requestTime,
+            prepareTime=time.time() - t,
+            profile=profile,
+            matched=matched,
+            scores=self._scores if isFuzzy and not self.sortBy() else None,
+        )
+
+        self._currentSearch = search
+        self._currentSearchState = {
+            "records": self.createRecords(),
+            "version": self._dataVersion,
+            "queries": copy.deepcopy(queries_),
+            "sortBy": list(self.sortBy()),
+            "groupBy": list(self.groupBy()),
+        }
+
+        return search
+
+    def _setSearchResults(self, search, state):
+        """
+        Set the results of the given finished search.
+
+        The LibraryItems are only created for the matching records.
+
+        :type search: studiolibrary.LibrarySearch
+        :type state: dict
+        :rtype: None
+        """
+        self._currentSearch = None
+
+        profile = search.profile()
+
+        records = search.results()
+
+        with profile.span("createItems"):
+            items = self.itemsFromRecords(records)
+
+        itemsByPath = dict((item.id(), item) for item in items)
+
+        groupedResults = collections.OrderedDict()
+        for group, records_ in search.groupedResults().items():
+            paths = [record.path() for record in records_]
+            groupedResults[group] = [itemsByPath[p] for p in paths if p in itemsByPath]
+
+        self._results = items
+        self._resultRecords = records
+        self._groupedResults = groupedResults
+        self._lastSearch = state
+
+        # This includes updating the items widget
+        with profile.span("updateItems"):
+            self.searchFinished.emit()
+
+        self._searchQueueTime = search.queueTime()
+        self._searchComputeTime = search.computeTime()
+        self._searchTime = self._searchQueueTime + self._searchComputeTime
+
+        if profile:
+            profile.setInfo("queueTime", self._searchQueueTime)
+            profile.setInfo("resultCount", len(items))
+            profile.finish()
+
+            self._lastSearchProfile = profile
+
+            path = self.searchProfilePath()
+            if path:
+                studiolibrary.logSearchProfile(profile, path)
+
+        self.searchTimeFinished.emit()
+
+        logger.debug(
+            'Search time: %s (queue %s, compute %s)',
+            self._searchTime,
+            self._searchQueueTime,
+            self._searchComputeTime,
+        )
+
+    def searchChanges(self, queries):
+        """
+        Return the changes since the last search with the same queries.
+
+        Return None when the last search has to be run again from
+        scratch, such as when the queries, sorting or grouping have
+        changed, or when too many paths have changed.
+
+        :type queries: list[dict]
+        :rtype: dict or None
+        """
+        lastSearch = self._lastSearch
+
+        if not lastSearch or lastSearch["records"] is self.createRecords():
+            return None
+
+        if lastSearch["sortBy"] != list(self.sortBy()) or \
+                lastSearch["groupBy"] != list(self.groupBy()):
+            return None
+
+        queries = queries + list(self._globalQueries.values())
+
+        if lastSearch["queries"] != queries:
+            return None
+
+        changes = self.changesSince(lastSearch["version"])
+
+        if changes is None:
+            return None
+
+        if sum(len(paths) for paths in changes.values()) > self.MaxSearchChanges:
+            return None
+
+        return changes
+
+    def changedRecords(self, changes):
+        """
+        Return the records for the changed paths and the unchanged results.
+
+        The unchanged results are the records from the last search that
+        have not been changed or removed.
+
+        :type changes: dict
+        :rtype: (list[studiolibrary.LibraryRecord], list[studiolibrary.LibraryRecord])
+        """
+        records = self.createRecords()
+        positions = self._recordPositions
+
+        changed = set(changes["added"]) | set(changes["changed"])
+
+        matched = []
+
+        for record in self._resultRecords:
+            path = record.path()
+
+            if path in changed:
+                continue
+
+            # The removed paths are no longer in the records
+            row = positions.get(path)
+            if row is not None:
+                matched.append(records[row])
 
-        logger.debug("Searching items")
+        records_ = [records[positions[p]] for p in changed if p in positions]
+
+        return records_, matched
 
-        self.searchStarted.emit()
+    def isNarrowerSearch(self, queries):
+        """
+        Return True if the queries can only match the previous results.
 
-        self._results = self.findItems(self.queries())
+        This is the case when a word is typed in the search field, so
+        only the previous results need to be matched again.
 
-        self._groupedResults = self.groupItems(self._results, self.groupBy())
+        :type queries: list[dict]
+        :rtype: bool
+        """
+        lastSearch = self._lastSearch
 
-        self.searchFinished.emit()
+        if not lastSearch:
+            return False
 
-        self._searchTime = time.time() - t
+        # The data has changed since the last search
+        if lastSearch["records"] is not self.createRecords():
+            return False
 
-        self.searchTimeFinished.emit()
+        if lastSearch["sortBy"] != list(self.sortBy()):
+            return False
 
-        logger.debug('Search time: %s', self._searchTime)
+        queries = queries + list(self._globalQueries.values())
+
+        return studiolibrary.isNarrowerQueries(queries, lastSearch["queries"])
 
     def results(self):
         """
@@ -595,11 +2000,79 @@ class Library(QtCore.QObject):
     def searchTime(self):
         """
         Return the time taken to run a search.
+
+        This is the queue time plus the compute time.
         
         :rtype: float 
         """
         return self._searchTime
 
+    def isSearchProfileEnabled(self):
+        """
+        Return True if the time taken by each search stage is recorded.
+
+        :rtype: bool
+        """
+        return self._searchProfileEnabled
+
+    def setSearchProfileEnabled(self, value):
+        """
+        Enable or disable recording the time taken by each search stage.
+
+        :type value: bool
+        :rtype: None
+        """
+        self._searchProfileEnabled = value
+
+        if not value:
+            self._lastSearchProfile = None
+
+    def searchProfilePath(self):
+        """
+        Return the rolling log file that the search profiles are added to.
+
+        :rtype: str or None
+        """
+        path = studiolibrary.config().get('searchProfilePath')
+
+        if path:
+            return studiolibrary.formatPath(path, path=self.path())
+
+        return None
+
+    def lastSearchProfile(self):
+        """
+        Return the time taken by each stage of the last search.
+
+        Return None when search profiling is disabled.
+
+        Example:
+            library.setSearchProfileEnabled(True)
+            library.search()
+
+            print(library.lastSearchProfile().summary())
+            # candidates 0.002s, prepare 0.001s, match 0.010s, ...
+
+        :rtype: studiolibrary.SearchProfile or None
+        """
+        return self._lastSearchProfile
+
+    def searchQueueTime(self):
+        """
+        Return the time the last search waited before it started running.
+
+        :rtype: float
+        """
+        return self._searchQueueTime
+
+    def searchComputeTime(self):
+        """
+        Return the time taken to prepare and run the last search.
+
+        :rtype: float
+        """
+        return self._searchComputeTime
+
     def addItem(self, item):
         """
         Add the given item to the database.    
@@ -630,24 +2103,29 @@ class Library(QtCore.QObject):
         """
         Add the given items to the database.
 
+        The views run the search again when they receive the itemsAdded
+        and itemsChanged signals, so the search isn't run here. The
+        emitDataChanged argument is only kept for compatibility.
+
         :type items: list[studiolibrary.LibraryItem]
         :type emitDataChanged: bool
         """
         logger.debug("Save item data %s", items)
 
-        data_ = self.read()
+        data = {}
 
         for item in items:
-            path = item.path()
-            data = item.itemData()
-            data_.setdefault(path, {})
-            data_[path].update(data)
+            itemData = item.itemData()
 
-        self.save(data_)
+            # The score is only valid for the last fuzzy search
+            if 'score' in itemData:
+                itemData = dict(itemData)
+                del itemData['score']
 
-        if emitDataChanged:
-            self.search()
-            self.dataChanged.emit()
+            data[item.path()] = itemData
+
+        self.updateFullText(items)
+        self.update(data)
 
     def loadItemData(self, items):
         """
@@ -683,16 +2161,8 @@ class Library(QtCore.QObject):
         :type data: dict
         :rtype: None
         """
-        data_ = self.read()
         paths = studiolibrary.normPaths(paths)
-
-        for path in paths:
-            if path in data_:
-                data_[path].update(data)
-            else:
-                data_[path] = data
-
-        self.save(data_)
+        self.update(dict((path, data) for path in paths))
 
     def copyPath(self, src, dst):
         """
@@ -713,10 +2183,89 @@ class Library(QtCore.QObject):
         :type dst: str
         :rtype: str
         """
-        studiolibrary.renamePathInFile(self.databasePath(), src, dst)
-        self.setDirty(True)
+        self.renamePaths([(src, dst)])
         return dst
 
+    def renamePaths(self, renames, data=None):
+        """
+        Rename the given paths and all of their children in one write.
+
+        The given item data is saved in the same write as the renames.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :rtype: None
+        """
+        if self.path():
+            # The paths below the renamed paths are moved with them
+            moved = []
+            prefixes = tuple(src + "/" for src, dst in renames)
+
+            for path in self._recordPositions:
+                if path.startswith(prefixes):
+                    for src, dst in renames:
+                        if path.startswith(src + "/"):
+                            moved.append((path, dst + path[len(src):]))
+                            break
+
+            self.store().renamePaths(renames, data)
+            studiolibrary.statCache().invalidate(self.databaseFolder())
+            self.setDirty(True)
+
+            if self.isFullTextEnabled():
+                self.fullText().renamePaths(renames)
+                self.fullText().save()
+
+            self.addChange(
+                removed=[src for src, dst in renames] + [src for src, dst in moved],
+                added=[dst for src, dst in renames] + [dst for src, dst in moved],
+            )
+        else:
+            logger.info('No path set for renaming the data on disc.')
+
+    def moveItems(self, items, dst, force=False):
+        """
+        Move the given items to the given folder with one database write.
+
+        Return the items that have been moved. If moving an item fails,
+        the items that have already been moved are still saved before
+        the error is raised.
+
+        :type items: list[studiolibrary.LibraryItem]
+        :type dst: str
+        :type force: bool
+        :rtype: list[studiolibrary.LibraryItem]
+        """
+        renames = []
+
+        try:
+            for item in items:
+                path = dst + "/" + item.name()
+
+                if force:
+                    path = studiolibrary.generateUniquePath(path)
+
+                src = item.path()
+
+                # Rename the path on the filesystem
+                path = studiolibrary.renamePath(src, path)
+
+                renames.append((item, src, path))
+        finally:
+            if renames:
+                data = {}
+
+                for item, src, path in renames:
+                    item.setPath(path)
+                    data[item.path()] = item.itemData()
+
+                self.renamePaths([(src, path) for item, src, path in renames], data)
+
+                for item, src, path in renames:
+                    item.renamed.emit(item, src, path)
+
+        return [item for item, src, path in renames]
+
     def removePath(self, path):
         """
         Remove the given path from the database.
@@ -733,15 +2282,23 @@ class Library(QtCore.QObject):
         :type paths: list[str]
         :rtype: None
         """
-        data = self.read()
-
         paths = studiolibrary.normPaths(paths)
 
-        for path in paths:
-            if path in data:
-                del data[path]
+        if self.path():
+            self.store().remove(paths)
+            studiolibrary.statCache().invalidate(self.databaseFolder())
+            self.setDirty(True)
 
-        self.save(data)
+            if self._index:
+                self._index.remove(paths)
+
+            if self.isFullTextEnabled():
+                self.fullText().remove(paths)
+                self.fullText().save()
+
+            self.addChange(removed=paths)
+        else:
+            logger.info('No path set for removing the data from disc.')
 
     @staticmethod
     def match(data, queries):
@@ -777,75 +2334,13 @@ class Library(QtCore.QObject):
             ]
             
             print(library.find(queries))
-        """
-
-        def _test(data, key, cond, value):
-            match = False
-
-            if key == '*':
-                itemValue = unicode(data)
-            else:
-                itemValue = data.get(key)
-
-            if isinstance(value, basestring):
-                value = value.lower()
-
-            if isinstance(itemValue, basestring):
-                itemValue = itemValue.lower()
 
-            if not itemValue:
-                match = False
-
-            elif cond == 'contains':
-                match = value in itemValue
-
-            elif cond == 'not_contains':
-                match = value not in itemValue
-
-            elif cond == 'is':
-                match = value == itemValue
-
-            elif cond == 'not':
-                match = value != itemValue
-
-            elif cond == 'startswith':
-                match = itemValue.startswith(value)
-
-            elif cond == 'endswith':
-                match = itemValue.endswith(value)
-
-            return match
-
-
-        for query in queries:
-
-            filters = query.get('filters')
-            operator = query.get('operator', 'and')
-            conditionalfilter = query.get('if')
-
-            if not filters:
-                continue
-
-            if conditionalfilter:
-                if _test(data, conditionalfilter[0], conditionalfilter[1], conditionalfilter[2]) == False:
-                    continue
-
-            match = False
-
-            for key, cond, value in filters:
-
-                match = _test(data, key, cond, value)
-
-                if operator == 'or' and match:
-                    break
-
-                if operator == 'and' and not match:
-                    break
-
-            if match == False:
-                return False
-
-        return True
+        :type data: dict
+        :type queries: list[dict]
+        :rtype: bool
+        """
+        match = studiolibrary.compileQueries(queries)
+        return match(data)
 
     @staticmethod
     def sorted(items, sortBy):
@@ -883,7 +2378,11 @@ class Library(QtCore.QObject):
 
             def sortKey(item):
 
-                default = False if reverse else ''
+                if field == "score":
+                    # Items that don't match a fuzzy search have no score
+                    default = 0
+                else:
+                    default = False if reverse else ''
 
                 return item.itemData().get(field, default)
 
@@ -1004,5 +2503,495 @@ def testsuite():
     assert not Library.match(data, queries)
 
 
+
+def _registerTestItems():
+    """
+    Register the item classes used by the tests.
+
+    Return the item classes that were registered before.
+
+    :rtype: list[studiolibrary.LibraryItem]
+    """
+    itemClasses = studiolibrary.registeredItems()
+
+    class PoseItem(studiolibrary.LibraryItem):
+        Extensions = [".pose"]
+
+        def createSummaryData(self):
+            path = self.path() + "/pose.json"
+            if os.path.exists(path):
+                return studiolibrary.readJson(path)
+            return {}
+
+    class FolderItem(studiolibrary.LibraryItem):
+        RegisterOrder = 100
+        MatchDirectories = True
+        EnableNestedItems = True
+
+    studiolibrary.utils.clearRegisteredItems()
+
+    for cls in [PoseItem, FolderItem]:
+        studiolibrary.registerItem(cls)
+
+    return itemClasses
+
+
+def _restoreItems(itemClasses):
+    """
+    Register the given item classes again after a test.
+
+    :type itemClasses: list[studiolibrary.LibraryItem]
+    :rtype: None
+    """
+    studiolibrary.utils.clearRegisteredItems()
+
+    for cls in itemClasses:
+        studiolibrary.registerItem(cls)
+
+
+def testExternalChanges():
+    """
+    Test a search finds the items synced by another library.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+
+    # The changes made by the other library must be seen straight away
+    studiolibrary.statCache().setTTL(0)
+
+    try:
+        os.makedirs(root + "/anim/walk.pose")
+
+        library = Library(root)
+        library.sync()
+        library.addQuery({"name": "folder", "filters": [("folder", "is", root + "/anim")]})
+
+        library.search()
+        assert [item.path() for item in library.results()] == [root + "/anim/walk.pose"]
+
+        # The same queries again only match the changed records
+        version = library.dataVersion()
+        library.search()
+        assert library.changesSince(version) == {"added": [], "removed": [], "changed": []}
+
+        os.makedirs(root + "/anim/jump.pose")
+        Library(root).sync()
+
+        library.search()
+        assert sorted(item.path() for item in library.results()) == [
+            root + "/anim/jump.pose",
+            root + "/anim/walk.pose",
+        ]
+        assert library.changesSince(version) is None
+
+    finally:
+        studiolibrary.statCache().setTTL(None)
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testIncrementalSync():
+    """
+    Test an incremental sync finds the same item data as a full sync.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+    config = studiolibrary.config()
+    incrementalSync = config.get("incrementalSync")
+
+    studiolibrary.statCache().setTTL(0)
+
+    try:
+        config["incrementalSync"] = True
+
+        for name in ["walk.pose", "jump.pose", "sit.pose"]:
+            os.makedirs(root + "/anim/" + name)
+
+        studiolibrary.saveJson(root + "/anim/walk.pose/pose.json", {"description": "slow"})
+
+        library = Library(root)
+        library.sync()
+        assert not library.snapshot().isEmpty()
+
+        # Nothing is listed again when nothing has changed
+        assert library.sync() == {"added": 0, "removed": 0, "changed": 0}
+
+        time.sleep(0.01)
+
+        os.makedirs(root + "/anim/run.pose")
+        os.rmdir(root + "/anim/sit.pose")
+        os.remove(root + "/anim/walk.pose/pose.json")
+        studiolibrary.saveJson(root + "/anim/walk.pose/pose.json", {"description": "fast"})
+
+        assert library.sync() == {"added": 1, "removed": 1, "changed": 1}
+
+        data = library.read()
+        assert data[root + "/anim/walk.pose"]["description"] == "fast"
+
+        # A full sync of a new database finds the same item data
+        shutil.rmtree(root + "/.studiolibrary")
+
+        library = Library(root)
+        library.fullSync()
+        assert library.read() == data
+
+    finally:
+        config["incrementalSync"] = incrementalSync
+        studiolibrary.statCache().setTTL(None)
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testItemsFromRecords():
+    """
+    Test the items are only created for the records that are shown.
+
+    :rtype: None
+    """
+    import gc
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+
+    try:
+        for name in ["walk.pose", "jump.pose", "sit.pose"]:
+            os.makedirs(root + "/anim/" + name)
+
+        library = Library(root)
+        library.sync()
+
+        records = library.createRecords()
+        assert len(records) == 4
+        assert len(library._itemCache) == 0
+
+        library.addQuery({"name": "name", "filters": [("name", "is", "walk.pose")]})
+        library.search()
+
+        walk = library.results()[0]
+        assert walk.path() == root + "/anim/walk.pose"
+        assert len(library._itemCache) == 1
+
+        # The same item is returned while it is used
+        record = [r for r in records if r.path() == walk.path()][0]
+        assert library.itemsFromRecords([record])[0] is walk
+        assert walk.itemData() is record.itemData()
+
+        items = library.itemsFromRecords(records)
+        assert len(items) == 4 and any(item is walk for item in items)
+        assert len(library._itemCache) == 4
+
+        # The items that are no longer used are removed from the cache
+        del items
+        gc.collect()
+        assert list(library._itemCache.keys()) == [walk.path()]
+
+    finally:
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testFacets():
+    """
+    Test the facet counts are cached until the database changes.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+
+    def facetCounts(field):
+        # The values that don't match the queries have a count of 0
+        facets = library.facets([field], queries=queries)[field]
+        return dict((facet["name"], facet["count"]) for facet in facets if facet["count"])
+
+    try:
+        for path in ["anim/walk.pose", "anim/jump.pose", "faces/smile.pose"]:
+            os.makedirs(root + "/" + path)
+
+        library = Library(root)
+        library.sync()
+
+        queries = [{"name": "type", "filters": [("type", "is", ".pose")]}]
+
+        assert facetCounts("category") == {"anim": 2, "faces": 1}
+        assert facetCounts("type") == {".pose": 3}
+
+        facets = library.distinct("category", queries=queries)
+        assert [facet["name"] for facet in facets if facet["count"]] == ["anim", "faces"]
+
+        # The same counts are returned from the cache
+        key = studiolibrary.queriesKey(queries + list(library._globalQueries.values()))
+        assert library._facetCache[(key, "category")]["faces"] == 1
+
+        walk = root + "/anim/walk.pose"
+        library.update({walk: dict(library.read()[walk], category="faces")})
+        assert facetCounts("category") == {"anim": 1, "faces": 2}
+
+        library.removePaths([root + "/anim/jump.pose"])
+        assert facetCounts("category") == {"faces": 2}
+        assert facetCounts("type") == {".pose": 2}
+
+    finally:
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testUpdateSummaryData():
+    """
+    Test reading the summary of an item doesn't change the records until saved.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+
+    studiolibrary.statCache().setTTL(0)
+
+    try:
+        path = root + "/anim/walk.pose"
+        os.makedirs(path)
+        studiolibrary.saveJson(path + "/pose.json", {"description": "slow"})
+
+        library = Library(root)
+        library.sync()
+        library.addQuery({"name": "description", "filters": [("description", "is", "fast")]})
+
+        library.search()
+        assert library.results() == []
+
+        walk = [item for item in library.createItems() if item.path() == path][0]
+        itemData = walk.itemData()
+
+        time.sleep(0.01)
+        os.remove(path + "/pose.json")
+        studiolibrary.saveJson(path + "/pose.json", {"description": "fast"})
+
+        walk.updateSummaryData()
+        assert walk.itemData()["description"] == "fast"
+        assert itemData["description"] == "slow"
+
+        library.search()
+        assert library.results() == []
+
+        walk.saveItemData()
+
+        library.search()
+        assert [item.path() for item in library.results()] == [path]
+
+    finally:
+        studiolibrary.statCache().setTTL(None)
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testChangesSince():
+    """
+    Test the changes since a data version are merged in order.
+
+    :rtype: None
+    """
+    library = Library()
+    version = library.dataVersion()
+
+    library.addChange(added=["/a", "/b"])
+    library.addChange(changed=["/a", "/c"])
+    library.addChange(removed=["/b"])
+
+    assert library.changesSince(version) == {
+        "added": ["/a"],
+        "removed": ["/b"],
+        "changed": ["/c"],
+    }
+    assert library.changesSince(version + 2) == {"added": [], "removed": ["/b"], "changed": []}
+    assert library.changesSince(library.dataVersion())["added"] == []
+
+    # Nothing is added for an empty change
+    assert library.addChange() == version + 3
+
+    library.addChange(reset=True)
+    assert library.changesSince(version) is None
+    assert library.changesSince(library.dataVersion() - 1) is None
+
+    # The changes older than the kept changes are not known
+    version = library.dataVersion()
+    for i in range(Library.MaxChanges + 1):
+        library.addChange(added=["/%d" % i])
+    assert library.changesSince(version) is None
+
+
+def testSearchChanges():
+    """
+    Test saving item data only matches the changed records again.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+
+    try:
+        for name in ["walk.pose", "jump.pose", "sit.pose"]:
+            os.makedirs(root + "/anim/" + name)
+
+        library = Library(root)
+        library.sync()
+        library.addQuery({"name": "tag", "filters": [("tag", "is", "fast")]})
+
+        finished = []
+        library.searchFinished.connect(lambda: finished.append(True))
+
+        library.search()
+        assert library.results() == []
+
+        items = library.createItems()
+        walk = [item for item in items if item.path().endswith("walk.pose")][0]
+        walk.setItemData(dict(walk.itemData(), tag="fast"))
+
+        changed = []
+        library.itemsChanged.connect(changed.extend)
+
+        # The search is run by the views when they receive the signal
+        count = len(finished)
+        library.saveItemData([walk])
+        assert changed == [walk.path()]
+        assert len(finished) == count
+
+        changes = library.searchChanges(library.queries())
+        assert changes == {"added": [], "removed": [], "changed": [walk.path()]}
+
+        records, matched = library.changedRecords(changes)
+        assert [record.path() for record in records] == [walk.path()]
+        assert matched == []
+
+        library.search()
+        assert [item.path() for item in library.results()] == [walk.path()]
+
+        # The unchanged results are kept without matching them again
+        library.removePaths([root + "/anim/sit.pose"])
+        changes = library.searchChanges(library.queries())
+        assert changes == {"added": [], "removed": [root + "/anim/sit.pose"], "changed": []}
+
+        records, matched = library.changedRecords(changes)
+        assert records == [] and [record.path() for record in matched] == [walk.path()]
+
+        # Changing the queries runs the search from scratch
+        assert library.searchChanges(library.queries(exclude=["tag"])) is None
+
+    finally:
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def testScheduleSearch():
+    """
+    Test scheduled searches are debounced and cancelled searches are ignored.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    itemClasses = _registerTestItems()
+    config = studiolibrary.config()
+    asyncSearch = config.get("asyncSearch")
+
+    try:
+        config["asyncSearch"] = True
+
+        for name in ["walk.pose", "jump.pose", "sit.pose"]:
+            os.makedirs(root + "/anim/" + name)
+
+        paths = [root + "/anim/" + name for name in ["jump.pose", "sit.pose", "walk.pose"]]
+
+        library = Library(root)
+        library.sync()
+        library.setSortBy(["name"])
+
+        finished = []
+        library.searchFinished.connect(lambda: finished.append(True))
+
+        # The workers are run by the test instead of the thread pool
+        workers = []
+        library._searchThreadPool.start = workers.append
+
+        def startScheduledSearch():
+            library._searchTimer.stop()
+            library._searchTimer.timeout.emit()
+
+        # Searches requested during the delay are run once
+        library.addQuery({"name": "name", "filters": [("name", "contains", "a")]})
+        library.scheduleSearch()
+        library.scheduleSearch()
+        assert library.isSearching() and workers == []
+
+        startScheduledSearch()
+        assert len(workers) == 1
+
+        # A new search cancels the search that is still running
+        library.addQuery({"name": "name", "filters": [("name", "contains", ".pose")]})
+        library.scheduleSearch()
+        startScheduledSearch()
+
+        cancelled, worker = workers
+        assert cancelled.search().isCancelled()
+
+        cancelled.run()
+        assert finished == [] and library.isSearching()
+
+        worker.run()
+        assert len(finished) == 1 and not library.isSearching()
+        assert [item.path() for item in library.results()] == paths
+
+        # Each search sorts with its own copy of the sort keys
+        library.setSortBy(["name:dsc"])
+        search = library.createSearch()
+        assert search._columns is not library.columns()
+
+        library.setSortBy(["name"])
+        library.createSearch().run()
+
+        search.run()
+        assert [record.path() for record in search.results()] == paths[::-1]
+
+    finally:
+        config["asyncSearch"] = asyncSearch
+        _restoreItems(itemClasses)
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testIncrementalSync()
+    testItemsFromRecords()
+    testFacets()
+    testUpdateSummaryData()
+    testChangesSince()
+    testSearchChanges()
+    testExternalChanges()
+    testScheduleSearch()
+
+
 if __name__ == "__main__":
+    runTests()
     testsuite()
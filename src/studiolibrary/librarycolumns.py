@@ -0,0 +1,603 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A column oriented store of the item data used for sorting and grouping.
+
+Each column holds the value of one field for every record, in the same
+order as the records. Columns are created the first time a field is used
+and string values are shared between all the items, so thousands of
+items in the same folder only keep one copy of the folder path.
+
+Sorting uses a precomputed integer rank for each value, so sorting by
+several fields is a single pass with a tuple of integers as the key.
+
+The "is" and "startswith" filters, such as the folder filters from the
+sidebar, are found with a range lookup in a sorted list of the lower
+case values, instead of testing every item.
+
+Example:
+    import studiolibrary
+
+    columns = studiolibrary.LibraryColumns(records)
+
+    records = columns.sortItems(records, ["type", "name:dsc"])
+    groups = columns.groupItems(records, ["category"])
+"""
+import time
+import bisect
+import logging
+import collections
+
+
+__all__ = [
+    "LibraryColumns",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryColumns(object):
+
+    # The filter conditions that can be found with a range lookup
+    RangeConditions = [
+        "is",
+        "startswith",
+    ]
+
+    # The field that sorts the items by the scores of a fuzzy search
+    ScoreField = "score"
+
+    def __init__(self, items=None):
+        """
+        :type items: list[studiolibrary.LibraryRecord] or None
+        """
+        self._items = []
+        self._rows = {}
+        self._columns = {}
+        self._missing = {}
+        self._sortKeys = {}
+        self._strings = {}
+        self._sortedValues = {}
+        self._distinctValues = {}
+        self._scores = {}
+
+        self.setItems(items or [])
+
+    def setItems(self, items):
+        """
+        Set the items for the store and remove all the columns.
+
+        :type items: list[studiolibrary.LibraryRecord]
+        :rtype: None
+        """
+        self._items = list(items)
+        self._rows = dict((item.id(), i) for i, item in enumerate(self._items))
+        self._columns = {}
+        self._missing = {}
+        self._sortKeys = {}
+        self._strings = {}
+        self._sortedValues = {}
+        self._distinctValues = {}
+
+    def items(self):
+        """
+        Return the items in row order.
+
+        :rtype: list[studiolibrary.LibraryRecord]
+        """
+        return self._items
+
+    def fields(self):
+        """
+        Return the fields that have a column.
+
+        :rtype: list[str]
+        """
+        return list(self._columns.keys())
+
+    def rows(self, items):
+        """
+        Return the row for each of the given items.
+
+        Return None if any of the items are not in the store.
+
+        :type items: list[studiolibrary.LibraryRecord]
+        :rtype: list[int] or None
+        """
+        rows = []
+
+        for item in items:
+            row = self._rows.get(item.id())
+            if row is None or self._items[row] is not item:
+                return None
+            rows.append(row)
+
+        return rows
+
+    def scores(self):
+        """
+        Return the fuzzy search score for each item id.
+
+        :rtype: dict[str, float]
+        """
+        return self._scores
+
+    def setScores(self, scores):
+        """
+        Set the fuzzy search scores used by the score column.
+
+        The score column and its sort keys are created again the next
+        time they are used. Items without a score have a score of 0.
+
+        :type scores: dict[str, float] or None
+        :rtype: None
+        """
+        scores = scores or {}
+
+        if not scores and not self._scores:
+            return
+
+        self._scores = scores
+
+        field = self.ScoreField
+
+        for cache in (self._columns, self._missing, self._sortedValues, self._distinctValues):
+            cache.pop(field, None)
+
+        for key in list(self._sortKeys.keys()):
+            if key[0] == field:
+                del self._sortKeys[key]
+
+    def copy(self, scores=None):
+        """
+        Return a copy of the store with the given fuzzy search scores.
+
+        The columns and sort keys are never changed once they have been
+        created, so they are shared with the copy. Only the lookups are
+        copied, so setting the scores or creating a column on the copy
+        doesn't change this store.
+
+        :type scores: dict[str, float] or None
+        :rtype: LibraryColumns
+        """
+        columns = LibraryColumns()
+
+        columns._items = self._items
+        columns._rows = self._rows
+        columns._strings = self._strings
+        columns._columns = dict(self._columns)
+        columns._missing = dict(self._missing)
+        columns._sortKeys = dict(self._sortKeys)
+        columns._sortedValues = dict(self._sortedValues)
+        columns._distinctValues = dict(self._distinctValues)
+        columns._scores = self._scores
+
+        columns.setScores(scores)
+
+        return columns
+
+    def column(self, field):
+        """
+        Return the values for the given field in row order.
+
+        Missing values are returned as None.
+
+        :type field: str
+        :rtype: list
+        """
+        if field not in self._columns:
+            self._createColumn(field)
+
+        return self._columns[field]
+
+    def _createColumn(self, field):
+        """
+        Create the column for the given field.
+
+        String values are shared with all the other columns and the
+        item data is updated to use the shared value.
+
+        :type field: str
+        :rtype: None
+        """
+        t = time.time()
+
+        if field == self.ScoreField:
+            scores = self._scores
+            self._columns[field] = [scores.get(item.id(), 0) for item in self._items]
+            self._missing[field] = set()
+            return
+
+        values = []
+        missing = set()
+        strings = self._strings
+
+        for row, item in enumerate(self._items):
+            itemData = item.itemData()
+
+            if field not in itemData:
+                missing.add(row)
+                values.append(None)
+                continue
+
+            value = itemData[field]
+
+            if isinstance(value, basestring):
+                value = strings.setdefault(value, value)
+                itemData[field] = value
+
+            values.append(value)
+
+        self._columns[field] = values
+        self._missing[field] = missing
+
+        logger.debug("Create column %s took %s", field, time.time() - t)
+
+    def distinctValues(self, field):
+        """
+        Return the unique values for the given field that are not empty.
+
+        :type field: str
+        :rtype: set
+        """
+        if field not in self._distinctValues:
+            self._distinctValues[field] = set(v for v in self.column(field) if v)
+
+        return self._distinctValues[field]
+
+    def sortedValues(self, field):
+        """
+        Return the lower case string values and their rows in sorted order.
+
+        Rows that don't have a string value for the field are not included.
+
+        :type field: str
+        :rtype: (list[unicode], list[int])
+        """
+        if field not in self._sortedValues:
+            t = time.time()
+
+            pairs = []
+
+            for row, value in enumerate(self.column(field)):
+                if isinstance(value, basestring):
+                    pairs.append((value.lower(), row))
+
+            pairs.sort()
+
+            values = [value for value, row in pairs]
+            rows = [row for value, row in pairs]
+
+            self._sortedValues[field] = (values, rows)
+
+            logger.debug("Sort values %s took %s", field, time.time() - t)
+
+        return self._sortedValues[field]
+
+    def findRows(self, field, cond, value):
+        """
+        Return the rows that match the given filter using a range lookup.
+
+        The match is case insensitive in the same way as Library.match.
+        Return None when the filter cannot be found with a range lookup.
+
+        :type field: str
+        :type cond: str
+        :type value: object
+        :rtype: set[int] or None
+        """
+        if field == "*" or cond not in self.RangeConditions:
+            return None
+
+        if not isinstance(value, basestring) or not value:
+            return None
+
+        value = value.lower()
+        values, rows = self.sortedValues(field)
+
+        start = bisect.bisect_left(values, value)
+
+        if cond == "is":
+            end = bisect.bisect_right(values, value, start)
+        else:
+            end = start
+            while end < len(values) and values[end].startswith(value):
+                end += 1
+
+        return set(rows[start:end])
+
+    @staticmethod
+    def parseField(field):
+        """
+        Return the field name and if it is reversed for the given sort field.
+
+        Example:
+            print(LibraryColumns.parseField("name:dsc"))
+            # ("name", True)
+
+        :type field: str
+        :rtype: (str, bool)
+        """
+        tokens = field.split(':')
+
+        reverse = False
+        if len(tokens) > 1:
+            field = tokens[0]
+            reverse = tokens[1] != 'asc'
+
+        return field, reverse
+
+    def prepare(self, sortBy=None, groupBy=None, scores=None):
+        """
+        Return a copy with the columns and sort keys needed for the given fields.
+
+        This is used before sorting or grouping on a worker thread, so
+        the columns are only created on the main thread. The columns are
+        kept in this store for the next search, except for the score
+        column which is only created on the copy with the given scores.
+
+        :type sortBy: list[str] or None
+        :type groupBy: list[str] or None
+        :type scores: dict[str, float] or None
+        :rtype: LibraryColumns
+        """
+        fields = [self.parseField(field) for field in sortBy or []]
+
+        if groupBy:
+            field, reverse = self.parseField(groupBy[0])
+            fields.append((field, None))
+
+        for field, reverse in fields:
+            if field == self.ScoreField:
+                continue
+            elif reverse is None:
+                self.column(field)
+            else:
+                self.sortKeys(field, reverse)
+
+        columns = self.copy(scores)
+
+        for field, reverse in fields:
+            if reverse is None:
+                columns.column(field)
+            else:
+                columns.sortKeys(field, reverse)
+
+        return columns
+
+    def sortKeys(self, field, reverse=False):
+        """
+        Return the sort rank of each row for the given field.
+
+        The ranks are negated when reversed so they can be combined with
+        other fields in a single ascending sort. Return None when the
+        values cannot be ranked.
+
+        :type field: str
+        :type reverse: bool
+        :rtype: list[int] or None
+        """
+        key = (field, reverse)
+
+        if key not in self._sortKeys:
+            self._sortKeys[key] = self._createSortKeys(field, reverse)
+
+        return self._sortKeys[key]
+
+    def _createSortKeys(self, field, reverse):
+        """
+        Create the sort ranks for the given field.
+
+        :type field: str
+        :type reverse: bool
+        :rtype: list[int] or None
+        """
+        values = self.sortValues(field, reverse)
+
+        try:
+            ranks = dict((v, i) for i, v in enumerate(sorted(set(values))))
+        except TypeError:
+            # The values are not hashable
+            return None
+
+        sign = -1 if reverse else 1
+
+        return [sign * ranks[value] for value in values]
+
+    def sortValues(self, field, reverse=False):
+        """
+        Return the values used for sorting by the given field.
+
+        The default value for missing fields is the same as Library.sorted.
+
+        :type field: str
+        :type reverse: bool
+        :rtype: list
+        """
+        default = False if reverse else ''
+
+        values = list(self.column(field))
+
+        for row in self._missing[field]:
+            values[row] = default
+
+        return values
+
+    def sortRows(self, rows, sortBy):
+        """
+        Return the given rows sorted using the sortBy argument.
+
+        :type rows: list[int]
+        :type sortBy: list[str]
+        :rtype: list[int]
+        """
+        fields = [self.parseField(field) for field in sortBy]
+
+        keys = [self.sortKeys(field, reverse) for field, reverse in fields]
+
+        if None in keys:
+            # Fall back to one stable sort for each field
+            for field, reverse in reversed(fields):
+                values = self.sortValues(field, reverse)
+                rows = sorted(rows, key=values.__getitem__, reverse=reverse)
+            return rows
+
+        if len(keys) == 1:
+            return sorted(rows, key=keys[0].__getitem__)
+
+        return sorted(rows, key=lambda row: tuple(k[row] for k in keys))
+
+    def sortItems(self, items, sortBy):
+        """
+        Return the given items sorted using the sortBy argument.
+
+        :type items: list[studiolibrary.LibraryRecord]
+        :type sortBy: list[str]
+        :rtype: list[studiolibrary.LibraryRecord]
+        """
+        logger.debug('Sort by: %s', sortBy)
+
+        rows = self.rows(items)
+
+        if rows is None:
+            raise ValueError("Cannot sort items that are not in the store")
+
+        t = time.time()
+
+        rows = self.sortRows(rows, sortBy)
+        items = [self._items[row] for row in rows]
+
+        logger.debug("Sort items took %s", time.time() - t)
+
+        return items
+
+    def groupItems(self, items, fields):
+        """
+        Group the given items by the given field.
+
+        :type items: list[studiolibrary.LibraryRecord]
+        :type fields: list[str]
+        :rtype: dict
+        """
+        logger.debug('Group by: %s', fields)
+
+        # Only support for top level grouping at the moment.
+        if fields:
+            field = fields[0]
+        else:
+            return {'None': items}
+
+        rows = self.rows(items)
+
+        if rows is None:
+            raise ValueError("Cannot group items that are not in the store")
+
+        t = time.time()
+
+        field, reverse = self.parseField(field)
+
+        column = self.column(field)
+        groups_ = {}
+
+        for row in rows:
+            value = column[row]
+            if value:
+                groups_.setdefault(value, []).append(self._items[row])
+
+        results = collections.OrderedDict()
+        for group in sorted(groups_.keys(), reverse=reverse):
+            results[group] = groups_[group]
+
+        logger.debug("Group Items Took %s", time.time() - t)
+
+        return results
+
+
+def testLibraryColumns():
+    """
+    Test sorting and grouping items with the column store.
+
+    :rtype: None
+    """
+    class Item(object):
+
+        def __init__(self, **itemData):
+            self._itemData = itemData
+
+        def id(self):
+            return self._itemData["path"]
+
+        def itemData(self):
+            return self._itemData
+
+    items = [
+        Item(path="/a/blue", name="blue", index=3, category="".join(["a"])),
+        Item(path="/a/red", name="red", index=1, category="".join(["a"])),
+        Item(path="/b/green", name="green", index=2, category="b"),
+        Item(path="/b/pink", name="pink", category="b"),
+    ]
+
+    columns = LibraryColumns(items)
+
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["index:asc", "name"])]
+    assert names == ["red", "green", "blue", "pink"]
+
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["index:dsc", "name"])]
+    assert names == ["blue", "green", "red", "pink"]
+
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["category:dsc", "name"])]
+    assert names == ["green", "pink", "blue", "red"]
+
+    groups = columns.groupItems(items[:3], ["category:dsc"])
+    assert list(groups.keys()) == ["b", "a"]
+    assert groups["a"] == [items[0], items[1]]
+
+    # String values are shared between the items
+    assert items[0].itemData()["category"] is items[1].itemData()["category"]
+
+    assert columns.findRows("path", "startswith", "/A/") == set([0, 1])
+    assert columns.findRows("path", "is", "/b/pink") == set([3])
+    assert columns.findRows("path", "is", "/b") == set()
+    assert columns.findRows("index", "is", 3) is None
+    assert columns.findRows("name", "contains", "re") is None
+
+    # The score column is created from the scores of the fuzzy search
+    columns.setScores({"/a/red": 0.5, "/b/pink": 0.9})
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["score:dsc", "name"])]
+    assert names == ["pink", "red", "blue", "green"]
+
+    columns.setScores({"/a/blue": 0.7})
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["score:dsc", "name"])]
+    assert names == ["blue", "green", "pink", "red"]
+
+    # The scores of a prepared copy don't change the store or other copies
+    prepared = columns.prepare(["score:dsc", "name"], ["category"], scores={"/b/green": 0.8})
+    other = columns.prepare(["score:dsc", "name"], scores={"/a/red": 0.6})
+
+    assert columns.scores() == {"/a/blue": 0.7}
+    names = [i.itemData()["name"] for i in columns.sortItems(items, ["score:dsc", "name"])]
+    assert names == ["blue", "green", "pink", "red"]
+
+    names = [i.itemData()["name"] for i in prepared.sortItems(items, ["score:dsc", "name"])]
+    assert names == ["green", "blue", "pink", "red"]
+
+    names = [i.itemData()["name"] for i in other.sortItems(items, ["score:dsc", "name"])]
+    assert names == ["red", "blue", "green", "pink"]
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testLibraryColumns()
+
+
+if __name__ == "__main__":
+    runTests()
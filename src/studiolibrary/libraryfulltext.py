@@ -0,0 +1,305 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+The text of each item that is too slow to read while searching.
+
+The text fields, such as the comment, owner and object names, are read
+from the item files when syncing and are added to the item data of the
+records, so they can be searched like any other field.
+
+Each entry is keyed by the mtime of the item, so syncing only reads the
+items that have changed since they were last indexed.
+
+The file is a best-effort cache shared by all the sessions. It is saved
+without a lock, so when two sessions save at the same time the last one
+wins. The entries it drops are missing or out of date, so they are read
+again by the next sync.
+
+Example:
+    import studiolibrary
+
+    fullText = studiolibrary.FullTextIndex("/library/.studiolibrary/fulltext.json")
+    fullText.updateItems(items)
+    fullText.save()
+
+    print(fullText.fields("/library/walk.anim"))
+    # {"comment": "A happy walk", "owner": "hovel", "objects": "L_hand_ctrl R_hand_ctrl"}
+"""
+import logging
+
+import studiolibrary
+
+
+__all__ = [
+    "FullTextIndex",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class FullTextIndex(object):
+
+    Version = 1
+
+    def __init__(self, path=None):
+        """
+        :type path: str or None
+        """
+        self._path = path
+        self._entries = None
+        self._mtime = None
+        self._changed = False
+
+    def path(self):
+        """
+        Return the location of the full text index on disc.
+
+        :rtype: str or None
+        """
+        return self._path
+
+    def entries(self):
+        """
+        Return the mtime and text fields keyed by the item path.
+
+        The entries are read again when another session has saved them.
+
+        :rtype: dict
+        """
+        mtime = None
+
+        if self.path() and studiolibrary.statCache().exists(self.path()):
+            mtime = studiolibrary.statCache().mtime(self.path())
+
+        if self._entries is None or (mtime != self._mtime and not self._changed):
+            self._entries = self.read()
+            self._mtime = mtime
+
+        return self._entries
+
+    def read(self):
+        """
+        Read the entries from disc.
+
+        :rtype: dict
+        """
+        entries = {}
+
+        if self.path() and studiolibrary.statCache().exists(self.path()):
+            try:
+                data = studiolibrary.readJson(self.path())
+                if data.get("version") == self.Version:
+                    entries = data.get("entries", {})
+            except Exception:
+                logger.exception('Cannot read the full text index "%s"', self.path())
+
+        return entries
+
+    def save(self):
+        """
+        Write the entries to disc if they have changed.
+
+        The index is only a cache, so write errors are logged and ignored
+        and the entries saved by another session may be replaced.
+
+        :rtype: None
+        """
+        if not self.path() or not self._changed:
+            return
+
+        try:
+            studiolibrary.saveJson(self.path(), {
+                "version": self.Version,
+                "entries": self.entries(),
+            })
+            studiolibrary.statCache().invalidate(self.path())
+            self._mtime = studiolibrary.statCache().mtime(self.path())
+        except Exception:
+            logger.exception('Cannot save the full text index "%s"', self.path())
+
+        self._changed = False
+
+    def isChanged(self):
+        """
+        Return True if the entries have changed since they were saved.
+
+        :rtype: bool
+        """
+        return self._changed
+
+    def fields(self, path):
+        """
+        Return the text fields for the given path.
+
+        :type path: str
+        :rtype: dict or None
+        """
+        entry = self.entries().get(path)
+
+        if entry:
+            return entry["fields"]
+
+        return None
+
+    def data(self):
+        """
+        Return the text fields for every path.
+
+        :rtype: dict
+        """
+        return dict(
+            (path, entry["fields"])
+            for path, entry in self.entries().items()
+        )
+
+    def updateItems(self, items):
+        """
+        Read the text fields for the given items that have changed.
+
+        Return the paths that were read again.
+
+        :type items: list[studiolibrary.LibraryItem]
+        :rtype: list[str]
+        """
+        entries = self.entries()
+        updated = []
+
+        for item in items:
+            path = item.path()
+
+            try:
+                mtime = item.mtime()
+            except OSError:
+                continue
+
+            entry = entries.get(path)
+            if entry and entry["mtime"] == mtime:
+                continue
+
+            fields = item.createTextData()
+
+            if fields:
+                entries[path] = {"mtime": mtime, "fields": fields}
+                updated.append(path)
+
+            elif entry:
+                del entries[path]
+                updated.append(path)
+
+        if updated:
+            self._changed = True
+
+        return updated
+
+    def remove(self, paths):
+        """
+        Remove the given paths and all of their children.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        entries = self.entries()
+        prefixes = tuple(path + "/" for path in paths)
+        paths = set(paths)
+
+        for path in list(entries.keys()):
+            if path in paths or path.startswith(prefixes):
+                del entries[path]
+                self._changed = True
+
+    def renamePaths(self, renames):
+        """
+        Rename the given paths and all of their children.
+
+        :type renames: list[(str, str)]
+        :rtype: None
+        """
+        entries = self.entries()
+
+        for src, dst in renames:
+            prefix = src + "/"
+
+            for path in list(entries.keys()):
+                if path == src or path.startswith(prefix):
+                    entries[dst + path[len(src):]] = entries.pop(path)
+                    self._changed = True
+
+
+def testFullTextIndex():
+    """
+    Test only the changed items are read again.
+
+    :rtype: None
+    """
+    import os
+    import shutil
+    import tempfile
+
+    class Item(object):
+
+        reads = 0
+
+        def __init__(self, path, objects):
+            self._path = path
+            self._objects = objects
+
+        def path(self):
+            return self._path
+
+        def mtime(self):
+            return studiolibrary.statCache().mtime(self._path)
+
+        def createTextData(self):
+            Item.reads += 1
+            return {"objects": " ".join(self._objects)}
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/fulltext.json"
+
+        walk = Item(root + "/anim/walk.anim", ["L_hand_ctrl", "R_hand_ctrl"])
+        smile = Item(root + "/anim/smile.pose", ["jaw_ctrl"])
+
+        for item in [walk, smile]:
+            os.makedirs(item.path())
+
+        fullText = FullTextIndex(path)
+        assert fullText.updateItems([walk, smile]) == [walk.path(), smile.path()]
+        fullText.save()
+
+        fullText = FullTextIndex(path)
+        assert fullText.fields(walk.path()) == {"objects": "L_hand_ctrl R_hand_ctrl"}
+        assert fullText.updateItems([walk, smile]) == []
+        assert Item.reads == 2
+
+        os.utime(smile.path(), (1000, 1000))
+        studiolibrary.statCache().invalidate(smile.path())
+        assert fullText.updateItems([walk, smile]) == [smile.path()]
+
+        fullText.renamePaths([(root + "/anim", root + "/poses")])
+        assert sorted(fullText.data().keys()) == [root + "/poses/smile.pose", root + "/poses/walk.anim"]
+
+        fullText.remove([root + "/poses"])
+        assert fullText.data() == {}
+
+    finally:
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testFullTextIndex()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,619 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+An inverted trigram index used to narrow down text searches.
+
+The index maps every three character sequence of a field value to the
+paths that contain it. A "contains" or "startswith" filter can then be
+answered by intersecting the paths for each trigram in the search text.
+
+The index only returns candidates. The caller still has to match the
+candidates against the queries, so the results are exactly the same as
+a linear scan.
+
+The "*" field indexes the text of the whole item data in the same way
+as Library.match.
+
+The same trigrams are used for fuzzy searches. The paths are ranked by
+the trigram similarity of the field value with the search text, with
+the exact and prefix matches first.
+
+Example:
+    import studiolibrary
+
+    index = studiolibrary.LibraryIndex()
+    index.update({
+        "/library/walk.anim": {"name": "walk.anim"},
+        "/library/run.anim": {"name": "run.anim"},
+    })
+
+    print(index.find("name", "contains", "walk"))
+    # set(["/library/walk.anim"])
+
+    print(index.findFuzzy("name", "walk"))
+    # {"/library/walk.anim": 3.5454545454545454}
+"""
+import logging
+
+
+__all__ = [
+    "LibraryIndex",
+    "findQueryCandidates",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class LibraryIndex(object):
+
+    GramSize = 3
+
+    Conditions = [
+        "contains",
+        "startswith",
+    ]
+
+    # The part of the trigrams of a fuzzy search that a text must contain
+    FuzzyThreshold = 0.5
+
+    def __init__(self):
+        # The item data is kept by reference for indexing new fields,
+        # so the records are not copied
+        self._data = {}
+        self._grams = {}
+        self._texts = {}
+        self._sizes = {}
+        self._unindexed = {}
+
+    @classmethod
+    def itemText(cls, itemData, field):
+        """
+        Return the lower case text to be indexed for the given field.
+
+        :type itemData: dict
+        :type field: str
+        :rtype: unicode or None
+        """
+        if field == "*":
+            value = unicode(itemData)
+        else:
+            value = itemData.get(field)
+
+        if isinstance(value, basestring):
+            return value.lower()
+
+        return None
+
+    @classmethod
+    def textGrams(cls, text):
+        """
+        Return all the unique trigrams in the given text.
+
+        :type text: unicode
+        :rtype: set[unicode]
+        """
+        size = cls.GramSize
+        return set(text[i:i + size] for i in range(len(text) - size + 1))
+
+    @classmethod
+    def fuzzyGrams(cls, text):
+        """
+        Return the trigrams of the text with a marker for the start.
+
+        The marker gives the first letters more weight, since they are
+        rarely mistyped.
+
+        :type text: unicode
+        :rtype: set[unicode]
+        """
+        return cls.textGrams(" " + text)
+
+    @classmethod
+    def fuzzyRank(cls, value, text):
+        """
+        Return the rank of the exact, prefix and contains matches.
+
+        The name without the extension is also an exact match.
+
+        :type value: unicode
+        :type text: unicode
+        :rtype: float
+        """
+        if text.startswith(value):
+            extension = text[len(value):]
+
+            if not extension or (extension[0] == "." and "." not in extension[1:]):
+                return 3.0
+
+            return 2.0
+
+        if len(value) >= cls.GramSize and value in text:
+            return 1.0
+
+        return 0.0
+
+    @classmethod
+    def fuzzyScore(cls, value, text):
+        """
+        Return the score of the text for a fuzzy search of the given value.
+
+        The text matches when it contains the value or enough of its
+        trigrams. The score is the rank of an exact, prefix or contains
+        match plus the trigram similarity, so closer names score higher.
+        Zero is returned if the text doesn't match.
+
+        :type value: unicode
+        :type text: unicode or None
+        :rtype: float
+        """
+        if not isinstance(text, basestring) or not value:
+            return 0.0
+
+        value = value.lower()
+        text = text.lower()
+
+        rank = cls.fuzzyRank(value, text)
+
+        if len(value) < cls.GramSize:
+            return rank
+
+        grams = cls.fuzzyGrams(value)
+        grams_ = cls.fuzzyGrams(text)
+        count = len(grams & grams_)
+
+        if not rank and count < cls.FuzzyThreshold * len(grams):
+            return 0.0
+
+        return rank + 2.0 * count / (len(grams) + len(grams_))
+
+    def fields(self):
+        """
+        Return the fields that have been indexed.
+
+        :rtype: list[str]
+        """
+        return list(self._grams.keys())
+
+    def paths(self):
+        """
+        Return all the paths in the index.
+
+        :rtype: list[str]
+        """
+        return list(self._data.keys())
+
+    def clear(self):
+        """Remove all the paths and fields from the index."""
+        self._data = {}
+        self._grams = {}
+        self._texts = {}
+        self._sizes = {}
+        self._unindexed = {}
+
+    def addField(self, field):
+        """
+        Index the given field for all the paths.
+
+        The fields are only indexed the first time they are searched.
+
+        :type field: str
+        :rtype: None
+        """
+        if field in self._grams:
+            return
+
+        self._grams[field] = {}
+        self._texts[field] = {}
+        self._sizes[field] = {}
+        self._unindexed[field] = set()
+
+        for path, itemData in self._data.items():
+            self._addPath(field, path, itemData)
+
+    def _addPath(self, field, path, itemData):
+        """
+        Add the given path to the index for the given field.
+
+        :type field: str
+        :type path: str
+        :type itemData: dict
+        :rtype: None
+        """
+        text = self.itemText(itemData, field)
+
+        if text is None:
+            # Values that are not strings cannot be indexed but
+            # they can still match, so always return them.
+            if itemData.get(field):
+                self._unindexed[field].add(path)
+            return
+
+        self._texts[field][path] = text
+
+        # The start marker is only used by fuzzy searches
+        textGrams = self.fuzzyGrams(text)
+        self._sizes[field][path] = len(textGrams)
+
+        grams = self._grams[field]
+        for gram in textGrams:
+            grams.setdefault(gram, set()).add(path)
+
+    def _removePath(self, field, path):
+        """
+        Remove the given path from the index for the given field.
+
+        :type field: str
+        :type path: str
+        :rtype: None
+        """
+        self._unindexed[field].discard(path)
+
+        text = self._texts[field].pop(path, None)
+        if text is None:
+            return
+
+        del self._sizes[field][path]
+
+        grams = self._grams[field]
+        for gram in self.fuzzyGrams(text):
+            paths = grams.get(gram)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del grams[gram]
+
+    def update(self, data):
+        """
+        Insert or update the given item data.
+
+        The data for existing paths is merged with the given data in the
+        same way as the library stores.
+
+        :type data: dict
+        :rtype: None
+        """
+        for path, itemData in data.items():
+            itemData_ = dict(self._data.get(path, {}))
+            itemData_.update(itemData)
+            self._setPath(path, itemData_)
+
+    def _setPath(self, path, itemData):
+        """
+        Replace the indexed data for the given path.
+
+        :type path: str
+        :type itemData: dict
+        :rtype: None
+        """
+        for field in self._grams:
+            self._removePath(field, path)
+            self._addPath(field, path, itemData)
+
+        self._data[path] = itemData
+
+    def isChanged(self, path, itemData):
+        """
+        Return True if the indexed text of any field is different.
+
+        The indexed text is compared instead of the item data, since
+        the item data of a record can be changed in place.
+
+        :type path: str
+        :type itemData: dict
+        :rtype: bool
+        """
+        if path not in self._data:
+            return True
+
+        if self._data[path] is itemData:
+            return False
+
+        for field in self._grams:
+            text = self.itemText(itemData, field)
+
+            if text != self._texts[field].get(path):
+                return True
+
+            if text is None and bool(itemData.get(field)) != (path in self._unindexed[field]):
+                return True
+
+        return False
+
+    def remove(self, paths):
+        """
+        Remove the given paths from the index.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        for path in paths:
+            if path in self._data:
+                for field in self._grams:
+                    self._removePath(field, path)
+                del self._data[path]
+
+    def sync(self, data):
+        """
+        Update the index so that it only contains the given data.
+
+        Only the paths that have been added, removed or changed are
+        indexed again. The given item data is kept without copying it.
+
+        :type data: dict
+        :rtype: None
+        """
+        removed = [path for path in self._data if path not in data]
+        self.remove(removed)
+
+        for path, itemData in data.items():
+            if self.isChanged(path, itemData):
+                self._setPath(path, itemData)
+            else:
+                self._data[path] = itemData
+
+    def find(self, field, cond, value):
+        """
+        Return the candidate paths for the given filter.
+
+        Return None when the filter cannot be answered by the index,
+        for example when the value is shorter than a trigram.
+
+        :type field: str
+        :type cond: str
+        :type value: object
+        :rtype: set[str] or None
+        """
+        if cond not in self.Conditions:
+            return None
+
+        if not isinstance(value, basestring):
+            return None
+
+        value = value.lower()
+
+        if len(value) < self.GramSize:
+            return None
+
+        self.addField(field)
+
+        grams = self._grams[field]
+        postings = []
+
+        for gram in self.textGrams(value):
+            paths = grams.get(gram)
+            if not paths:
+                postings = []
+                break
+            postings.append(paths)
+
+        # Intersect starting with the smallest set of paths
+        postings.sort(key=len)
+
+        if postings:
+            results = set(postings[0])
+            for paths in postings[1:]:
+                results.intersection_update(paths)
+                if not results:
+                    break
+        else:
+            results = set()
+
+        results.update(self._unindexed[field])
+
+        return results
+
+    def findFuzzy(self, field, value):
+        """
+        Return the score of each path for a fuzzy search of the field.
+
+        The paths are found by counting the trigrams they share with the
+        value, so only the paths with at least one common trigram are
+        scored. The scores are the same as fuzzyScore. Return None when
+        the value is shorter than a trigram.
+
+        :type field: str
+        :type value: str
+        :rtype: dict[str, float] or None
+        """
+        value = value.lower()
+
+        if len(value) < self.GramSize:
+            return None
+
+        self.addField(field)
+
+        grams = self._grams[field]
+        texts = self._texts[field]
+        sizes = self._sizes[field]
+
+        valueGrams = self.fuzzyGrams(value)
+        size = len(valueGrams)
+
+        minCount = self.FuzzyThreshold * size
+
+        # The rarest trigrams are counted first. A path that is not in
+        # any of them cannot reach the minimum count, so the common
+        # trigrams only need to be tested for the paths already found.
+        postings = sorted((grams.get(gram, ()) for gram in valueGrams), key=len)
+
+        counts = {}
+        get = counts.get
+
+        for i, posting in enumerate(postings):
+            if size - i >= minCount:
+                for path in posting:
+                    counts[path] = get(path, 0) + 1
+                continue
+
+            # Remove the paths that cannot reach the minimum count
+            remaining = size - i - 1
+            counts_ = {}
+
+            for path in counts:
+                count = counts[path]
+                if path in posting:
+                    count += 1
+                if count + remaining >= minCount:
+                    counts_[path] = count
+
+            counts = counts_
+
+        results = {}
+
+        for path in counts:
+            count = counts[path]
+
+            if count < minCount:
+                continue
+
+            # Only a text with all the trigrams but the start marker
+            # can contain the value
+            rank = 0.0
+            if count >= size - 1:
+                rank = self.fuzzyRank(value, texts[path])
+
+            results[path] = rank + 2.0 * count / (size + sizes[path])
+
+        return results
+
+    def findQueries(self, queries):
+        """
+        Return the candidate paths that could match all the given queries.
+
+        Return None when the queries cannot be narrowed down by the index.
+
+        :type queries: list[dict]
+        :rtype: set[str] or None
+        """
+        return findQueryCandidates(queries, self.find)
+
+
+def findQueryCandidates(queries, find):
+    """
+    Return the candidates that could match all the given queries.
+
+    The find function is called for each filter and returns a new set
+    of candidates, or None when the filter cannot be narrowed down.
+
+    Return None when the queries cannot be narrowed down.
+
+    :type queries: list[dict]
+    :type find: func
+    :rtype: set or None
+    """
+    results = None
+
+    for query in queries:
+
+        filters = query.get('filters')
+        operator = query.get('operator', 'and')
+
+        # Conditional queries are skipped when the condition fails,
+        # so they cannot be used to narrow down the results.
+        if not filters or query.get('if'):
+            continue
+
+        candidates = None
+
+        if operator == 'or':
+            candidates = set()
+            for key, cond, value in filters:
+                candidates_ = find(key, cond, value)
+                if candidates_ is None:
+                    candidates = None
+                    break
+                candidates.update(candidates_)
+
+        elif operator == 'and':
+            for key, cond, value in filters:
+                candidates_ = find(key, cond, value)
+                if candidates_ is not None:
+                    if candidates is None:
+                        candidates = candidates_
+                    else:
+                        candidates.intersection_update(candidates_)
+
+        if candidates is not None:
+            if results is None:
+                results = candidates
+            else:
+                results.intersection_update(candidates)
+
+    return results
+
+
+def testLibraryIndex():
+    """
+    Test finding, updating and removing paths in the index.
+
+    :rtype: None
+    """
+    index = LibraryIndex()
+    index.update({
+        "/library/walk.anim": {"name": "walk.anim", "folder": "/library"},
+        "/library/run.anim": {"name": "run.anim", "folder": "/library"},
+        "/library/hands/fist.pose": {"name": "fist.pose", "folder": "/library/hands"},
+    })
+
+    assert index.find("name", "contains", "WALK") == set(["/library/walk.anim"])
+    assert index.find("name", "startswith", "run") == set(["/library/run.anim"])
+    assert index.find("name", "contains", "an") is None
+    assert index.find("name", "is", "walk.anim") is None
+    assert index.find("*", "contains", "hands") == set(["/library/hands/fist.pose"])
+    assert len(index.find("folder", "startswith", "/library")) == 3
+
+    queries = [
+        {"operator": "or", "filters": [("name", "contains", "walk"), ("name", "contains", "fist")]},
+        {"filters": [("*", "contains", "hands")]},
+    ]
+    assert index.findQueries(queries) == set(["/library/hands/fist.pose"])
+    assert index.findQueries([{"filters": [("name", "is", "walk")]}]) is None
+
+    index.update({"/library/walk.anim": {"name": "jog.anim"}})
+    assert index.find("name", "contains", "walk") == set()
+    assert index.find("name", "contains", "jog") == set(["/library/walk.anim"])
+
+    index.remove(["/library/walk.anim"])
+    assert index.find("name", "contains", "jog") == set()
+
+    scores = index.findFuzzy("name", "fist")
+    assert list(scores.keys()) == ["/library/hands/fist.pose"]
+    assert scores["/library/hands/fist.pose"] == LibraryIndex.fuzzyScore("fist", "fist.pose")
+    assert scores["/library/hands/fist.pose"] > 3
+
+    index.update({"/library/walk_cycle.anim": {"name": "walk_cycle.anim"}})
+    scores = index.findFuzzy("name", "walk_cylce")
+    assert list(scores.keys()) == ["/library/walk_cycle.anim"]
+    assert scores["/library/walk_cycle.anim"] == LibraryIndex.fuzzyScore("walk_cylce", "walk_cycle.anim")
+    assert index.findFuzzy("name", "cycle") == {"/library/walk_cycle.anim": LibraryIndex.fuzzyScore("cycle", "walk_cycle.anim")}
+    assert index.findFuzzy("name", "ru") is None
+
+    data = {"/library/run.anim": {"name": "sprint.anim"}}
+    index.sync(data)
+    assert index.paths() == ["/library/run.anim"]
+    assert index.find("*", "contains", "fist") == set()
+    assert index.find("name", "contains", "sprint") == set(["/library/run.anim"])
+
+    # The item data that was changed in place is indexed again
+    data["/library/run.anim"]["name"] = "dash.anim"
+    index.sync({"/library/run.anim": {"name": "dash.anim"}})
+    assert index.find("name", "contains", "dash") == set(["/library/run.anim"])
+    assert not index.isChanged("/library/run.anim", {"name": "DASH.anim"})
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testLibraryIndex()
+
+
+if __name__ == "__main__":
+    runTests()
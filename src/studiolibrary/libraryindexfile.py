@@ -0,0 +1,322 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A prebuilt read-only index of the library database in a binary file.
+
+The index file is written by a headless job after syncing the library
+and is read by each session with a memory map. It contains the item
+data for every path and the directory snapshot, so a session can open
+the library without walking it.
+
+The file starts with a fixed header followed by one length prefixed
+json record per item and the json snapshot at the end. Paths are stored
+relative to the index file, in the same way as the json database.
+
+Example:
+    import studiolibrary
+
+    studiolibrary.writeIndexFile(
+        "/library/.studiolibrary/index.bin",
+        {"/library/walk.anim": {"name": "walk.anim"}},
+    )
+
+    with studiolibrary.IndexFile("/library/.studiolibrary/index.bin") as index:
+        print(index.count(), index.read())
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import logging
+
+import studiolibrary
+
+
+__all__ = [
+    "IndexFile",
+    "writeIndexFile",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# The magic, version, record count, build id and snapshot offset
+_Header = struct.Struct("<4sIIQQ")
+
+# The size of each record
+_Size = struct.Struct("<I")
+
+
+class IndexFile(object):
+
+    Magic = b"SLIX"
+    Version = 1
+
+    def __init__(self, path):
+        """
+        :type path: str
+        """
+        self._path = studiolibrary.normPath(path)
+        self._file = None
+        self._mmap = None
+        self._header = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def path(self):
+        """
+        Return the location of the index file on disc.
+
+        :rtype: str
+        """
+        return self._path
+
+    def isOpen(self):
+        """
+        Return True if the index file is mapped into memory.
+
+        :rtype: bool
+        """
+        return self._mmap is not None
+
+    def open(self):
+        """
+        Map the index file into memory as read-only.
+
+        Return False if the file doesn't exist or isn't a valid index.
+
+        :rtype: bool
+        """
+        if self.isOpen():
+            return True
+
+        try:
+            f = open(self.path(), "rb")
+        except (IOError, OSError):
+            return False
+
+        try:
+            buffer_ = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, EnvironmentError):
+            # An empty file cannot be mapped
+            f.close()
+            return False
+
+        header = None
+
+        if len(buffer_) >= _Header.size:
+            header = _Header.unpack_from(buffer_, 0)
+
+        if not header or header[0] != self.Magic or header[1] != self.Version:
+            logger.warning('Cannot read the index file "%s"', self.path())
+            buffer_.close()
+            f.close()
+            return False
+
+        self._file = f
+        self._mmap = buffer_
+        self._header = header
+
+        return True
+
+    def close(self):
+        """
+        Unmap and close the index file.
+
+        The file isn't kept open, so the job can replace it on Windows.
+
+        :rtype: None
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+
+        self._file = None
+        self._mmap = None
+        self._header = None
+
+    def count(self):
+        """
+        Return the number of items in the index.
+
+        :rtype: int
+        """
+        if self.open():
+            return self._header[2]
+        return 0
+
+    def buildId(self):
+        """
+        Return the id of the build that wrote the index.
+
+        The id is the time of the build in milliseconds.
+
+        :rtype: int
+        """
+        if self.open():
+            return self._header[3]
+        return 0
+
+    def _decode(self, start, end):
+        """
+        Return the json object stored between the given offsets.
+
+        :type start: int
+        :type end: int
+        :rtype: object
+        """
+        text = self._mmap[start:end].decode("utf-8")
+        return json.loads(studiolibrary.absPath(text, self.path()))
+
+    def read(self):
+        """
+        Return the item data for every path in the index.
+
+        :rtype: dict
+        """
+        data = {}
+
+        if not self.open():
+            return data
+
+        offset = _Header.size
+
+        for i in range(self.count()):
+            size, = _Size.unpack_from(self._mmap, offset)
+            offset += _Size.size
+
+            path, itemData = self._decode(offset, offset + size)
+            data[path] = itemData
+
+            offset += size
+
+        return data
+
+    def snapshotEntries(self):
+        """
+        Return the directory snapshot entries that were saved with the index.
+
+        :rtype: dict
+        """
+        if not self.open():
+            return {}
+
+        return self._decode(self._header[4], len(self._mmap)) or {}
+
+
+def writeIndexFile(path, data, snapshotEntries=None):
+    """
+    Write the given item data and snapshot entries to an index file.
+
+    The index is written to a temporary file first and then renamed, so
+    sessions reading the index never see a partly written file.
+
+    :type path: str
+    :type data: dict
+    :type snapshotEntries: dict or None
+    :rtype: int
+    """
+    path = studiolibrary.normPath(path)
+
+    dirname = os.path.dirname(path)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    buildId = int(time.time() * 1000)
+    tmp = "{0}.{1}.tmp".format(path, os.getpid())
+
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * _Header.size)
+
+        for key in sorted(data.keys()):
+            text = json.dumps([key, data[key]])
+            text = studiolibrary.relPath(text, path).encode("utf-8")
+
+            f.write(_Size.pack(len(text)))
+            f.write(text)
+
+        snapshotOffset = f.tell()
+
+        text = json.dumps(snapshotEntries or {})
+        f.write(studiolibrary.relPath(text, path).encode("utf-8"))
+
+        f.seek(0)
+        f.write(_Header.pack(IndexFile.Magic, IndexFile.Version, len(data), buildId, snapshotOffset))
+
+    # Windows cannot rename over an existing file
+    if os.name == "nt" and os.path.exists(path):
+        os.remove(path)
+
+    os.rename(tmp, path)
+
+    logger.info(u'Wrote %s items to the index "%s"', len(data), path)
+
+    return len(data)
+
+
+def testIndexFile():
+    """
+    Test writing and reading back an index file.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/index.bin"
+        data = {
+            root + "/anim/walk.anim": {"name": "walk.anim", "folder": root + "/anim"},
+            root + u"/anim/caf\xe9.pose": {"name": u"caf\xe9.pose"},
+        }
+        entries = {"anim": {"mtime": 1.0, "dirs": [], "items": ["walk.anim"]}}
+
+        with IndexFile(path) as index:
+            assert not index.isOpen()
+            assert index.read() == {}
+
+        assert writeIndexFile(path, data, entries) == 2
+
+        with IndexFile(path) as index:
+            assert index.count() == 2
+            assert index.buildId() > 0
+            assert index.read() == data
+            assert index.snapshotEntries() == entries
+
+        # The paths are stored relative to the index file
+        with open(path, "rb") as f:
+            assert root.encode("utf-8") not in f.read()
+
+        with open(path, "wb") as f:
+            f.write(b"SLIX")
+
+        assert not IndexFile(path).open()
+
+    finally:
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testIndexFile()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -62,6 +62,9 @@ class LibraryItem(studiolibrary.widgets.Item):
     Extension = ""
     Extensions = []
 
+    # Match any directory that isn't matched by the other items
+    MatchDirectories = False
+
     MenuName = ""
     MenuOrder = 10
     MenuIconPath = ""
@@ -134,12 +137,19 @@ class LibraryItem(studiolibrary.widgets.Item):
         """
         Return True if the given path location is supported by the item.
 
+        Items are found by their extensions without calling this method,
+        unless the method is reimplemented.
+
         :type path: str
         :rtype: bool 
         """
         for ext in cls.Extensions:
             if path.endswith(ext):
                 return True
+
+        if cls.MatchDirectories:
+            return os.path.isdir(path)
+
         return False
 
     def __init__(
@@ -481,13 +491,13 @@ class LibraryItem(studiolibrary.widgets.Item):
         """
         :rtype: bool
         """
-        return os.path.exists(self.path())
+        return studiolibrary.statCache().exists(self.path())
 
     def mtime(self):
         """
         :rtype: float
         """
-        return os.path.getmtime(self.path())
+        return studiolibrary.statCache().mtime(self.path())
 
     def ctime(self):
         """
@@ -495,10 +505,10 @@ class LibraryItem(studiolibrary.widgets.Item):
 
         :rtype: str
         """
-        path = self.path()
+        stat = studiolibrary.statCache().stat(self.path())
 
-        if os.path.exists(path):
-            return int(os.path.getctime(path))
+        if stat is not None:
+            return int(stat.st_ctime)
 
         return None
 
@@ -664,9 +674,77 @@ class LibraryItem(studiolibrary.widgets.Item):
 
         return itemData
 
+    def createSummaryData(self):
+        """
+        Return the item data that has to be read from the item's files.
+
+        This is only called when the item is synced or saved, so creating
+        items from the database doesn't read any files.
+
+        :rtype: dict
+        """
+        return {}
+
+    def summaryMtime(self):
+        """
+        Return the mtime of the file that the summary data is read from.
+
+        :raises: OSError
+        :rtype: float
+        """
+        return self.mtime()
+
+    def isSummaryChanged(self, itemData):
+        """
+        Return True if the summary in the given item data is out of date.
+
+        The summary is only read again for new items and for items whose
+        file has changed since it was read.
+
+        :type itemData: dict
+        :rtype: bool
+        """
+        try:
+            return itemData.get("summaryMtime") != self.summaryMtime()
+        except OSError:
+            return True
+
+    def updateSummaryData(self):
+        """
+        Read the summary data from disc into a new item data dict.
+
+        The item data is shared with the library records, so it is
+        replaced instead of changed. Use saveItemData to write it to the
+        library, which also updates the search index and columns.
+        """
+        summary = self.createSummaryData()
+
+        if summary:
+            try:
+                summary["summaryMtime"] = self.summaryMtime()
+            except OSError:
+                pass
+
+        itemData = dict(self.itemData())
+        itemData.update(summary)
+
+        self.setItemData(itemData)
+
+    def createTextData(self):
+        """
+        Return the text fields that can be searched, such as the comment.
+
+        The text is read when syncing and only read again when the item
+        mtime changes.
+
+        :rtype: dict
+        """
+        return {}
+
     def saveItemData(self):
         """Sync the item data to the database """
         self.updateItemData()
+        self.updateSummaryData()
         if self.library():
             self.library().updateItem(self)
 
@@ -719,6 +797,7 @@ class LibraryItem(studiolibrary.widgets.Item):
         self.write(tempPath, *args, **kwargs)
 
         shutil.move(tempPath, path)
+        studiolibrary.statCache().invalidate(path)
 
         self.saveItemData()
 
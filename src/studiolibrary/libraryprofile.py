@@ -0,0 +1,321 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Record how long each stage of a search takes.
+
+Each stage is timed with a span. When profiling is disabled the shared
+NullSearchProfile is used, which returns the same empty span for every
+stage, so the instrumented code costs almost nothing.
+
+Example:
+    import studiolibrary
+
+    profile = studiolibrary.SearchProfile()
+
+    with profile.span("match"):
+        results = [r for r in records if match(r.itemData())]
+
+    profile.finish()
+    print(profile.summary())
+    # match 0.012s
+"""
+import os
+import json
+import time
+import logging
+import logging.handlers
+import collections
+
+
+__all__ = [
+    "SearchProfile",
+    "NullSearchProfile",
+    "logSearchProfile",
+]
+
+logger = logging.getLogger(__name__)
+
+_profileLoggers = {}
+
+
+class _Span(object):
+
+    __slots__ = ("_profile", "_name", "_start")
+
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.time()
+        self._profile._depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self._profile._depth -= 1
+        self._profile.add(self._name, time.time() - self._start, self._profile._depth)
+
+
+class _NullSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class SearchProfile(object):
+
+    def __init__(self):
+        self._spans = []
+        self._depth = 0
+        self._startTime = time.time()
+        self._endTime = None
+        self._info = {}
+
+    def __nonzero__(self):
+        return True
+
+    def span(self, name):
+        """
+        Return a context manager that times the given stage.
+
+        :type name: str
+        :rtype: object
+        """
+        return _Span(self, name)
+
+    def add(self, name, duration, depth=0):
+        """
+        Add the time taken by the given stage.
+
+        :type name: str
+        :type duration: float
+        :type depth: int
+        :rtype: None
+        """
+        self._spans.append((name, duration, depth))
+
+    def setInfo(self, key, value):
+        """
+        Set extra information about the search, such as the result count.
+
+        :type key: str
+        :type value: object
+        :rtype: None
+        """
+        self._info[key] = value
+
+    def finish(self):
+        """
+        Set the end time of the search.
+
+        :rtype: None
+        """
+        self._endTime = time.time()
+
+    def spans(self):
+        """
+        Return the name, duration and depth of each span in order.
+
+        :rtype: list[(str, float, int)]
+        """
+        return list(self._spans)
+
+    def totals(self, depth=0):
+        """
+        Return the total time for each stage at the given depth.
+
+        Nested stages, like checking the database inside creating the
+        records, have a depth greater than zero.
+
+        :type depth: int or None
+        :rtype: collections.OrderedDict
+        """
+        totals = collections.OrderedDict()
+
+        for name, duration, depth_ in self._spans:
+            if depth is None or depth == depth_:
+                totals[name] = totals.get(name, 0.0) + duration
+
+        return totals
+
+    def totalTime(self):
+        """
+        Return the time from the start to the end of the search.
+
+        :rtype: float
+        """
+        endTime = self._endTime or time.time()
+        return endTime - self._startTime
+
+    def summary(self):
+        """
+        Return a short description of the time taken by each stage.
+
+        :rtype: str
+        """
+        return ", ".join(
+            "{0} {1:.3f}s".format(name, duration)
+            for name, duration in self.totals().items()
+        )
+
+    def toDict(self):
+        """
+        Return the profile as a dict that can be saved as json.
+
+        :rtype: dict
+        """
+        data = {
+            "time": self._startTime,
+            "total": self.totalTime(),
+            "stages": self.totals(),
+            "spans": [
+                {"name": name, "duration": duration, "depth": depth}
+                for name, duration, depth in self._spans
+            ],
+        }
+
+        data.update(self._info)
+
+        return data
+
+
+class NullSearchProfile(object):
+    """A profile that doesn't record anything when profiling is disabled."""
+
+    _span = _NullSpan()
+
+    def __nonzero__(self):
+        return False
+
+    def span(self, name):
+        return self._span
+
+    def add(self, name, duration, depth=0):
+        pass
+
+    def setInfo(self, key, value):
+        pass
+
+    def finish(self):
+        pass
+
+
+def logSearchProfile(profile, path, maxBytes=1048576, backupCount=3):
+    """
+    Append the given profile as a json line to the given rolling log file.
+
+    The log file is rolled over when it's larger than maxBytes.
+
+    :type profile: SearchProfile
+    :type path: str
+    :type maxBytes: int
+    :type backupCount: int
+    :rtype: None
+    """
+    profileLogger = _profileLoggers.get(path)
+
+    if profileLogger is None:
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        profileLogger = logging.getLogger("studiolibrary.searchprofile." + str(len(_profileLoggers)))
+        profileLogger.propagate = False
+        profileLogger.setLevel(logging.INFO)
+
+        try:
+            handler = logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=maxBytes,
+                backupCount=backupCount,
+            )
+        except (IOError, OSError):
+            logger.exception('Cannot open the search profile log "%s"', path)
+            return
+
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        profileLogger.addHandler(handler)
+
+        _profileLoggers[path] = profileLogger
+
+    profileLogger.info(json.dumps(profile.toDict()))
+
+
+def testSearchProfile():
+    """
+    Test recording the stages of a search.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    profile = SearchProfile()
+
+    with profile.span("createRecords"):
+        with profile.span("isDirty"):
+            pass
+
+    with profile.span("match"):
+        pass
+
+    with profile.span("createRecords"):
+        pass
+
+    profile.setInfo("resultCount", 3)
+    profile.finish()
+
+    assert list(profile.totals().keys()) == ["createRecords", "match"]
+    assert list(profile.totals(depth=1).keys()) == ["isDirty"]
+    assert profile.toDict()["resultCount"] == 3
+    assert len(profile.toDict()["spans"]) == 4
+    assert profile.summary().startswith("createRecords ")
+
+    null = NullSearchProfile()
+    assert not null
+
+    with null.span("match"):
+        pass
+
+    root = tempfile.mkdtemp()
+
+    try:
+        path = os.path.join(root, "profile.log")
+
+        logSearchProfile(profile, path)
+        logSearchProfile(profile, path)
+
+        with open(path) as f:
+            lines = f.readlines()
+
+        assert len(lines) == 2
+        assert json.loads(lines[0])["stages"]["match"] >= 0
+
+    finally:
+        for handler in _profileLoggers.pop(path).handlers:
+            handler.close()
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testSearchProfile()
+
+
+if __name__ == "__main__":
+    runTests()
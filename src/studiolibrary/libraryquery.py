@@ -0,0 +1,547 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Compile search queries into a single predicate function.
+
+The queries have the same structure as the ones used by Library.match.
+The filter values are lower cased once, the filters are ordered so the
+cheapest are tested first, and the predicate stops as soon as the
+result is known.
+
+Compiled queries are cached by their content, so running the same
+search again doesn't compile the queries again.
+
+Example:
+    import studiolibrary
+
+    queries = [
+        {
+            'operator': 'or',
+            'filters': [
+                ('folder', 'is', '/library/proj/test'),
+                ('folder', 'startswith', '/library/proj/test/'),
+            ]
+        },
+        {
+            'filters': [('*', 'contains', 'walk')]
+        }
+    ]
+
+    match = studiolibrary.compileQueries(queries)
+    print(match({"folder": "/library/proj/test", "name": "walk.anim"}))
+    # True
+"""
+import logging
+import collections
+
+import studiolibrary
+
+
+__all__ = [
+    "compileQueries",
+    "clearCompiledQueries",
+    "isNarrowerQueries",
+    "queriesKey",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# The relative cost of each condition. The "*" field is much more
+# expensive since the whole item data has to be converted to text.
+CONDITION_COSTS = {
+    "is": 1,
+    "not": 1,
+    "startswith": 2,
+    "endswith": 2,
+    "not_startswith": 2,
+    "not_endswith": 2,
+    "contains": 3,
+    "not_contains": 3,
+    "fuzzy": 4,
+}
+
+ALL_FIELDS_COST = 10
+
+MAX_CACHE_SIZE = 100
+
+_cache = collections.OrderedDict()
+
+
+def clearCompiledQueries():
+    """
+    Clear the cache of compiled queries.
+
+    :rtype: None
+    """
+    _cache.clear()
+
+
+def queriesKey(queries):
+    """
+    Return a hashable key for the content of the given queries.
+
+    Return None if the queries contain values that cannot be hashed.
+
+    :type queries: list[dict]
+    :rtype: tuple or None
+    """
+    key = []
+
+    for query in queries:
+        conditional = query.get('if')
+        if conditional:
+            conditional = tuple(conditional)
+
+        filters = tuple(tuple(f) for f in query.get('filters') or [])
+        key.append((conditional, query.get('operator', 'and'), filters))
+
+    key = tuple(key)
+
+    try:
+        hash(key)
+    except TypeError:
+        return None
+
+    return key
+
+
+def compileQueries(queries):
+    """
+    Return a function that matches item data with the given queries.
+
+    :type queries: list[dict]
+    :rtype: func
+    """
+    key = queriesKey(queries)
+
+    if key is not None and key in _cache:
+        # Move the compiled queries to the end of the cache
+        match = _cache.pop(key)
+        _cache[key] = match
+        return match
+
+    match = _compileQueries(queries)
+
+    if key is not None:
+        _cache[key] = match
+        if len(_cache) > MAX_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+    return match
+
+
+def _compileQueries(queries):
+    """
+    Compile the given queries without using the cache.
+
+    :type queries: list[dict]
+    :rtype: func
+    """
+    compiled = []
+
+    for query in queries:
+        result = _compileQuery(query)
+        if result:
+            compiled.append(result)
+
+    # All the queries have to match, so the cheapest are tested first
+    compiled.sort(key=lambda result: result[0])
+    tests = [test for cost, test in compiled]
+
+    def match(data):
+        texts = []
+        for test in tests:
+            if not test(data, texts):
+                return False
+        return True
+
+    return match
+
+
+def _compileQuery(query):
+    """
+    Return the cost and test function for the given query.
+
+    Return None if the query doesn't have any filters.
+
+    :type query: dict
+    :rtype: (int, func) or None
+    """
+    filters = query.get('filters')
+    operator = query.get('operator', 'and')
+    conditional = query.get('if')
+
+    if not filters:
+        return None
+
+    compiled = [_compileFilter(*f) for f in filters]
+
+    # Only "and" and "or" queries can be tested in any order. The result
+    # of any other operator is the result of the last filter.
+    if operator in ('and', 'or'):
+        compiled.sort(key=lambda result: result[0])
+
+    cost = sum(result[0] for result in compiled)
+    tests = [test for cost_, test in compiled]
+
+    if operator == 'or':
+        def matchFilters(data, texts):
+            for test in tests:
+                if test(data, texts):
+                    return True
+            return False
+
+    elif operator == 'and':
+        def matchFilters(data, texts):
+            for test in tests:
+                if not test(data, texts):
+                    return False
+            return True
+
+    else:
+        def matchFilters(data, texts):
+            match = False
+            for test in tests:
+                match = test(data, texts)
+            return match
+
+    if not conditional:
+        return cost, matchFilters
+
+    conditionalCost, conditionalTest = _compileFilter(*conditional)
+
+    def matchQuery(data, texts):
+        if not conditionalTest(data, texts):
+            return True
+        return matchFilters(data, texts)
+
+    return cost + conditionalCost, matchQuery
+
+
+def _compileFilter(key, cond, value):
+    """
+    Return the cost and test function for the given filter.
+
+    :type key: str
+    :type cond: str
+    :type value: object
+    :rtype: (int, func)
+    """
+    if isinstance(value, basestring):
+        value = value.lower()
+
+    cost = CONDITION_COSTS.get(cond, 0)
+
+    if key == '*':
+        cost += ALL_FIELDS_COST
+
+        # The text is only created once per item for all the filters
+        def itemValue(data, texts):
+            if not texts:
+                texts.append(unicode(data).lower())
+            return texts[0]
+
+    else:
+        def itemValue(data, texts):
+            value_ = data.get(key)
+            if isinstance(value_, basestring):
+                return value_.lower()
+            return value_
+
+    if cond == 'contains':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value in value_
+
+    elif cond == 'not_contains':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value not in value_
+
+    elif cond == 'is':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value == value_
+
+    elif cond == 'not':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value != value_
+
+    elif cond == 'startswith':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value_.startswith(value)
+
+    elif cond == 'endswith':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and value_.endswith(value)
+
+    elif cond == 'not_startswith':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and not value_.startswith(value)
+
+    elif cond == 'not_endswith':
+        def test(data, texts):
+            value_ = itemValue(data, texts)
+            return bool(value_) and not value_.endswith(value)
+
+    elif cond == 'fuzzy':
+        fuzzyScore = studiolibrary.LibraryIndex.fuzzyScore
+
+        def test(data, texts):
+            return fuzzyScore(value, itemValue(data, texts)) > 0
+
+    else:
+        logger.debug('Unsupported search condition "%s"', cond)
+
+        def test(data, texts):
+            return False
+
+    return cost, test
+
+
+def isNarrowerFilter(filter_, previous):
+    """
+    Return True if all the data matching the filter matches the previous filter.
+
+    :type filter_: (str, str, object)
+    :type previous: (str, str, object)
+    :rtype: bool
+    """
+    if tuple(filter_) == tuple(previous):
+        return True
+
+    key, cond, value = filter_
+    key_, cond_, value_ = previous
+
+    if key != key_ or cond != cond_:
+        return False
+
+    if not isinstance(value, basestring) or not isinstance(value_, basestring):
+        return False
+
+    value = value.lower()
+    value_ = value_.lower()
+
+    if cond == 'contains':
+        return value_ in value
+
+    elif cond == 'not_contains':
+        return value in value_
+
+    elif cond == 'startswith':
+        return value.startswith(value_)
+
+    elif cond == 'endswith':
+        return value.endswith(value_)
+
+    elif cond == 'not_startswith':
+        return value_.startswith(value)
+
+    elif cond == 'not_endswith':
+        return value_.endswith(value)
+
+    return value == value_
+
+
+def isNarrowerQuery(query, previous):
+    """
+    Return True if all the data matching the query matches the previous query.
+
+    :type query: dict
+    :type previous: dict
+    :rtype: bool
+    """
+    filters = query.get('filters')
+    filters_ = previous.get('filters')
+
+    # The previous query was skipped, so it matched everything
+    if not filters_:
+        return True
+
+    if not filters:
+        return False
+
+    conditional = query.get('if')
+    conditional_ = previous.get('if')
+
+    if (conditional or conditional_) and \
+            tuple(conditional or ()) != tuple(conditional_ or ()):
+        return False
+
+    operator = query.get('operator', 'and')
+
+    if operator != previous.get('operator', 'and'):
+        return False
+
+    if operator == 'and':
+        # Every previous filter has to be implied by one of the new filters
+        for filter_ in filters_:
+            if not any(isNarrowerFilter(f, filter_) for f in filters):
+                return False
+        return True
+
+    elif operator == 'or':
+        # Every new filter has to imply one of the previous filters
+        for filter_ in filters:
+            if not any(isNarrowerFilter(filter_, f) for f in filters_):
+                return False
+        return True
+
+    # The result of any other operator depends on the filter order
+    key = queriesKey([query])
+    return key is not None and key == queriesKey([previous])
+
+
+def isNarrowerQueries(queries, previous):
+    """
+    Return True if the queries can only match a subset of the previous queries.
+
+    The queries are paired by name, so all the queries must have a
+    unique name. New queries can only narrow down the results.
+
+    :type queries: list[dict]
+    :type previous: list[dict]
+    :rtype: bool
+    """
+    queries_ = {}
+
+    for query in queries:
+        name = query.get('name')
+        if name is None or name in queries_:
+            return False
+        queries_[name] = query
+
+    names = set()
+
+    for query in previous:
+        name = query.get('name')
+        if name is None or name in names:
+            return False
+        names.add(name)
+
+        if name in queries_:
+            if not isNarrowerQuery(queries_[name], query):
+                return False
+
+        elif query.get('filters'):
+            return False
+
+    return True
+
+
+def testCompileQueries():
+    """
+    Test the compiled queries give the same results as Library.match.
+
+    :rtype: None
+    """
+    data = {'name': 'Red', 'folder': '/library/colors', 'index': 3}
+
+    queries = [{'filters': [('name', 'is', 'red')]}]
+    assert compileQueries(queries)(data)
+
+    queries = [{'filters': [('name', 'startswith', 'ed')]}]
+    assert not compileQueries(queries)(data)
+
+    queries = [{
+        'operator': 'or',
+        'filters': [('name', 'is', 'pink'), ('name', 'is', 'RED')]
+    }]
+    assert compileQueries(queries)(data)
+
+    queries = [{
+        'operator': 'and',
+        'filters': [('name', 'is', 'red'), ('index', 'is', '3')]
+    }]
+    assert not compileQueries(queries)(data)
+
+    queries = [
+        {'filters': [('*', 'contains', 'COLORS')]},
+        {'filters': [('*', 'not_contains', 'blue')]},
+    ]
+    assert compileQueries(queries)(data)
+
+    queries = [{
+        'if': ('folder', 'is', '/library/shapes'),
+        'filters': [('name', 'is', 'blue')]
+    }]
+    assert compileQueries(queries)(data)
+
+    queries = [{
+        'if': ('folder', 'is', '/library/colors'),
+        'filters': [('name', 'is', 'blue')]
+    }]
+    assert not compileQueries(queries)(data)
+
+    queries = [{'filters': [('missing', 'not', 'blue')]}]
+    assert not compileQueries(queries)(data)
+
+    queries = [{'filters': [('name', 'not_startswith', 'bl'), ('name', 'not_endswith', 'ue')]}]
+    assert compileQueries(queries)(data)
+
+    queries = [{'filters': [('name', 'not_endswith', 'ED')]}]
+    assert not compileQueries(queries)(data)
+
+    data = {'name': 'walk_cycle.anim'}
+
+    queries = [{'filters': [('name', 'fuzzy', 'walk_cylce')]}]
+    assert compileQueries(queries)(data)
+
+    queries = [{'filters': [('name', 'fuzzy', 'run')]}]
+    assert not compileQueries(queries)(data)
+
+    # Queries with the same content share the compiled function
+    queries1 = [{'name': 'a', 'filters': [('name', 'is', 'red')]}]
+    queries2 = [{'name': 'b', 'filters': [('name', 'is', 'red')]}]
+    assert compileQueries(queries1) is compileQueries(queries2)
+
+
+def testNarrowerQueries():
+    """
+    Test detecting when queries narrow down the previous queries.
+
+    :rtype: None
+    """
+    def search(text, operator='and'):
+        filters = [('*', 'contains', word) for word in text.split()]
+        return {'name': 'search', 'operator': operator, 'filters': filters}
+
+    folder = {'name': 'folder', 'filters': [('folder', 'startswith', '/library/')]}
+
+    assert isNarrowerQueries([search('walk')], [search('wal')])
+    assert isNarrowerQueries([search('walk run')], [search('walk')])
+    assert isNarrowerQueries([search('WALK_run')], [search('walk')])
+    assert isNarrowerQueries([search('walk')], [search('')])
+    assert isNarrowerQueries([search('walk'), folder], [search('walk')])
+
+    assert not isNarrowerQueries([search('wal')], [search('walk')])
+    assert not isNarrowerQueries([search('run')], [search('walk')])
+    assert not isNarrowerQueries([search('')], [search('walk')])
+    assert not isNarrowerQueries([search('walk')], [search('walk'), folder])
+    assert not isNarrowerQueries([search('walk run', 'or')], [search('walk', 'or')])
+
+    assert isNarrowerQueries([search('walk', 'or')], [search('walk run', 'or')])
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testCompileQueries()
+    testNarrowerQueries()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,296 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Parse the text from the search field into a query.
+
+The search text is a list of terms separated by spaces:
+
+    walk                any field contains "walk"
+    "big smile"         any field contains the quoted phrase
+    owner:hovel         the owner is "hovel"
+    type:pose           the type is ".pose"
+    folder:/library/a   the folder starts with "/library/a"
+    comment:smile       the comment contains "smile"
+    walk*               the name starts with "walk"
+    *_ctrl              the name ends with "_ctrl"
+    -run                any field doesn't contain "run"
+    -type:anim          the type isn't ".anim"
+
+In the fuzzy mode the words without a field or wildcard search the item
+name for similar names instead, so "wlak" still finds "walk.anim".
+
+The query has the same format as the queries used by Library.match.
+The "indexed" key lists the filters that the library can look up in the
+sorted columns, so they are found before the other filters are matched.
+
+Example:
+    import studiolibrary
+
+    query = studiolibrary.parseQuery('owner:hovel type:pose -"big smile"')
+
+    print(query["filters"])
+    # [('owner', 'is', 'hovel'), ('type', 'is', '.pose'), ('*', 'not_contains', 'big smile')]
+"""
+import re
+import logging
+
+import studiolibrary
+
+
+__all__ = [
+    "parseQuery",
+]
+
+logger = logging.getLogger(__name__)
+
+
+# The condition used for the value of each field. Fields that are not
+# listed use "contains" and words without a field search all the fields.
+FieldConditions = {
+    "type": "is",
+    "owner": "is",
+    "category": "is",
+    "name": "contains",
+    "path": "contains",
+    "folder": "contains",
+    "comment": "contains",
+    "description": "contains",
+    "objects": "contains",
+}
+
+FieldAliases = {
+    "user": "owner",
+}
+
+# The conditions that can be looked up in the sorted columns or the index
+IndexedConditions = [
+    "is",
+    "startswith",
+    "fuzzy",
+]
+
+NegatedConditions = {
+    "is": "not",
+    "contains": "not_contains",
+    "startswith": "not_startswith",
+    "endswith": "not_endswith",
+}
+
+# An optional minus, an optional field and a quoted phrase or a word.
+# The closing quote is optional while the phrase is being typed.
+_Term = re.compile(r'\s*(-?)(?:(\w+):)?(?:"([^"]*)"?|(\S*))')
+
+
+def parseTerms(text):
+    """
+    Return the negation, field, value and if it was quoted for each term.
+
+    Unknown fields are kept as part of the value, so the namespace in
+    "char:L_hand_ctrl" is still searched as text.
+
+    :type text: str
+    :rtype: list[(bool, str or None, str, bool)]
+    """
+    terms = []
+    pos = 0
+
+    while pos < len(text):
+        match = _Term.match(text, pos)
+
+        if not match or match.end() == pos:
+            pos += 1
+            continue
+
+        pos = match.end()
+
+        negate, field, phrase, word = match.groups()
+        value = phrase if phrase is not None else word
+
+        if field:
+            field = field.lower()
+            field = FieldAliases.get(field, field)
+
+            if field not in FieldConditions:
+                value = match.group(2) + ":" + value
+                field = None
+
+        if value:
+            terms.append((bool(negate), field, value, phrase is not None))
+
+    return terms
+
+
+def typeValue(value):
+    """
+    Return the item type for the given type name, such as ".pose" for "pose".
+
+    :type value: str
+    :rtype: str
+    """
+    if value.startswith("."):
+        return value
+
+    for cls in studiolibrary.registeredItems():
+        for extension in cls.Extensions:
+            if extension.lower() == "." + value.lower():
+                return extension
+
+    return value
+
+
+def termFilter(field, value, isPhrase=False, fuzzy=False):
+    """
+    Return the filter for the given field and value.
+
+    :type field: str or None
+    :type value: str
+    :type isPhrase: bool
+    :type fuzzy: bool
+    :rtype: (str, str, str)
+    """
+    cond = FieldConditions.get(field, "contains")
+
+    if fuzzy and not field and not isPhrase and "*" not in value:
+        return ("name", "fuzzy", value)
+
+    if not isPhrase:
+        startswith = value.endswith("*")
+        endswith = value.startswith("*")
+        value = value.strip("*")
+
+        if startswith and endswith:
+            cond = "contains"
+        elif startswith:
+            cond = "startswith"
+        elif endswith:
+            cond = "endswith"
+
+        # Wildcards without a field match the item name
+        if (startswith or endswith) and not field:
+            field = "name"
+
+    if field == "type" and cond == "is":
+        value = typeValue(value)
+
+    elif field == "folder" and cond == "contains" and value.startswith("/"):
+        # An absolute folder also matches the sub folders
+        cond = "startswith"
+
+    return (field or "*", cond, value)
+
+
+def parseQuery(text, operator="and", name=None, fuzzy=False):
+    """
+    Return the query for the given search text.
+
+    :type text: str
+    :type operator: str
+    :type name: str or None
+    :type fuzzy: bool
+    :rtype: dict
+    """
+    filters = []
+    indexed = []
+
+    for negate, field, value, isPhrase in parseTerms(text):
+        filter_ = termFilter(field, value, isPhrase=isPhrase, fuzzy=fuzzy and not negate)
+
+        if not filter_[2]:
+            continue
+
+        if negate:
+            key, cond, value = filter_
+            filter_ = (key, NegatedConditions[cond], value)
+
+        elif filter_[0] != "*" and filter_[1] in IndexedConditions:
+            indexed.append(filter_)
+
+        filters.append(filter_)
+
+    query = {
+        "operator": operator,
+        "filters": filters,
+    }
+
+    # Only the filters that all have to match can be looked up first
+    if operator == "and" and indexed:
+        query["indexed"] = indexed
+
+    if name:
+        query["name"] = name
+
+    return query
+
+
+def testParseQuery():
+    """
+    Test parsing the search text into filters.
+
+    :rtype: None
+    """
+    query = parseQuery('walk "big smile" owner:hovel -run comment:"happy')
+    assert query["filters"] == [
+        ("*", "contains", "walk"),
+        ("*", "contains", "big smile"),
+        ("owner", "is", "hovel"),
+        ("*", "not_contains", "run"),
+        ("comment", "contains", "happy"),
+    ]
+    assert query["indexed"] == [("owner", "is", "hovel")]
+
+    query = parseQuery("walk* *_ctrl folder:/library/a -user:bo* char:L_hand")
+    assert query["filters"] == [
+        ("name", "startswith", "walk"),
+        ("name", "endswith", "_ctrl"),
+        ("folder", "startswith", "/library/a"),
+        ("owner", "not_startswith", "bo"),
+        ("*", "contains", "char:L_hand"),
+    ]
+    assert query["indexed"] == [
+        ("name", "startswith", "walk"),
+        ("folder", "startswith", "/library/a"),
+    ]
+
+    query = parseQuery("type:.pose -type:Folder", operator="or", name="search")
+    assert query == {
+        "name": "search",
+        "operator": "or",
+        "filters": [("type", "is", ".pose"), ("type", "not", "Folder")],
+    }
+
+    # Terms without a value are ignored while they are being typed
+    assert parseQuery('owner: - "" *')["filters"] == []
+    assert parseQuery('"walk*"')["filters"] == [("*", "contains", "walk*")]
+    assert parseQuery("")["filters"] == []
+
+    query = parseQuery('wlak owner:hovel "big smile" run* -jog', fuzzy=True)
+    assert query["filters"] == [
+        ("name", "fuzzy", "wlak"),
+        ("owner", "is", "hovel"),
+        ("*", "contains", "big smile"),
+        ("name", "startswith", "run"),
+        ("*", "not_contains", "jog"),
+    ]
+    assert query["indexed"] == [
+        ("name", "fuzzy", "wlak"),
+        ("owner", "is", "hovel"),
+        ("name", "startswith", "run"),
+    ]
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testParseQuery()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,69 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A lightweight record for each path in the library database.
+
+Searching, sorting and grouping only need the path and the item data,
+so they run over records instead of LibraryItems. A LibraryItem is only
+created for the records that are shown in the items widget.
+
+Example:
+    import studiolibrary
+
+    record = studiolibrary.LibraryRecord("/library/walk.anim", {"name": "walk.anim"})
+    print(record.path(), record.itemData())
+"""
+
+
+__all__ = [
+    "LibraryRecord",
+]
+
+
+class LibraryRecord(object):
+
+    __slots__ = ("_path", "_itemData")
+
+    def __init__(self, path, itemData):
+        """
+        :type path: str
+        :type itemData: dict
+        """
+        self._path = path
+        self._itemData = itemData
+
+    def __repr__(self):
+        return "LibraryRecord({0!r})".format(self._path)
+
+    def id(self):
+        """
+        Return the unique id for the record.
+
+        :rtype: str
+        """
+        return self._path
+
+    def path(self):
+        """
+        Return the path for the record.
+
+        :rtype: str
+        """
+        return self._path
+
+    def itemData(self):
+        """
+        Return the item data from the database.
+
+        :rtype: dict
+        """
+        return self._itemData
@@ -0,0 +1,257 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Run the matching, sorting and grouping of a library search.
+
+A LibrarySearch holds everything needed to run a search, so it can be
+run on a worker thread without touching the library. The records and
+the compiled queries are created on the main thread before the search
+is started.
+
+Example:
+    import studiolibrary
+
+    columns = library.columns().prepare(["name"])
+    search = studiolibrary.LibrarySearch(records, match, columns, sortBy=["name"])
+
+    worker = studiolibrary.SearchWorker(search)
+    worker.signals.finished.connect(searchFinished)
+
+    threadPool.start(worker)
+"""
+import time
+import logging
+
+from studioqt import QtCore
+
+import studiolibrary
+
+
+__all__ = [
+    "LibrarySearch",
+    "SearchWorker",
+    "SearchWorkerSignals",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class LibrarySearch(object):
+
+    # The number of items to match before checking if cancelled
+    CancelCheckInterval = 500
+
+    def __init__(
+            self,
+            items,
+            match,
+            columns,
+            sortBy=None,
+            groupBy=None,
+            requestTime=None,
+            prepareTime=0.0,
+            profile=None,
+            matched=None,
+            scores=None,
+    ):
+        """
+        The matched records are added to the results without matching
+        them again, such as the unchanged results of the last search.
+
+        The results are sorted by the given scores before the sortBy
+        fields, such as the scores of a fuzzy search. The scores are
+        copied, so the next search can change them while this one runs.
+        The columns should be a copy prepared for this search.
+
+        :type items: list[studiolibrary.LibraryRecord]
+        :type match: func
+        :type columns: studiolibrary.LibraryColumns
+        :type sortBy: list[str] or None
+        :type groupBy: list[str] or None
+        :type requestTime: float or None
+        :type prepareTime: float
+        :type profile: studiolibrary.SearchProfile or None
+        :type matched: list[studiolibrary.LibraryRecord] or None
+        :type scores: dict[str, float] or None
+        """
+        self._items = items
+        self._matched = matched or []
+        self._match = match
+        self._columns = columns
+        self._sortBy = sortBy or []
+        self._groupBy = groupBy or []
+        self._scores = dict(scores) if scores else None
+
+        self._requestTime = requestTime or time.time()
+        self._prepareTime = prepareTime
+        self._startTime = None
+        self._endTime = None
+
+        self._results = []
+        self._groupedResults = {}
+        self._cancelled = False
+        self._finished = False
+
+        self._profile = profile or studiolibrary.NullSearchProfile()
+
+    def profile(self):
+        """
+        Return the profile that records the time taken by each stage.
+
+        :rtype: studiolibrary.SearchProfile
+        """
+        return self._profile
+
+    def cancel(self):
+        """
+        Stop the search as soon as possible.
+
+        :rtype: None
+        """
+        self._cancelled = True
+
+    def isCancelled(self):
+        """
+        Return True if the search has been cancelled.
+
+        :rtype: bool
+        """
+        return self._cancelled
+
+    def isFinished(self):
+        """
+        Return True if the search has finished without being cancelled.
+
+        :rtype: bool
+        """
+        return self._finished
+
+    def results(self):
+        """
+        Return the matching records in sort order.
+
+        :rtype: list[studiolibrary.LibraryRecord]
+        """
+        return self._results
+
+    def groupedResults(self):
+        """
+        Return the matching records grouped by the group by field.
+
+        :rtype: dict
+        """
+        return self._groupedResults
+
+    def queueTime(self):
+        """
+        Return the time between the search request and the search running.
+
+        This includes any time waiting for more changes to the query.
+
+        :rtype: float
+        """
+        if self._startTime is None:
+            return 0.0
+
+        queueTime = self._startTime - self._requestTime - self._prepareTime
+        return max(0.0, queueTime)
+
+    def computeTime(self):
+        """
+        Return the time taken to prepare and run the search.
+
+        :rtype: float
+        """
+        if self._endTime is None:
+            return self._prepareTime
+
+        return self._prepareTime + self._endTime - self._startTime
+
+    def run(self):
+        """
+        Match, sort and group the items.
+
+        :rtype: None
+        """
+        self._startTime = time.time()
+
+        match = self._match
+        interval = self.CancelCheckInterval
+        profile = self._profile
+
+        results = list(self._matched)
+
+        with profile.span("match"):
+            for i, item in enumerate(self._items):
+                if i % interval == 0 and self._cancelled:
+                    logger.debug("Search cancelled")
+                    return
+
+                if match(item.itemData()):
+                    results.append(item)
+
+        if self._sortBy:
+            with profile.span("sort"):
+                results = self._columns.sortItems(results, self._sortBy)
+
+        if self._scores:
+            scores = self._scores
+
+            def sortKey(item):
+                return scores.get(item.id(), 0)
+
+            # The sort is stable, so the same scores keep the sortBy order
+            with profile.span("score"):
+                results = sorted(results, key=sortKey, reverse=True)
+
+        if self._cancelled:
+            return
+
+        self._results = results
+
+        with profile.span("group"):
+            self._groupedResults = self._columns.groupItems(results, self._groupBy)
+
+        self._endTime = time.time()
+        self._finished = not self._cancelled
+
+
+class SearchWorkerSignals(QtCore.QObject):
+    finished = QtCore.Signal(object)
+
+
+class SearchWorker(QtCore.QRunnable):
+    """A convenience class for running a library search in a thread."""
+
+    def __init__(self, search, *args):
+        QtCore.QRunnable.__init__(self, *args)
+
+        self._search = search
+        self.signals = SearchWorkerSignals()
+
+    def search(self):
+        """
+        Return the search to be run.
+
+        :rtype: LibrarySearch
+        """
+        return self._search
+
+    def run(self):
+        """The starting point for the thread."""
+        try:
+            self._search.run()
+        except Exception:
+            logger.exception("Cannot run the library search.")
+            self._search.cancel()
+
+        self.signals.finished.emit(self._search)
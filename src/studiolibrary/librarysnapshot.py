@@ -0,0 +1,404 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A per-directory snapshot of the library used for incremental syncing.
+
+The snapshot records the mtime and inode of every walked directory
+together with the items found in it. When syncing, only the directories
+whose mtime or inode has changed are listed again.
+
+The directories are stored relative to the walked path so the snapshot
+can be shared between platforms.
+
+Example:
+    import studiolibrary
+
+    snapshot = studiolibrary.LibrarySnapshot("/library/.studiolibrary/snapshot.json")
+    snapshot.read()
+
+    result = snapshot.update("/library", depth=3)
+
+    print(result.added, result.changed, result.removed)
+
+    snapshot.save()
+"""
+import os
+import logging
+
+import studiolibrary
+
+
+__all__ = [
+    "LibrarySnapshot",
+    "SnapshotResult",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotResult(object):
+    """
+    The difference between the snapshot and the file system.
+    """
+
+    def __init__(self):
+        self.added = {}
+        self.changed = {}
+        self.removed = []
+        self.listedFolders = []
+        self.removedFolders = []
+
+    def isEmpty(self):
+        """
+        Return True if nothing has changed on disc.
+
+        :rtype: bool
+        """
+        return not (self.added or self.changed or self.removed)
+
+    def isSnapshotChanged(self):
+        """
+        Return True if any directory was listed or removed.
+
+        :rtype: bool
+        """
+        return bool(self.listedFolders or self.removedFolders)
+
+    def items(self):
+        """
+        Return all the added and changed items.
+
+        :rtype: list[studiolibrary.LibraryItem]
+        """
+        return list(self.added.values()) + list(self.changed.values())
+
+
+class LibrarySnapshot(object):
+
+    def __init__(self, path=None):
+        """
+        :type path: str or None
+        """
+        self._path = path
+        self._entries = {}
+
+    def path(self):
+        """
+        Return the location of the snapshot on disc.
+
+        :rtype: str or None
+        """
+        return self._path
+
+    def entries(self):
+        """
+        Return the snapshot entries keyed by the relative directory path.
+
+        :rtype: dict
+        """
+        return self._entries
+
+    def setEntries(self, entries):
+        """
+        Set the snapshot entries keyed by the relative directory path.
+
+        :type entries: dict
+        :rtype: None
+        """
+        self._entries = entries
+
+    def isEmpty(self):
+        """
+        Return True if the snapshot doesn't contain any directories.
+
+        :rtype: bool
+        """
+        return not self._entries
+
+    def clear(self):
+        """Remove all the directory entries."""
+        self._entries = {}
+
+    def read(self):
+        """
+        Read the snapshot from disc.
+
+        :rtype: dict
+        """
+        self._entries = {}
+
+        if self.path():
+            try:
+                self._entries = studiolibrary.readJson(self.path())
+            except Exception:
+                logger.exception('Cannot read the snapshot "%s"', self.path())
+
+        return self._entries
+
+    def save(self):
+        """
+        Write the snapshot to disc.
+
+        The snapshot is only a cache, so write errors are logged and ignored.
+
+        :rtype: None
+        """
+        if not self.path():
+            return
+
+        try:
+            studiolibrary.saveJson(self.path(), self._entries)
+        except Exception:
+            logger.exception('Cannot save the snapshot "%s"', self.path())
+
+    def folders(self, path):
+        """
+        Return the absolute path of every directory in the snapshot.
+
+        :type path: str
+        :rtype: list[str]
+        """
+        root = studiolibrary.normPath(path)
+        return [root + "/" + key if key else root for key in self._entries]
+
+    def setFolderEntries(self, path, entries):
+        """
+        Set the snapshot entries from the entries found by findItems.
+
+        This is used to save the walk of a full sync as the snapshot
+        without walking the directories a second time.
+
+        :type path: str
+        :type entries: dict
+        :rtype: None
+        """
+        root = studiolibrary.normPath(path)
+
+        self._entries = {}
+
+        for dirname, entry in entries.items():
+            if dirname == root:
+                self._entries[""] = entry
+            elif dirname.startswith(root + "/"):
+                self._entries[dirname[len(root) + 1:]] = entry
+
+    def update(self, path, depth=3, **kwargs):
+        """
+        Walk the given path and update the snapshot with any changes.
+
+        Unchanged directories are not listed again, so the cost of an
+        update without changes is a single stat call per directory.
+
+        :type path: str
+        :type depth: int
+        :type kwargs: dict
+        :rtype: SnapshotResult
+        """
+        root = studiolibrary.normPath(path)
+
+        result = SnapshotResult()
+        entries = self._walk(root, [""], depth, result, **kwargs)
+
+        # Collect the items for any directory that is no longer walked
+        removed = [key for key in self._entries if key not in entries]
+        self._removeEntries(root, removed, result)
+
+        self._entries = entries
+
+        return result
+
+    def updateFolders(self, path, folders, depth=3, **kwargs):
+        """
+        List only the given directories and update the snapshot.
+
+        The given directories are always listed again. Any new directory
+        below them is walked, but the rest of the snapshot is unchanged,
+        so this is used when the changed directories are already known.
+
+        :type path: str
+        :type folders: list[str]
+        :type depth: int
+        :type kwargs: dict
+        :rtype: SnapshotResult
+        """
+        root = studiolibrary.normPath(path)
+
+        keys = set()
+
+        for folder in folders:
+            folder = studiolibrary.normPath(folder)
+
+            if folder == root:
+                keys.add("")
+            elif folder.startswith(root + "/"):
+                keys.add(folder[len(root) + 1:])
+
+        result = SnapshotResult()
+        entries = self._walk(root, sorted(keys), depth, result, force=True, **kwargs)
+
+        # Collect the items for any directory below the given directories
+        # that no longer exists
+        if "" in keys:
+            removed = [key for key in self._entries if key not in entries]
+        else:
+            prefixes = tuple(key + "/" for key in keys)
+            removed = [
+                key for key in self._entries
+                if key not in entries and (key in keys or key.startswith(prefixes))
+            ]
+
+        self._removeEntries(root, removed, result)
+
+        for key in removed:
+            del self._entries[key]
+
+        self._entries.update(entries)
+
+        return result
+
+    def _walk(self, root, keys, depth, result, force=False, **kwargs):
+        """
+        Walk the given directories and return the new snapshot entries.
+
+        The given directories are listed again when force is True.
+
+        :type root: str
+        :type keys: list[str]
+        :type depth: int
+        :type result: SnapshotResult
+        :type force: bool
+        :type kwargs: dict
+        :rtype: dict
+        """
+        def _absPath(key):
+            return root + "/" + key if key else root
+
+        entries = {}
+        forced = set(keys) if force else set()
+        stack = [(key, key.count("/") + 1 if key else 0) for key in keys]
+
+        while stack:
+            key, level = stack.pop()
+
+            if key in entries:
+                continue
+
+            dirname = _absPath(key)
+
+            try:
+                stat = os.stat(dirname)
+            except OSError:
+                continue
+
+            entry = self._entries.get(key)
+            walk = depth != 1 and level < depth
+
+            if key not in forced and self.isEntryValid(entry, stat):
+                entries[key] = entry
+            else:
+                entry = self._listdir(dirname, stat, entry, result, **kwargs)
+                entries[key] = entry
+                result.listedFolders.append(dirname)
+
+            if walk:
+                for name in entry.get("dirs", []):
+                    stack.append((key + "/" + name if key else name, level + 1))
+
+        return entries
+
+    def _removeEntries(self, root, keys, result):
+        """
+        Add the items in the given snapshot entries to the removed items.
+
+        :type root: str
+        :type keys: list[str]
+        :type result: SnapshotResult
+        :rtype: None
+        """
+        removed = set(result.removed)
+
+        for key in keys:
+            dirname = root + "/" + key if key else root
+            result.removedFolders.append(dirname)
+
+            for name in self._entries[key].get("items", {}):
+                path = dirname + "/" + name
+                if path not in removed:
+                    removed.add(path)
+                    result.removed.append(path)
+
+    @staticmethod
+    def isEntryValid(entry, stat):
+        """
+        Return True if the given entry matches the given directory stat.
+
+        :type entry: dict or None
+        :type stat: os.stat_result
+        :rtype: bool
+        """
+        if not entry:
+            return False
+
+        return entry.get("mtime") == stat.st_mtime and \
+            entry.get("ino") == stat.st_ino
+
+    @staticmethod
+    def _listdir(dirname, stat, entry, result, **kwargs):
+        """
+        List the given directory and diff the items with the old entry.
+
+        :type dirname: str
+        :type stat: os.stat_result
+        :type entry: dict or None
+        :type result: SnapshotResult
+        :type kwargs: dict
+        :rtype: dict
+        """
+        entry = entry or {}
+        oldItems = entry.get("items", {})
+
+        items = {}
+        dirs = []
+
+        for name, isDir in studiolibrary.listEntries(dirname):
+            path = dirname + "/" + name
+            item = studiolibrary.itemFromPath(path, isDir=isDir, **kwargs)
+
+            if not item:
+                continue
+
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+
+            items[name] = mtime
+
+            if name not in oldItems:
+                result.added[item.path()] = item
+
+            elif oldItems[name] != mtime:
+                result.changed[item.path()] = item
+
+            if isDir and item.EnableNestedItems:
+                dirs.append(name)
+
+        for name in oldItems:
+            if name not in items:
+                result.removed.append(dirname + "/" + name)
+
+        return {
+            "mtime": stat.st_mtime,
+            "ino": stat.st_ino,
+            "dirs": sorted(dirs),
+            "items": items,
+        }
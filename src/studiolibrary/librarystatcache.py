@@ -0,0 +1,298 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A process wide cache of os.stat results that expire after a short time.
+
+Browsing and loading items asks for the same mtime and ctime many times
+in a row, which is slow on a network drive. The cached results are used
+until they are older than the "statCacheTTL" config value. Saving,
+renaming and deleting a path invalidates it straight away.
+
+Example:
+    import studiolibrary
+
+    cache = studiolibrary.statCache()
+
+    if cache.exists("/library/walk.anim"):
+        print(cache.mtime("/library/walk.anim"))
+
+    cache.invalidate("/library/walk.anim")
+    print(cache.info())
+    # {'hits': 1, 'misses': 1, 'size': 0, 'ttl': 2.0}
+"""
+import os
+import time
+import logging
+
+import studiolibrary
+
+
+__all__ = [
+    "StatCache",
+    "statCache",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class StatCache(object):
+
+    # The number of cached paths before the expired results are removed
+    MaxSize = 10000
+
+    def __init__(self, ttl=None):
+        """
+        :type ttl: float or None
+        """
+        self._ttl = ttl
+        self._entries = {}
+        self._trie = studiolibrary.PathTrie()
+        self._hits = 0
+        self._misses = 0
+
+    def ttl(self):
+        """
+        Return the time in seconds that a result is used for.
+
+        The "statCacheTTL" config value is used when the ttl is None.
+
+        :rtype: float
+        """
+        if self._ttl is not None:
+            return self._ttl
+
+        return studiolibrary.config().get('statCacheTTL', 0)
+
+    def setTTL(self, ttl):
+        """
+        Set the time in seconds that a result is used for.
+
+        :type ttl: float or None
+        :rtype: None
+        """
+        self._ttl = ttl
+        self.clear()
+
+    def stat(self, path):
+        """
+        Return the stat result for the given path or None if it doesn't exist.
+
+        :type path: str
+        :rtype: os.stat_result or None
+        """
+        ttl = self.ttl()
+        now = time.time()
+
+        path = path.replace("\\", "/")
+        entry = self._entries.get(path)
+
+        if entry is not None and now - entry[0] < ttl:
+            self._hits += 1
+            return entry[1]
+
+        self._misses += 1
+
+        try:
+            result = os.stat(path)
+        except OSError:
+            result = None
+
+        if ttl > 0:
+            if path not in self._entries:
+                if len(self._entries) >= self.MaxSize:
+                    self.removeExpired()
+                self._trie.add(path)
+            self._entries[path] = (now, result)
+
+        return result
+
+    def exists(self, path):
+        """
+        Return True if the given path exists.
+
+        :type path: str
+        :rtype: bool
+        """
+        return self.stat(path) is not None
+
+    def mtime(self, path):
+        """
+        Return the modified time of the given path like os.path.getmtime.
+
+        :type path: str
+        :raises: OSError
+        :rtype: float
+        """
+        result = self.stat(path)
+
+        if result is None:
+            raise OSError(u'No such file or directory: "{0}"'.format(path))
+
+        return result.st_mtime
+
+    def ctime(self, path):
+        """
+        Return the created time of the given path like os.path.getctime.
+
+        :type path: str
+        :raises: OSError
+        :rtype: float
+        """
+        result = self.stat(path)
+
+        if result is None:
+            raise OSError(u'No such file or directory: "{0}"'.format(path))
+
+        return result.st_ctime
+
+    def invalidate(self, path):
+        """
+        Remove the given path, its children and its parent from the cache.
+
+        The parent is removed since its mtime changes when the path is
+        created, renamed or deleted. The children are found with the
+        trie of the cached paths, so the other paths are not checked.
+
+        :type path: str
+        :rtype: None
+        """
+        path = path.replace("\\", "/").rstrip("/")
+
+        for key in self._trie.paths(path) + [os.path.dirname(path)]:
+            if self._entries.pop(key, None) is not None:
+                self._trie.remove(key)
+
+    def removeExpired(self):
+        """
+        Remove the results that are older than the ttl.
+
+        :rtype: None
+        """
+        ttl = self.ttl()
+        now = time.time()
+
+        for key, entry in list(self._entries.items()):
+            if now - entry[0] >= ttl:
+                del self._entries[key]
+                self._trie.remove(key)
+
+        # Start again if most of the results are still valid
+        if len(self._entries) >= self.MaxSize:
+            self.clear()
+
+    def clear(self):
+        """
+        Remove all the cached results.
+
+        :rtype: None
+        """
+        self._entries.clear()
+        self._trie = studiolibrary.PathTrie()
+
+    def info(self):
+        """
+        Return the hit and miss counts for tuning the ttl.
+
+        :rtype: dict
+        """
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": len(self._entries),
+            "ttl": self.ttl(),
+        }
+
+    def resetInfo(self):
+        """
+        Reset the hit and miss counts.
+
+        :rtype: None
+        """
+        self._hits = 0
+        self._misses = 0
+
+
+_statCache = StatCache()
+
+
+def statCache():
+    """
+    Return the stat cache shared by the whole process.
+
+    :rtype: StatCache
+    """
+    return _statCache
+
+
+def testStatCache():
+    """
+    Test the cached results are used until they expire or are invalidated.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/anim/walk.anim"
+        os.makedirs(path)
+
+        cache = StatCache(ttl=60)
+
+        os.utime(path, (1000, 1000))
+
+        assert cache.mtime(path) == 1000
+        assert cache.exists(root + "/anim")
+        assert cache.info()["misses"] == 2
+
+        os.utime(path, (2000, 2000))
+        assert cache.mtime(path) == 1000
+        assert cache.info()["hits"] == 1
+
+        # Invalidating a sibling doesn't remove the cached children
+        cache.exists(root + "/anim2")
+        cache.invalidate(root + "/anim2")
+        assert cache.mtime(path) == 1000
+
+        cache.invalidate(root + "/anim")
+        assert cache.mtime(path) == 2000
+
+        shutil.rmtree(root + "/anim")
+        assert cache.exists(path)
+
+        cache.invalidate(path)
+        assert not cache.exists(path)
+
+        try:
+            cache.ctime(path)
+            assert False, "Expected an OSError"
+        except OSError:
+            pass
+
+        # The results are not cached when the ttl is zero
+        cache.setTTL(0)
+        cache.stat(root)
+        assert cache.info()["size"] == 0
+
+    finally:
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testStatCache()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -0,0 +1,2129 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Storage backends for the library database.
+
+The library database maps each item path to its item data. A store is
+responsible for reading and writing that mapping on disc.
+
+Example:
+    import studiolibrary
+
+    store = studiolibrary.createStore("sqlite", "/library/.studiolibrary/database.db", root="/library")
+    store.update({"/library/walk.anim": {"name": "walk.anim"}})
+    store.remove(["/library/run.anim"])
+
+    print(store.read())
+"""
+import os
+import glob
+import json
+import hashlib
+import time
+import logging
+import sqlite3
+import contextlib
+
+import studiolibrary
+
+
+__all__ = [
+    "LibraryStore",
+    "JsonLibraryStore",
+    "SqliteLibraryStore",
+    "JournalLibraryStore",
+    "ShardedLibraryStore",
+    "IndexedLibraryStore",
+    "StoreLockedError",
+    "registerStore",
+    "registeredStores",
+    "storeClass",
+    "createStore",
+]
+
+logger = logging.getLogger(__name__)
+
+
+_storeClasses = {}
+
+
+class StoreLockedError(IOError):
+    """"""
+
+
+def registerStore(cls):
+    """
+    Register the given store class so it can be used as a backend.
+
+    :type cls: type[LibraryStore]
+    :rtype: None
+    """
+    _storeClasses[cls.Name] = cls
+
+
+def registeredStores():
+    """
+    Return all registered store classes.
+
+    :rtype: list[type[LibraryStore]]
+    """
+    return list(_storeClasses.values())
+
+
+def storeClass(name):
+    """
+    Return the registered store class for the given backend name.
+
+    :type name: str
+    :rtype: type[LibraryStore]
+    """
+    cls = _storeClasses.get(name)
+
+    if not cls:
+        msg = 'Cannot find a database backend with the name "{0}"'
+        raise ValueError(msg.format(name))
+
+    return cls
+
+
+def createStore(name, path, root=""):
+    """
+    Create a new store instance for the given backend name.
+
+    :type name: str
+    :type path: str
+    :type root: str
+    :rtype: LibraryStore
+    """
+    return storeClass(name)(path, root=root)
+
+
+class LibraryStore(object):
+    """
+    The base class for all library database backends.
+
+    Reimplement read, save, update, remove and rename for a new backend.
+    """
+    Name = ""
+
+    # The config key used to resolve the location on disc
+    PathConfigKey = "databasePath"
+
+    def __init__(self, path, root=""):
+        """
+        :type path: str
+        :type root: str
+        """
+        self._path = studiolibrary.normPath(path)
+        self._root = studiolibrary.normPath(root or "")
+        self._trie = None
+
+    def path(self):
+        """
+        Return the location of the store on disc.
+
+        :rtype: str
+        """
+        return self._path
+
+    def root(self):
+        """
+        Return the library root path used for relative paths.
+
+        :rtype: str
+        """
+        return self._root
+
+    def exists(self):
+        """
+        Return True if the store exists on disc.
+
+        :rtype: bool
+        """
+        return os.path.exists(self.path())
+
+    def mtime(self):
+        """
+        Return when the store was last modified.
+
+        :rtype: float or None
+        """
+        stat = studiolibrary.statCache().stat(self.path())
+
+        if stat is not None:
+            return stat.st_mtime
+
+        return None
+
+    def isEmpty(self):
+        """
+        Return True if the store doesn't contain any items.
+
+        :rtype: bool
+        """
+        return not self.exists() or not self.read()
+
+    def pathTrie(self, data):
+        """
+        Return the trie of the paths in the given data.
+
+        The trie is kept between calls, so only the paths that have
+        changed since the last call are added or removed.
+
+        :type data: dict
+        :rtype: studiolibrary.PathTrie
+        """
+        if self._trie is None:
+            self._trie = studiolibrary.PathTrie(data.keys())
+        else:
+            self._trie.setPaths(data)
+
+        return self._trie
+
+    def importJson(self, path):
+        """
+        Import the item data from the given json database.
+
+        :type path: str
+        :rtype: int
+        """
+        data = studiolibrary.readJson(path)
+
+        logger.info(u'Importing %s items from "%s"', len(data), path)
+
+        self.update(data)
+
+        return len(data)
+
+    def read(self):
+        """
+        Return all the item data in the store.
+
+        :rtype: dict
+        """
+        raise NotImplementedError("The read method has not been implemented!")
+
+    def readAll(self):
+        """
+        Return the item data in the store including any unloaded parts.
+
+        :rtype: dict
+        """
+        return self.read()
+
+    def save(self, data):
+        """
+        Replace the contents of the store with the given data.
+
+        :type data: dict
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        raise NotImplementedError("The save method has not been implemented!")
+
+    def update(self, data):
+        """
+        Insert or update the given item data.
+
+        The data for existing paths is merged with the given data.
+
+        :type data: dict
+        :rtype: None
+        """
+        data_ = self.read()
+
+        for path, itemData in data.items():
+            data_.setdefault(path, {})
+            data_[path].update(itemData)
+
+        self.save(data_)
+
+    def remove(self, paths):
+        """
+        Remove the given paths from the store.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        data = self.read()
+
+        for path in paths:
+            if path in data:
+                del data[path]
+
+        self.save(data)
+
+    def rename(self, src, dst):
+        """
+        Rename the given src path and all of its children to the dst path.
+
+        :type src: str
+        :type dst: str
+        :rtype: None
+        """
+        self.renamePaths([(src, dst)])
+
+    def renamePaths(self, renames, data=None):
+        """
+        Rename the given paths and all of their children in one write.
+
+        The given item data is merged after renaming, so moving items
+        and saving their new item data is a single write.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :rtype: None
+        """
+        data_ = self.read()
+
+        renames = [(studiolibrary.normPath(src), studiolibrary.normPath(dst))
+                   for src, dst in renames]
+
+        studiolibrary.renamePathsInData(data_, renames, trie=self.pathTrie(data_))
+
+        for path, itemData in (data or {}).items():
+            data_.setdefault(path, {})
+            data_[path].update(itemData)
+
+        self.save(data_)
+
+
+class JsonLibraryStore(LibraryStore):
+    """
+    The default backend that stores all the item data in a single json file.
+    """
+    Name = "json"
+
+    def read(self):
+        """
+        Return all the item data in the json file.
+
+        :rtype: dict
+        """
+        return studiolibrary.readJson(self.path())
+
+    def save(self, data):
+        """
+        Write the given data to the json file.
+
+        :type data: dict
+        :rtype: None
+        """
+        studiolibrary.saveJson(self.path(), data)
+
+
+class SqliteLibraryStore(LibraryStore):
+    """
+    A backend that stores one row per item path in an sqlite database.
+
+    The indexed fields are stored in their own columns and the remaining
+    item data is stored as json. Paths are stored relative to the library
+    root so that the database can be shared between platforms.
+    """
+    Name = "sqlite"
+    PathConfigKey = "sqliteDatabasePath"
+
+    # Fields stored in their own indexed columns
+    Columns = ["folder", "type", "category", "name"]
+
+    # The maximum number of variables in a single sqlite statement
+    MaxVariables = 900
+
+    Timeout = 30
+
+    def __init__(self, *args, **kwargs):
+        super(SqliteLibraryStore, self).__init__(*args, **kwargs)
+        self._initialized = False
+
+    @contextlib.contextmanager
+    def connect(self):
+        """
+        Open a connection to the database and commit on success.
+
+        :rtype: sqlite3.Connection
+        """
+        dirname = os.path.dirname(self.path())
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        connection = sqlite3.connect(self.path(), timeout=self.Timeout)
+
+        try:
+            if not self._initialized:
+                self.createTables(connection)
+                self._initialized = True
+
+            yield connection
+            connection.commit()
+
+        except Exception:
+            connection.rollback()
+            raise
+
+        finally:
+            connection.close()
+
+    def createTables(self, connection):
+        """
+        Create the items table and indexes if they don't exist.
+
+        :type connection: sqlite3.Connection
+        :rtype: None
+        """
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "path TEXT PRIMARY KEY, "
+            "folder TEXT, "
+            "type TEXT, "
+            "category TEXT, "
+            "name TEXT, "
+            "data TEXT)"
+        )
+
+        for column in self.Columns:
+            sql = "CREATE INDEX IF NOT EXISTS items_{0} ON items ({0})"
+            connection.execute(sql.format(column))
+
+    def isEmpty(self):
+        """
+        Return True if the database doesn't contain any items.
+
+        :rtype: bool
+        """
+        if not self.exists():
+            return True
+
+        with self.connect() as connection:
+            row = connection.execute("SELECT 1 FROM items LIMIT 1").fetchone()
+
+        return row is None
+
+    def relPath(self, path):
+        """
+        Return the given path relative to the library root.
+
+        :type path: str
+        :rtype: str
+        """
+        root = self.root()
+
+        if path and root and path.startswith(root + "/"):
+            return path[len(root) + 1:]
+
+        return path
+
+    def absPath(self, path):
+        """
+        Return the absolute path for the given relative path.
+
+        :type path: str
+        :rtype: str
+        """
+        if not path or not self.root():
+            return path
+
+        if path.startswith("/") or path[1:2] == ":":
+            return path
+
+        return self.root() + "/" + path
+
+    def _row(self, path, itemData):
+        """
+        Return the row values for the given path and item data.
+
+        :type path: str
+        :type itemData: dict
+        :rtype: tuple
+        """
+        data = dict(itemData)
+        data.pop("path", None)
+        folder = data.pop("folder", None)
+
+        return (
+            self.relPath(path),
+            self.relPath(folder),
+            itemData.get("type"),
+            itemData.get("category"),
+            itemData.get("name"),
+            json.dumps(data),
+        )
+
+    def _itemData(self, path, folder, data):
+        """
+        Return the item data for the given row values.
+
+        :type path: str
+        :type folder: str
+        :type data: str
+        :rtype: dict
+        """
+        itemData = json.loads(data or "{}")
+        itemData["path"] = self.absPath(path)
+
+        if folder is not None:
+            itemData["folder"] = self.absPath(folder)
+
+        return itemData
+
+    def _chunks(self, values):
+        """
+        Split the given values so they don't exceed the variable limit.
+
+        :type values: list
+        :rtype: collections.Iterable[list]
+        """
+        for i in range(0, len(values), self.MaxVariables):
+            yield values[i:i + self.MaxVariables]
+
+    def _select(self, connection, paths):
+        """
+        Return the item data for the given paths keyed by absolute path.
+
+        :type connection: sqlite3.Connection
+        :type paths: list[str]
+        :rtype: dict
+        """
+        results = {}
+        keys = [self.relPath(path) for path in paths]
+
+        for chunk in self._chunks(keys):
+            sql = "SELECT path, folder, data FROM items WHERE path IN ({0})"
+            sql = sql.format(", ".join("?" * len(chunk)))
+
+            for path, folder, data in connection.execute(sql, chunk):
+                itemData = self._itemData(path, folder, data)
+                results[itemData["path"]] = itemData
+
+        return results
+
+    def read(self):
+        """
+        Return all the item data in the database.
+
+        :rtype: dict
+        """
+        results = {}
+
+        if not self.exists():
+            return results
+
+        with self.connect() as connection:
+            sql = "SELECT path, folder, data FROM items"
+
+            for path, folder, data in connection.execute(sql):
+                itemData = self._itemData(path, folder, data)
+                results[itemData["path"]] = itemData
+
+        return results
+
+    def save(self, data):
+        """
+        Replace all the rows in the database with the given data.
+
+        :type data: dict
+        :rtype: None
+        """
+        rows = [self._row(path, data[path]) for path in data]
+
+        with self.connect() as connection:
+            connection.execute("DELETE FROM items")
+            connection.executemany(
+                "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def update(self, data):
+        """
+        Insert or update only the rows for the given item data.
+
+        :type data: dict
+        :rtype: None
+        """
+        if not data:
+            return
+
+        with self.connect() as connection:
+            existing = self._select(connection, list(data.keys()))
+
+            rows = []
+            for path, itemData in data.items():
+                itemData_ = existing.get(path, {})
+                itemData_.update(itemData)
+                rows.append(self._row(path, itemData_))
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def remove(self, paths):
+        """
+        Delete only the rows for the given paths.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        keys = [self.relPath(path) for path in paths]
+
+        with self.connect() as connection:
+            for chunk in self._chunks(keys):
+                sql = "DELETE FROM items WHERE path IN ({0})"
+                sql = sql.format(", ".join("?" * len(chunk)))
+                connection.execute(sql, chunk)
+
+    def renamePaths(self, renames, data=None):
+        """
+        Rename the rows for the given paths and all the rows below them.
+
+        All the renames and the given item data are written in a single
+        transaction.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :rtype: None
+        """
+        with self.connect() as connection:
+
+            for src, dst in renames:
+                src = self.relPath(studiolibrary.normPath(src))
+                dst = self.relPath(studiolibrary.normPath(dst))
+                prefix = src + "/"
+
+                def _replace(path):
+                    if path == src or (path and path.startswith(prefix)):
+                        return dst + path[len(src):]
+                    return path
+
+                sql = "SELECT path, folder, type, category, name, data " \
+                      "FROM items WHERE path = ? OR substr(path, 1, ?) = ?"
+
+                rows = connection.execute(sql, (src, len(prefix), prefix)).fetchall()
+
+                connection.executemany(
+                    "DELETE FROM items WHERE path = ?",
+                    [(row[0],) for row in rows]
+                )
+
+                rows = [
+                    (_replace(row[0]), _replace(row[1])) + tuple(row[2:])
+                    for row in rows
+                ]
+
+                connection.executemany(
+                    "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+
+            if data:
+                existing = self._select(connection, list(data.keys()))
+
+                rows = []
+                for path, itemData in data.items():
+                    itemData_ = existing.get(path, {})
+                    itemData_.update(itemData)
+                    rows.append(self._row(path, itemData_))
+
+                connection.executemany(
+                    "INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+
+
+class JournalLibraryStore(JsonLibraryStore):
+    """
+    A json backend that appends changes to a journal next to the database.
+
+    Updates, removes and renames are appended as one json line each to
+    the journal, so several sessions can change the library at the same
+    time without rewriting the database. Reading replays the journal
+    over the json database, which is used as the last snapshot.
+
+    Once the journal is larger than the compact size it is folded into
+    a new snapshot. The journal is renamed before it is folded so other
+    sessions can keep appending to a new journal.
+
+    Saving works in the same way, so the records appended by other
+    sessions since the last read are replayed over the saved data
+    instead of being lost.
+    """
+    Name = "journal"
+
+    # The time in seconds after which a compact lock is considered stale
+    LockTimeout = 60
+
+    # The time in seconds to wait for another session to finish compacting
+    LockWait = 5
+
+    def __init__(self, *args, **kwargs):
+        super(JournalLibraryStore, self).__init__(*args, **kwargs)
+
+        # The snapshot mtime and the journal offsets of the last read
+        self._readState = None
+
+    def journalPath(self):
+        """
+        Return the path of the journal file.
+
+        :rtype: str
+        """
+        return self.path() + ".journal"
+
+    def lockPath(self):
+        """
+        Return the path of the lock file used when compacting.
+
+        :rtype: str
+        """
+        return self.path() + ".lock"
+
+    def compactSize(self):
+        """
+        Return the journal size in bytes that triggers a compact.
+
+        :rtype: int
+        """
+        return studiolibrary.config().get('journalCompactSize', 1048576)
+
+    def compactingPaths(self):
+        """
+        Return the journals that have been renamed to be compacted.
+
+        :rtype: list[str]
+        """
+        paths = glob.glob(self.journalPath() + ".*")
+        return sorted(studiolibrary.normPaths(paths))
+
+    def journalPaths(self):
+        """
+        Return all the journals that have to be replayed in order.
+
+        :rtype: list[str]
+        """
+        paths = self.compactingPaths()
+
+        if os.path.exists(self.journalPath()):
+            paths.append(self.journalPath())
+
+        return paths
+
+    def exists(self):
+        """
+        Return True if the snapshot or any journal exists on disc.
+
+        :rtype: bool
+        """
+        return os.path.exists(self.path()) or bool(self.journalPaths())
+
+    def mtime(self):
+        """
+        Return when the snapshot or the journal was last modified.
+
+        :rtype: float or None
+        """
+        mtimes = []
+
+        for path in [self.path()] + self.journalPaths():
+            try:
+                mtimes.append(studiolibrary.statCache().mtime(path))
+            except OSError:
+                pass
+
+        return max(mtimes) if mtimes else None
+
+    def append(self, record):
+        """
+        Append the given record to the journal.
+
+        The record is written with a single call in append mode so lines
+        from different sessions are not mixed together.
+
+        If the journal was renamed by a compact while writing, the record
+        is written again to the new journal. Replaying a record twice
+        gives the same result.
+
+        :type record: dict
+        :rtype: None
+        """
+        path = self.journalPath()
+
+        dirname = os.path.dirname(path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        line = json.dumps(record)
+        line = studiolibrary.relPath(line, path) + "\n"
+
+        for i in range(3):
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+            try:
+                os.write(fd, line)
+                inode = os.fstat(fd).st_ino
+            finally:
+                os.close(fd)
+
+            try:
+                if os.stat(path).st_ino == inode:
+                    break
+            except OSError:
+                pass
+
+            logger.debug("The journal was compacted while appending")
+
+        studiolibrary.statCache().invalidate(path)
+
+    def readJournal(self, path, offset=0):
+        """
+        Return the records in the given journal after the given offset.
+
+        Lines that cannot be read, such as a line that is still being
+        written by another session, are skipped.
+
+        :type path: str
+        :type offset: int
+        :rtype: list[dict]
+        """
+        return self._readJournal(path, offset)[0]
+
+    def _readJournal(self, path, offset=0):
+        """
+        Return the records, inode and end offset of the given journal.
+
+        The end offset is after the last complete line, so a line that
+        is still being written is read again next time.
+
+        :type path: str
+        :type offset: int
+        :rtype: (list[dict], int or None, int)
+        """
+        records = []
+
+        try:
+            with open(path, "rb") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                f.seek(offset)
+                text = f.read()
+        except (IOError, OSError):
+            return records, None, offset
+
+        end = offset + text.rfind(b"\n") + 1
+
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(studiolibrary.absPath(line, path))
+            except ValueError:
+                logger.debug('Skipping journal record "%s"', line)
+                continue
+
+            records.append(record)
+
+        return records, inode, end
+
+    @staticmethod
+    def replay(data, record, trie):
+        """
+        Apply the given journal record to the given data.
+
+        The trie must contain the same paths as the data.
+
+        :type data: dict
+        :type record: dict
+        :type trie: studiolibrary.PathTrie
+        :rtype: None
+        """
+        op = record.get("op")
+
+        if op == "rename":
+            studiolibrary.renamePathsInData(data, record.get("renames", []), trie=trie)
+
+        elif op == "remove":
+            for path in record.get("paths", []):
+                data.pop(path, None)
+                trie.remove(path)
+
+        elif op != "update":
+            logger.debug('Unknown journal record "%s"', op)
+            return
+
+        # Rename records also contain the new item data
+        for path, itemData in record.get("data", {}).items():
+            if path not in data:
+                data[path] = {}
+                trie.add(path)
+            data[path].update(itemData)
+
+    def snapshotTime(self):
+        """
+        Return the mtime of the snapshot or None if it doesn't exist.
+
+        :rtype: float or None
+        """
+        try:
+            return os.path.getmtime(self.path())
+        except OSError:
+            return None
+
+    def _replayJournals(self, data, journals, offsets=None):
+        """
+        Replay the given journals over the given data.
+
+        Renamed journals that are older than the snapshot have already
+        been folded into it by a compact that didn't finish cleaning up.
+        Only the records after the given offset of each inode are read.
+
+        Return the end offset of each journal inode that was read.
+
+        :type data: dict
+        :type journals: list[str]
+        :type offsets: dict[int, int] or None
+        :rtype: dict[int, int]
+        """
+        offsets = offsets or {}
+        snapshotTime = self.snapshotTime()
+        trie = None
+        ends = {}
+
+        for path in journals:
+            if path != self.journalPath() and snapshotTime is not None:
+                try:
+                    if os.path.getmtime(path) < snapshotTime:
+                        continue
+                except OSError:
+                    continue
+
+            try:
+                offset = offsets.get(os.stat(path).st_ino, 0)
+            except OSError:
+                continue
+
+            records, inode, end = self._readJournal(path, offset)
+
+            if inode is not None:
+                ends[inode] = end
+
+            for record in records:
+                if trie is None:
+                    trie = self.pathTrie(data)
+                self.replay(data, record, trie)
+
+        return ends
+
+    def _read(self, journals):
+        """
+        Return the snapshot with the given journals replayed.
+
+        :type journals: list[str]
+        :rtype: dict
+        """
+        data = super(JournalLibraryStore, self).read()
+        self._replayJournals(data, journals)
+        return data
+
+    def read(self):
+        """
+        Return the snapshot with all the journal records replayed.
+
+        The journal offsets are kept, so saving can replay the records
+        that other sessions append after this read.
+
+        :rtype: dict
+        """
+        snapshotTime = self.snapshotTime()
+
+        data = super(JournalLibraryStore, self).read()
+        offsets = self._replayJournals(data, self.journalPaths())
+
+        self._readState = {"snapshotTime": snapshotTime, "offsets": offsets}
+
+        return data
+
+    def waitForLock(self):
+        """
+        Try to create the lock file and wait for another session to finish.
+
+        :rtype: bool
+        """
+        start = time.time()
+
+        while not self.lock():
+            if time.time() - start > self.LockWait:
+                return False
+            time.sleep(0.1)
+
+        return True
+
+    def save(self, data):
+        """
+        Replace the snapshot with the given data and clear the journals.
+
+        The records that other sessions appended since the last read are
+        replayed over the data before it is written. The saved data is
+        authoritative, so when another session has compacted since the
+        last read, the records it folded into the snapshot are replaced
+        and only the journals that are left are replayed.
+
+        :type data: dict
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        if not self.waitForLock():
+            msg = 'Cannot save "{0}" while it is locked by another session'
+            raise StoreLockedError(msg.format(self.path()))
+
+        try:
+            readState = self._readState
+
+            # The offsets are only valid for the journals of the snapshot
+            # that was read, since the inodes can be used again
+            if readState and readState["snapshotTime"] != self.snapshotTime():
+                logger.debug('The snapshot "%s" was changed by another session', self.path())
+                readState = {"snapshotTime": None, "offsets": {}}
+
+            journal = self.journalPath()
+
+            # New changes are appended to a new journal from now on
+            if os.path.exists(journal):
+                name = "{0}.{1}.{2}".format(journal, int(time.time() * 1000), os.getpid())
+                try:
+                    os.rename(journal, name)
+                except OSError:
+                    logger.debug('Cannot rename the journal "%s"', journal)
+
+            paths = self.compactingPaths()
+
+            if readState:
+                data = dict((path, dict(itemData)) for path, itemData in data.items())
+                self._replayJournals(data, paths, readState["offsets"])
+
+            super(JournalLibraryStore, self).save(data)
+
+            for path in paths:
+                self._remove(path)
+
+            self._readState = {"snapshotTime": self.snapshotTime(), "offsets": {}}
+
+        finally:
+            self.unlock()
+
+    def update(self, data):
+        """
+        Append the given item data to the journal.
+
+        :type data: dict
+        :rtype: None
+        """
+        if data:
+            self.append({"op": "update", "data": data})
+            self.compactIfNeeded()
+
+    def remove(self, paths):
+        """
+        Append the removed paths to the journal.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        if paths:
+            self.append({"op": "remove", "paths": list(paths)})
+            self.compactIfNeeded()
+
+    def renamePaths(self, renames, data=None):
+        """
+        Append the renamed paths and the new item data to the journal.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        renames = [(studiolibrary.normPath(src), studiolibrary.normPath(dst))
+                   for src, dst in renames]
+
+        self.append({"op": "rename", "renames": renames, "data": data or {}})
+        self.compactIfNeeded()
+
+    def lock(self):
+        """
+        Try to create the lock file used when compacting.
+
+        :rtype: bool
+        """
+        path = self.lockPath()
+
+        dirname = os.path.dirname(path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.LockTimeout:
+                logger.debug('Removing stale lock "%s"', path)
+                self._remove(path)
+        except OSError:
+            pass
+
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except OSError:
+            return False
+
+        os.close(fd)
+
+        return True
+
+    def unlock(self):
+        """
+        Remove the lock file used when compacting.
+
+        :rtype: None
+        """
+        self._remove(self.lockPath())
+
+    @staticmethod
+    def _remove(path):
+        """
+        Remove the given file and ignore any errors.
+
+        :type path: str
+        :rtype: None
+        """
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def compactIfNeeded(self):
+        """
+        Compact the journal if it is larger than the compact size.
+
+        :rtype: bool
+        """
+        try:
+            size = os.path.getsize(self.journalPath())
+        except OSError:
+            return False
+
+        if size < self.compactSize():
+            return False
+
+        return self.compact()
+
+    def compact(self):
+        """
+        Fold the journal into a new snapshot.
+
+        Only one session can compact at a time. Any other session skips
+        the compact and keeps appending to the journal.
+
+        :rtype: bool
+        """
+        if not self.lock():
+            logger.debug("The journal is already being compacted")
+            return False
+
+        try:
+            journal = self.journalPath()
+
+            if os.path.exists(journal):
+                name = "{0}.{1}.{2}".format(journal, int(time.time() * 1000), os.getpid())
+
+                # New changes are appended to a new journal from now on
+                try:
+                    os.rename(journal, name)
+                except OSError:
+                    logger.debug('Cannot rename the journal "%s"', journal)
+
+            paths = self.compactingPaths()
+
+            if not paths:
+                return False
+
+            data = self._read(paths)
+
+            try:
+                super(JournalLibraryStore, self).save(data)
+            except Exception:
+                logger.exception("Cannot compact the journal")
+                return False
+
+            for path in paths:
+                self._remove(path)
+
+            logger.debug("Compacted %s journals", len(paths))
+
+            return True
+
+        finally:
+            self.unlock()
+
+
+class ShardedLibraryStore(LibraryStore):
+    """
+    A backend that stores the item data in one shard per library and user folder.
+
+    The items below each ".lib" and ".user" folder are stored in the
+    shard for that folder. The folder item itself is stored in the shard
+    of its parent, so the folders can be listed without loading their
+    own shards. The manifest lists the shards and their files.
+
+    Only the loaded shards are read, which are all the shards by default.
+    Changes are written to the shards of the changed paths whether they
+    are loaded or not.
+    """
+    Name = "sharded"
+    PathConfigKey = "shardedDatabasePath"
+
+    # The folders that are stored in their own shard
+    ShardExtensions = (".lib", ".user")
+
+    def __init__(self, *args, **kwargs):
+        super(ShardedLibraryStore, self).__init__(*args, **kwargs)
+        self._stores = {}
+        self._loadedShards = None
+
+    def shardBackend(self):
+        """
+        Return the name of the backend used for each shard.
+
+        :rtype: str
+        """
+        return studiolibrary.config().get('shardBackend', 'journal')
+
+    def shardKey(self, path):
+        """
+        Return the key of the shard that contains the given item path.
+
+        The key is the path of the closest library or user folder above
+        the item relative to the root. The root shard has an empty key.
+
+        :type path: str
+        :rtype: str
+        """
+        path = studiolibrary.normPath(path)
+        root = self.root()
+
+        if not root or not path.startswith(root + "/"):
+            return ""
+
+        names = path[len(root) + 1:].split("/")[:-1]
+
+        for i in range(len(names), 0, -1):
+            if names[i - 1].endswith(self.ShardExtensions):
+                return "/".join(names[:i])
+
+        return ""
+
+    def shardFolder(self, key):
+        """
+        Return the folder for the given shard key.
+
+        :type key: str
+        :rtype: str
+        """
+        if key:
+            return self.root() + "/" + key
+        return self.root()
+
+    def shardPath(self, key):
+        """
+        Return the database path for the given shard key.
+
+        :type key: str
+        :rtype: str
+        """
+        name = "root"
+        if key:
+            name = hashlib.md5(key.encode("utf-8")).hexdigest()
+
+        return os.path.dirname(self.path()) + "/" + name + ".json"
+
+    def shardStore(self, key):
+        """
+        Return the store for the given shard key.
+
+        :type key: str
+        :rtype: LibraryStore
+        """
+        store = self._stores.get(key)
+
+        if store is None:
+            store = createStore(self.shardBackend(), self.shardPath(key), root=self.root())
+            self._stores[key] = store
+
+        return store
+
+    def shardKeys(self):
+        """
+        Return the keys of all the shards in the manifest.
+
+        :rtype: list[str]
+        """
+        data = studiolibrary.readJson(self.path())
+        return sorted(data.get("shards", {}).keys())
+
+    def saveShardKeys(self, keys):
+        """
+        Write the given shard keys to the manifest.
+
+        :type keys: list[str]
+        :rtype: None
+        """
+        shards = dict(
+            (key, os.path.basename(self.shardPath(key))) for key in keys
+        )
+        studiolibrary.saveJson(self.path(), {"version": 1, "shards": shards})
+
+    def _addShardKeys(self, keys):
+        """
+        Add the given shard keys to the manifest if they are missing.
+
+        :type keys: list[str]
+        :rtype: None
+        """
+        keys_ = self.shardKeys()
+
+        if not set(keys).issubset(keys_):
+            self.saveShardKeys(set(keys_) | set(keys))
+
+    def _saveShards(self, shards, keys):
+        """
+        Save the given shards and write the shards that were saved to the manifest.
+
+        The shards with data are saved before the empty shards, which are
+        removed from the manifest. When a shard cannot be saved the error
+        is raised after the manifest is written with the shards that were
+        saved, so the manifest never lists a shard that was emptied or
+        misses one that was written.
+
+        :type shards: dict[str, dict]
+        :type keys: list[str]
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        keys = set(keys)
+
+        try:
+            for key, shard in sorted(shards.items(), key=lambda item: not item[1]):
+                self.shardStore(key).save(shard)
+
+                if shard:
+                    keys.add(key)
+                else:
+                    keys.discard(key)
+        finally:
+            self.saveShardKeys(keys)
+
+    def _subShardKeys(self, paths, keys):
+        """
+        Return the given shard keys for the given paths and their children.
+
+        :type paths: list[str]
+        :type keys: list[str]
+        :rtype: list[str]
+        """
+        root = self.root() + "/"
+        folders = tuple(
+            path[len(root):] for path in paths if path.startswith(root)
+        )
+        prefixes = tuple(folder + "/" for folder in folders)
+
+        return [
+            key for key in keys
+            if key in folders or key.startswith(prefixes)
+        ]
+
+    def isShardLoaded(self, key):
+        """
+        Return True if the given shard is read with the store.
+
+        The root shard is always loaded.
+
+        :type key: str
+        :rtype: bool
+        """
+        return not key or self._loadedShards is None or key in self._loadedShards
+
+    def loadedShards(self):
+        """
+        Return the keys of the shards that are read with the store.
+
+        :rtype: list[str]
+        """
+        return [key for key in self.shardKeys() if self.isShardLoaded(key)]
+
+    def setLoadedShards(self, keys):
+        """
+        Set the shards that are read with the store.
+
+        All the shards are loaded when the keys are None.
+
+        :type keys: list[str] or None
+        :rtype: None
+        """
+        if keys is not None:
+            keys = set(keys)
+
+        self._loadedShards = keys
+
+    def split(self, data):
+        """
+        Return the given item data split by shard key.
+
+        :type data: dict
+        :rtype: dict[str, dict]
+        """
+        shards = {}
+
+        for path, itemData in data.items():
+            shards.setdefault(self.shardKey(path), {})[path] = itemData
+
+        return shards
+
+    def exists(self):
+        """
+        Return True if the manifest exists on disc.
+
+        :rtype: bool
+        """
+        return os.path.exists(self.path())
+
+    def isEmpty(self):
+        """
+        Return True if the manifest doesn't contain any shards.
+
+        :rtype: bool
+        """
+        return not self.shardKeys()
+
+    def mtime(self):
+        """
+        Return when the manifest or a loaded shard was last modified.
+
+        Changes to shards that are not loaded are ignored.
+
+        :rtype: float or None
+        """
+        mtimes = [super(ShardedLibraryStore, self).mtime()]
+
+        for key in self.loadedShards():
+            mtimes.append(self.shardStore(key).mtime())
+
+        mtimes = [mtime for mtime in mtimes if mtime is not None]
+
+        return max(mtimes) if mtimes else None
+
+    def _read(self, keys):
+        """
+        Return the item data in the given shards.
+
+        :type keys: list[str]
+        :rtype: dict
+        """
+        data = {}
+
+        for key in keys:
+            data.update(self.shardStore(key).read())
+
+        return data
+
+    def read(self):
+        """
+        Return the item data in the loaded shards.
+
+        :rtype: dict
+        """
+        return self._read(self.loadedShards())
+
+    def readAll(self):
+        """
+        Return the item data in all the shards.
+
+        :rtype: dict
+        """
+        return self._read(self.shardKeys())
+
+    def save(self, data):
+        """
+        Replace the contents of all the shards with the given data.
+
+        :type data: dict
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        shards = self.split(data)
+        keys = self.shardKeys()
+
+        for key in keys:
+            shards.setdefault(key, {})
+
+        self._saveShards(shards, keys)
+
+    def update(self, data):
+        """
+        Write the given item data to the shards of each path.
+
+        :type data: dict
+        :rtype: None
+        """
+        shards = self.split(data)
+
+        for key, shard in shards.items():
+            self.shardStore(key).update(shard)
+
+        self._addShardKeys(shards.keys())
+
+    def remove(self, paths):
+        """
+        Remove the given paths and their children from the shards.
+
+        The shards of removed library and user folders are removed.
+
+        :type paths: list[str]
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        paths = studiolibrary.normPaths(paths)
+        keys = self.shardKeys()
+
+        removedKeys = self._subShardKeys(paths, keys)
+
+        if removedKeys:
+            self._saveShards(dict.fromkeys(removedKeys, {}), keys)
+
+        for key, paths_ in self.split(dict.fromkeys(paths)).items():
+            if key in removedKeys or key not in keys:
+                continue
+
+            # The children of removed folders are stored in the same shard
+            folders = tuple(path + "/" for path in paths_)
+            paths_ = list(paths_)
+            paths_.extend(p for p in self.shardStore(key).read() if p.startswith(folders))
+
+            self.shardStore(key).remove(paths_)
+
+    def renamePaths(self, renames, data=None):
+        """
+        Rename the given paths and all of their children across the shards.
+
+        Every shard that contains a renamed path, or is moved by the
+        rename, is read and saved again.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :rtype: None
+        """
+        renames = [(studiolibrary.normPath(src), studiolibrary.normPath(dst))
+                   for src, dst in renames]
+
+        keys = self.shardKeys()
+        root = self.root() + "/"
+
+        affected = set(self.shardKey(path) for path in (data or {}))
+
+        for src, dst in renames:
+            affected.add(self.shardKey(src))
+            affected.add(self.shardKey(dst))
+
+            # The shards below the src folder are moved to the dst folder
+            for key in self._subShardKeys([src], keys):
+                affected.add(key)
+                if dst.startswith(root):
+                    affected.add(dst[len(root):] + key[len(src) - len(root):])
+
+        data_ = self._read(affected.intersection(keys))
+
+        studiolibrary.renamePathsInData(data_, renames)
+
+        for path, itemData in (data or {}).items():
+            data_.setdefault(path, {})
+            data_[path].update(itemData)
+
+        shards = self.split(data_)
+
+        # The affected shards that are left empty are removed
+        for key in affected.intersection(keys):
+            shards.setdefault(key, {})
+
+        self._saveShards(shards, keys)
+
+
+class IndexedLibraryStore(LibraryStore):
+    """
+    A backend that reads a prebuilt index with a local overlay on top.
+
+    The index is written to the library by a headless job and is read
+    with a memory map. The changes made by each session are written to
+    a local overlay, which is replayed over the index when reading.
+    Removed paths are kept in the overlay with the removed key set.
+
+    Each index build gets a new overlay and snapshot, since the build
+    already contains the changes in the previous overlay.
+    """
+    Name = "indexed"
+    PathConfigKey = "indexedDatabasePath"
+
+    # The item data key set for paths that have been removed in the overlay
+    RemovedKey = "_removed"
+
+    def __init__(self, *args, **kwargs):
+        super(IndexedLibraryStore, self).__init__(*args, **kwargs)
+        self._buildKey = None
+        self._buildId = 0
+        self._overlay = None
+
+    def indexFile(self):
+        """
+        Return the prebuilt index file.
+
+        :rtype: studiolibrary.IndexFile
+        """
+        return studiolibrary.IndexFile(self.path())
+
+    def buildId(self):
+        """
+        Return the build id of the index, or 0 if there isn't an index.
+
+        The index header is only read again when the index has changed.
+
+        :rtype: int
+        """
+        try:
+            stat = os.stat(self.path())
+            key = (stat.st_mtime, stat.st_ino, stat.st_size)
+        except OSError:
+            key = None
+
+        if key != self._buildKey:
+            self._buildKey = key
+            self._overlay = None
+            self._buildId = 0
+
+            if key:
+                with self.indexFile() as index:
+                    self._buildId = index.buildId()
+
+        return self._buildId
+
+    def overlayFolder(self):
+        """
+        Return the local folder for the overlays of this library.
+
+        :rtype: str
+        """
+        formatString = studiolibrary.config().get('indexOverlayPath')
+        path = studiolibrary.formatPath(formatString, path=self.root())
+        name = hashlib.md5(self.root().encode("utf-8")).hexdigest()
+
+        return studiolibrary.normPath(path) + "/" + name
+
+    def overlayPath(self):
+        """
+        Return the local overlay path for the current index build.
+
+        :rtype: str
+        """
+        return "{0}/{1}.json".format(self.overlayFolder(), self.buildId())
+
+    def snapshotPath(self):
+        """
+        Return the local directory snapshot path for the current index build.
+
+        :rtype: str
+        """
+        return "{0}/{1}.snapshot.json".format(self.overlayFolder(), self.buildId())
+
+    def overlay(self):
+        """
+        Return the local store for the changes made since the index build.
+
+        The overlays of older builds are removed.
+
+        :rtype: JournalLibraryStore
+        """
+        buildId = self.buildId()
+
+        if self._overlay is None:
+            self._overlay = JournalLibraryStore(self.overlayPath(), root=self.root())
+
+            folder = self.overlayFolder()
+            prefix = str(buildId) + "."
+
+            for name in os.listdir(folder) if os.path.isdir(folder) else []:
+                if not name.startswith(prefix):
+                    JournalLibraryStore._remove(os.path.join(folder, name))
+
+        return self._overlay
+
+    def snapshotEntries(self):
+        """
+        Return the directory snapshot entries that were saved with the index.
+
+        :rtype: dict
+        """
+        with self.indexFile() as index:
+            return index.snapshotEntries()
+
+    def exists(self):
+        """
+        Return True if the index or the overlay exists on disc.
+
+        :rtype: bool
+        """
+        return os.path.exists(self.path()) or self.overlay().exists()
+
+    def mtime(self):
+        """
+        Return when the index or the overlay was last modified.
+
+        :rtype: float or None
+        """
+        mtimes = [
+            super(IndexedLibraryStore, self).mtime(),
+            self.overlay().mtime(),
+        ]
+
+        mtimes = [mtime for mtime in mtimes if mtime is not None]
+
+        return max(mtimes) if mtimes else None
+
+    def read(self):
+        """
+        Return the item data in the index with the overlay replayed.
+
+        :rtype: dict
+        """
+        overlay = self.overlay().read()
+
+        with self.indexFile() as index:
+            data = index.read()
+
+        for path, itemData in overlay.items():
+            if itemData.pop(self.RemovedKey, False):
+                data.pop(path, None)
+            else:
+                data.setdefault(path, {})
+                data[path].update(itemData)
+
+        return data
+
+    def _update(self, data, removed=()):
+        """
+        Write the given item data and removed paths to the overlay.
+
+        :type data: dict
+        :type removed: list[str]
+        :rtype: None
+        """
+        data = dict(
+            (path, dict(itemData, **{self.RemovedKey: False}))
+            for path, itemData in data.items()
+        )
+
+        # Clear any changes to the removed paths before marking them
+        if removed:
+            self.overlay().remove(removed)
+
+        for path in removed:
+            data[path] = {self.RemovedKey: True}
+
+        if data:
+            self.overlay().update(data)
+
+    def save(self, data):
+        """
+        Save the difference between the given data and the index to the overlay.
+
+        The overlay is not changed when it is locked by another session.
+
+        :type data: dict
+        :raises: StoreLockedError
+        :rtype: None
+        """
+        with self.indexFile() as index:
+            data_ = index.read()
+
+        overlay = {}
+
+        for path in data_:
+            if path not in data:
+                overlay[path] = {self.RemovedKey: True}
+
+        for path, itemData in data.items():
+            if data_.get(path) != itemData:
+                overlay[path] = dict(itemData, **{self.RemovedKey: False})
+
+        self.overlay().save(overlay)
+
+    def update(self, data):
+        """
+        Write the given item data to the overlay.
+
+        :type data: dict
+        :rtype: None
+        """
+        self._update(data)
+
+    def remove(self, paths):
+        """
+        Mark the given paths as removed in the overlay.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        self._update({}, removed=list(paths))
+
+    def renamePaths(self, renames, data=None):
+        """
+        Write the renamed paths to the overlay as removed and added paths.
+
+        :type renames: list[(str, str)]
+        :type data: dict or None
+        :rtype: None
+        """
+        renames = [(studiolibrary.normPath(src), studiolibrary.normPath(dst))
+                   for src, dst in renames]
+
+        data_ = self.read()
+        results = studiolibrary.renamePathsInData(data_, renames, trie=self.pathTrie(data_))
+
+        changed = dict((dst, data_[dst]) for src, dst in results)
+
+        for path, itemData in (data or {}).items():
+            changed.setdefault(path, dict(data_.get(path, {})))
+            changed[path].update(itemData)
+
+        removed = [src for src, dst in results if src not in changed]
+
+        self._update(changed, removed=removed)
+
+
+registerStore(JsonLibraryStore)
+registerStore(SqliteLibraryStore)
+registerStore(JournalLibraryStore)
+registerStore(ShardedLibraryStore)
+registerStore(IndexedLibraryStore)
+
+
+def testSqliteStore():
+    """
+    Test updating, removing and renaming rows in the sqlite store.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/database.db"
+        store = createStore("sqlite", path, root=root)
+
+        assert store.isEmpty()
+
+        store.update({
+            root + "/anim/walk.anim": {"name": "walk.anim", "folder": root + "/anim"},
+            root + "/anim/run.anim": {"name": "run.anim", "folder": root + "/anim"},
+        })
+        store.update({root + "/anim/walk.anim": {"Custom Order": "00001"}})
+
+        data = store.read()
+        assert data[root + "/anim/walk.anim"]["name"] == "walk.anim"
+        assert data[root + "/anim/walk.anim"]["Custom Order"] == "00001"
+
+        store.rename(root + "/anim", root + "/cycles")
+
+        data = store.read()
+        assert root + "/cycles/walk.anim" in data
+        assert data[root + "/cycles/run.anim"]["folder"] == root + "/cycles"
+
+        store.remove([root + "/cycles/run.anim"])
+        assert list(store.read().keys()) == [root + "/cycles/walk.anim"]
+
+    finally:
+        shutil.rmtree(root)
+
+
+def testJournalStore():
+    """
+    Test replaying and compacting the journal store.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/database.json"
+
+        store = createStore("journal", path, root=root)
+        store.save({root + "/anim/walk.anim": {"name": "walk.anim"}})
+
+        # A second session appending to the same journal
+        store2 = createStore("journal", path, root=root)
+
+        store.update({root + "/anim/run.anim": {"name": "run.anim", "folder": root + "/anim"}})
+        store2.update({root + "/anim/walk.anim": {"Custom Order": "00001"}})
+        store.rename(root + "/anim", root + "/cycles")
+        store2.remove([root + "/cycles/walk.anim"])
+
+        assert os.path.exists(store.journalPath())
+
+        data = store2.read()
+        assert list(data.keys()) == [root + "/cycles/run.anim"]
+        assert data[root + "/cycles/run.anim"]["folder"] == root + "/cycles"
+
+        assert store.compact()
+        assert not store.journalPaths()
+        assert studiolibrary.readJson(path) == data
+
+        # A renamed journal older than the snapshot was already folded
+        store.update({root + "/cycles/jog.anim": {"name": "jog.anim"}})
+        os.rename(store.journalPath(), store.journalPath() + ".0.0")
+        assert store.compact()
+
+        store.update({root + "/cycles/sprint.anim": {"name": "sprint.anim"}})
+        with open(store.journalPath() + ".0.0", "w") as f:
+            f.write(json.dumps({"op": "remove", "paths": [root + "/cycles/jog.anim"]}))
+        os.utime(store.journalPath() + ".0.0", (0, 0))
+
+        assert len(store.read()) == 3
+
+    finally:
+        shutil.rmtree(root)
+
+
+def testJournalStoreSave():
+    """
+    Test saving keeps the records appended by other sessions after the read.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/database.json"
+        walk = root + "/anim/walk.anim"
+        run = root + "/anim/run.anim"
+        jog = root + "/anim/jog.anim"
+
+        store = createStore("journal", path, root=root)
+        store2 = createStore("journal", path, root=root)
+
+        store.save({walk: {"name": "walk.anim"}, run: {"name": "run.anim"}})
+        store2.update({walk: {"Custom Order": "00001"}})
+
+        # A full sync reads, walks and then saves the whole database
+        data = store.read()
+        del data[run]
+
+        store2.update({jog: {"name": "jog.anim"}})
+        store2.update({walk: {"Custom Order": "00002"}})
+
+        store.save(data)
+        assert not store.journalPaths()
+
+        data = store2.read()
+        assert sorted(data.keys()) == [jog, walk]
+        assert data[walk]["Custom Order"] == "00002"
+
+        # Nothing is written while another session holds the lock
+        assert store2.lock()
+        store.LockWait = 0
+        try:
+            store.save({})
+            assert False, "Expected a StoreLockedError"
+        except StoreLockedError:
+            pass
+        store2.unlock()
+        assert sorted(store.read().keys()) == [jog, walk]
+
+        # A save is not refused after another session has compacted,
+        # and the records appended after the compact are kept
+        data = store.read()
+        data[run] = {"name": "run.anim"}
+
+        store2.update({walk: {"Custom Order": "00003"}})
+        assert store2.compact()
+        store2.update({jog: {"Custom Order": "00004"}})
+
+        store.save(data)
+
+        data = store2.read()
+        assert sorted(data.keys()) == [jog, run, walk]
+        assert data[jog]["Custom Order"] == "00004"
+        assert not store.journalPaths()
+
+    finally:
+        shutil.rmtree(root)
+
+
+def testShardedStore():
+    """
+    Test splitting, loading and renaming the shards of the sharded store.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+
+    try:
+        path = root + "/.studiolibrary/shards/manifest.json"
+        store = createStore("sharded", path, root=root)
+
+        hero = root + "/global.user/hero.lib"
+
+        assert store.shardKey(hero) == "global.user"
+        assert store.shardKey(hero + "/faces/smile.pose") == "global.user/hero.lib"
+        assert store.shardKey(root + "/anim/walk.anim") == ""
+
+        store.save({
+            root + "/anim/walk.anim": {"name": "walk.anim"},
+            root + "/global.user": {"name": "global.user"},
+            hero: {"name": "hero.lib"},
+            hero + "/faces/smile.pose": {"name": "smile.pose"},
+        })
+        store.update({root + "/user/bob.user/dog.lib/sit.pose": {"name": "sit.pose"}})
+
+        assert store.shardKeys() == ["", "global.user", "global.user/hero.lib", "user/bob.user/dog.lib"]
+        assert len(store.read()) == 5
+
+        store.setLoadedShards(["global.user"])
+        assert store.loadedShards() == ["", "global.user"]
+        assert sorted(store.read().keys()) == [root + "/anim/walk.anim", root + "/global.user", hero]
+        assert len(store.readAll()) == 5
+
+        # Changes to the shards that are not loaded don't change the mtime
+        mtime = store.mtime()
+        time.sleep(0.01)
+        store.update({hero + "/faces/sad.pose": {"name": "sad.pose"}})
+        assert store.mtime() == mtime
+
+        store.rename(hero, root + "/global.user/villain.lib")
+
+        data = store.readAll()
+        assert root + "/global.user/villain.lib/faces/sad.pose" in data
+        assert "global.user/villain.lib" in store.shardKeys()
+        assert "global.user/hero.lib" not in store.shardKeys()
+
+        store.remove([root + "/user/bob.user/dog.lib", root + "/global.user/villain.lib/faces"])
+
+        assert store.shardKeys() == ["", "global.user", "global.user/villain.lib"]
+        assert len(store.readAll()) == 3
+
+        # The manifest keeps a shard that cannot be emptied while it is locked
+        villain = root + "/global.user/villain.lib"
+        store.update({villain + "/faces/sad.pose": {"name": "sad.pose"}})
+
+        locked = createStore("journal", store.shardPath("global.user/villain.lib"), root=root)
+        assert locked.lock()
+        store.shardStore("global.user/villain.lib").LockWait = 0
+
+        try:
+            store.rename(villain, root + "/global.user/joker.lib")
+            assert False, "Expected a StoreLockedError"
+        except StoreLockedError:
+            pass
+        finally:
+            locked.unlock()
+
+        assert store.shardKeys() == ["", "global.user", "global.user/joker.lib", "global.user/villain.lib"]
+        assert root + "/global.user/joker.lib/faces/sad.pose" in store.readAll()
+        assert villain + "/faces/sad.pose" in store.readAll()
+
+        store.remove([villain])
+        assert store.shardKeys() == ["", "global.user", "global.user/joker.lib"]
+
+    finally:
+        shutil.rmtree(root)
+
+
+def testIndexedStore():
+    """
+    Test reading the prebuilt index with the local overlay on top.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    root = studiolibrary.normPath(tempfile.mkdtemp())
+    config = studiolibrary.config()
+    overlayPath = config.get("indexOverlayPath")
+
+    try:
+        config["indexOverlayPath"] = root + "/local"
+
+        path = root + "/.studiolibrary/index.bin"
+        studiolibrary.writeIndexFile(path, {
+            root + "/anim/walk.anim": {"name": "walk.anim", "folder": root + "/anim"},
+            root + "/anim/run.anim": {"name": "run.anim", "folder": root + "/anim"},
+        })
+
+        store = createStore("indexed", path, root=root)
+
+        assert len(store.read()) == 2
+        assert not store.overlay().exists()
+
+        store.update({root + "/anim/jog.anim": {"name": "jog.anim"}})
+        store.remove([root + "/anim/run.anim"])
+        store.rename(root + "/anim", root + "/cycles")
+
+        data = store.read()
+        assert sorted(data.keys()) == [root + "/cycles/jog.anim", root + "/cycles/walk.anim"]
+        assert data[root + "/cycles/walk.anim"]["folder"] == root + "/cycles"
+
+        # The index is never written by the store
+        assert len(studiolibrary.IndexFile(path).read()) == 2
+
+        # A locked overlay is not saved
+        locked = createStore("journal", store.overlayPath(), root=root)
+        assert locked.lock()
+        store.overlay().LockWait = 0
+
+        try:
+            store.save({})
+            assert False, "Expected a StoreLockedError"
+        except StoreLockedError:
+            pass
+        finally:
+            locked.unlock()
+
+        assert store.read() == data
+
+        # A new build of the index starts a new overlay
+        time.sleep(0.01)
+        studiolibrary.writeIndexFile(path, data)
+        assert store.read() == data
+        assert os.listdir(store.overlayFolder()) == []
+
+    finally:
+        config["indexOverlayPath"] = overlayPath
+        shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testSqliteStore()
+    testJournalStore()
+    testJournalStoreSave()
+    testShardedStore()
+    testIndexedStore()
+
+
+if __name__ == "__main__":
+    runTests()
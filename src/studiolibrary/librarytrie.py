@@ -0,0 +1,316 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+A trie of the paths in the library database.
+
+Each node of the trie is one directory or file name, so all the paths
+below a folder can be found without looking at any of the other paths.
+This is used for renaming and moving a folder, which only has to change
+the item data for the paths below it.
+
+Example:
+    import studiolibrary
+
+    data = {
+        "/library/anim/walk.anim": {"folder": "/library/anim"},
+        "/library/pose/fist.pose": {"folder": "/library/pose"},
+    }
+
+    studiolibrary.renamePathsInData(data, [("/library/anim", "/library/cycles")])
+
+    print(data.keys())
+    # ["/library/cycles/walk.anim", "/library/pose/fist.pose"]
+"""
+
+
+__all__ = [
+    "PathTrie",
+    "renamePathsInData",
+]
+
+# The item data fields that contain the path of the item or its folder
+PathFields = [
+    "path",
+    "folder",
+]
+
+
+class PathTrie(object):
+
+    def __init__(self, paths=None):
+        """
+        :type paths: list[str] or None
+        """
+        self._root = {}
+        self._paths = set()
+
+        for path in paths or []:
+            self.add(path)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def _node(self, path, create=False):
+        """
+        Return the node for the given path.
+
+        :type path: str
+        :type create: bool
+        :rtype: dict or None
+        """
+        node = self._root
+
+        for name in path.split("/"):
+            child = node.get(name)
+
+            if child is None:
+                if not create:
+                    return None
+                child = node[name] = {}
+
+            node = child
+
+        return node
+
+    @staticmethod
+    def _walk(node, path):
+        """
+        Yield the given path and all the paths below the given node.
+
+        :type node: dict
+        :type path: str
+        :rtype: collections.Iterable[str]
+        """
+        stack = [(node, path)]
+
+        while stack:
+            node, path = stack.pop()
+            yield path
+
+            for name, child in node.items():
+                stack.append((child, path + "/" + name))
+
+    def add(self, path):
+        """
+        Add the given path to the trie.
+
+        :type path: str
+        :rtype: None
+        """
+        self._node(path, create=True)
+        self._paths.add(path)
+
+    def setPaths(self, paths):
+        """
+        Set the paths in the trie to the given paths.
+
+        Only the paths that are not in both are added or removed, so
+        keeping the trie for the same data is cheap.
+
+        :type paths: dict or set
+        :rtype: None
+        """
+        for path in [p for p in self._paths if p not in paths]:
+            self.remove(path)
+
+        for path in paths:
+            if path not in self._paths:
+                self.add(path)
+
+    def remove(self, path):
+        """
+        Remove the given path from the trie.
+
+        The nodes for the parent folders are removed when they are empty.
+
+        :type path: str
+        :rtype: None
+        """
+        if path not in self._paths:
+            return
+
+        self._paths.discard(path)
+
+        names = path.split("/")
+        nodes = [self._root]
+
+        for name in names:
+            nodes.append(nodes[-1][name])
+
+        # Remove the empty nodes from the bottom up
+        for i in range(len(names), 0, -1):
+            parent = "/".join(names[:i])
+            if nodes[i] or parent in self._paths:
+                break
+            del nodes[i - 1][names[i - 1]]
+
+    def paths(self, path):
+        """
+        Return the given path and all the paths below it in the trie.
+
+        :type path: str
+        :rtype: list[str]
+        """
+        node = self._node(path)
+
+        if node is None:
+            return []
+
+        return [p for p in self._walk(node, path) if p in self._paths]
+
+    def rename(self, src, dst):
+        """
+        Move the src path and all the paths below it to the dst path.
+
+        Return the old and new path for each path that has been moved.
+
+        :type src: str
+        :type dst: str
+        :rtype: list[(str, str)]
+        """
+        if src == dst:
+            return []
+
+        if dst.startswith(src + "/"):
+            raise ValueError("Cannot move a path inside itself")
+
+        paths = self.paths(src)
+
+        for path in paths:
+            self.remove(path)
+
+        renames = [(path, dst + path[len(src):]) for path in paths]
+
+        for path, newPath in renames:
+            self.add(newPath)
+
+        return renames
+
+
+def renamePath(path, src, dst):
+    """
+    Return the given path with the src path replaced by the dst path.
+
+    Only paths that match the src path or are below it are changed.
+
+    :type path: str
+    :type src: str
+    :type dst: str
+    :rtype: str
+    """
+    if path == src or path.startswith(src + "/"):
+        return dst + path[len(src):]
+    return path
+
+
+def renamePathsInData(data, renames, trie=None):
+    """
+    Rename the given paths and all the paths below them in the given data.
+
+    Only the item data for the renamed paths is changed. The "path" and
+    "folder" fields are renamed, but any other field is left as it is.
+
+    The trie must contain the same paths as the data and is updated
+    with the renames. A new trie is created when it isn't given.
+
+    :type data: dict
+    :type renames: list[(str, str)]
+    :type trie: PathTrie or None
+    :rtype: list[(str, str)]
+    """
+    if trie is None:
+        trie = PathTrie(data.keys())
+
+    results = []
+
+    for src, dst in renames:
+        for path, newPath in trie.rename(src, dst):
+            itemData = data.pop(path)
+
+            for key in PathFields:
+                value = itemData.get(key)
+                if isinstance(value, basestring):
+                    itemData[key] = renamePath(value, src, dst)
+
+            data[newPath] = itemData
+            results.append((path, newPath))
+
+    return results
+
+
+def testPathTrie():
+    """
+    Test renaming a folder only changes the paths below it.
+
+    :rtype: None
+    """
+    data = {
+        "/lib/anim": {"path": "/lib/anim", "folder": "/lib"},
+        "/lib/anim/walk.anim": {"path": "/lib/anim/walk.anim", "folder": "/lib/anim"},
+        "/lib/anim/run/sprint.anim": {"folder": "/lib/anim/run", "comment": "/lib/anim"},
+        "/lib/animals/cat.pose": {"folder": "/lib/animals"},
+        "/lib/pose.pose": {"folder": "/lib"},
+    }
+
+    trie = PathTrie(data.keys())
+
+    assert len(trie) == 5
+    assert sorted(trie.paths("/lib/anim")) == [
+        "/lib/anim",
+        "/lib/anim/run/sprint.anim",
+        "/lib/anim/walk.anim",
+    ]
+    assert trie.paths("/lib/missing") == []
+
+    renames = renamePathsInData(data, [("/lib/anim", "/lib/trash/anim")], trie=trie)
+
+    assert len(renames) == 3
+    assert sorted(data.keys()) == [
+        "/lib/animals/cat.pose",
+        "/lib/pose.pose",
+        "/lib/trash/anim",
+        "/lib/trash/anim/run/sprint.anim",
+        "/lib/trash/anim/walk.anim",
+    ]
+    assert data["/lib/trash/anim"] == {"path": "/lib/trash/anim", "folder": "/lib"}
+    assert data["/lib/trash/anim/run/sprint.anim"]["folder"] == "/lib/trash/anim/run"
+    assert data["/lib/trash/anim/run/sprint.anim"]["comment"] == "/lib/anim"
+    assert data["/lib/animals/cat.pose"]["folder"] == "/lib/animals"
+
+    assert "/lib/anim/walk.anim" not in trie
+    assert "/lib/trash/anim/walk.anim" in trie
+    assert trie.paths("/lib/anim") == []
+
+    # Renaming a single item
+    renamePathsInData(data, [("/lib/pose.pose", "/lib/fist.pose")], trie=trie)
+    assert "/lib/fist.pose" in data and "/lib/pose.pose" not in data
+
+    # Only the changed paths are added and removed
+    paths = dict(data, **{"/lib/new.pose": {}})
+    del paths["/lib/fist.pose"]
+
+    trie.setPaths(paths)
+    assert len(trie) == len(paths)
+    assert "/lib/new.pose" in trie and "/lib/fist.pose" not in trie
+    assert sorted(trie.paths("/lib/trash")) == sorted(p for p in paths if p.startswith("/lib/trash"))
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testPathTrie()
+
+
+if __name__ == "__main__":
+    runTests()
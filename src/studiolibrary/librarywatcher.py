@@ -0,0 +1,630 @@
+# Copyright 2019 by Kurt Rathjen. All Rights Reserved.
+#
+# This library is free software: you can redistribute it and/or modify it 
+# under the terms of the GNU Lesser General Public License as published by 
+# the Free Software Foundation, either version 3 of the License, or 
+# (at your option) any later version. This library is distributed in the 
+# hope that it will be useful, but WITHOUT ANY WARRANTY; without even the 
+# implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. 
+# See the GNU Lesser General Public License for more details.
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library. If not, see <http://www.gnu.org/licenses/>.
+"""
+Watch the library folders and sync the changes as they happen.
+
+The folders in the directory snapshot, such as the root and the nested
+".lib" and ".user" folders, are watched using inotify on Linux. The
+folders are polled on other platforms or when inotify isn't available.
+
+Events are collected until no new event has arrived for "watchDelay"
+milliseconds. Only the folders with events are then listed again, so a
+burst of changes, like saving an item, results in a single small sync.
+
+Example:
+    import studiolibrary
+
+    library = studiolibrary.Library("/library")
+    library.setWatchEnabled(True)
+
+    library.watcher().changed.connect(lambda paths: print(paths["added"]))
+"""
+import os
+import sys
+import time
+import errno
+import ctypes
+import ctypes.util
+import struct
+import logging
+
+from studioqt import QtCore
+
+import studiolibrary
+
+
+__all__ = [
+    "LibraryWatcher",
+    "InotifyBackend",
+    "PollingBackend",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class InotifyBackend(object):
+
+    Name = "inotify"
+
+    # The values from <sys/inotify.h>
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    Mask = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | \
+        IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+    # The wd, mask, cookie and name length of each event
+    EventHeader = struct.Struct("iIII")
+
+    _libc = None
+
+    @classmethod
+    def libc(cls):
+        """
+        Return the C library if it has the inotify functions.
+
+        :rtype: ctypes.CDLL or None
+        """
+        if cls._libc is None:
+            cls._libc = False
+
+            if sys.platform.startswith("linux"):
+                try:
+                    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                    if hasattr(libc, "inotify_init1"):
+                        cls._libc = libc
+                except OSError:
+                    logger.debug("Cannot load the C library", exc_info=True)
+
+        return cls._libc or None
+
+    @classmethod
+    def isSupported(cls):
+        """
+        Return True if inotify can be used on this platform.
+
+        :rtype: bool
+        """
+        return cls.libc() is not None
+
+    def __init__(self):
+        libc = self.libc()
+
+        if not libc:
+            raise OSError("inotify is not supported on this platform")
+
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self._watches = {}
+        self._paths = {}
+
+    def close(self):
+        """
+        Remove all the watches and close the inotify instance.
+
+        :rtype: None
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+        self._watches = {}
+        self._paths = {}
+
+    def watchesFiles(self):
+        """
+        Return True if changes to the files in a folder are reported.
+
+        :rtype: bool
+        """
+        return True
+
+    def paths(self):
+        """
+        Return the folders being watched.
+
+        :rtype: set[str]
+        """
+        return set(self._paths)
+
+    def addWatch(self, path):
+        """
+        Watch the given folder and return True if it's being watched.
+
+        :type path: str
+        :rtype: bool
+        """
+        if path in self._paths:
+            return True
+
+        if isinstance(path, unicode):
+            path_ = path.encode(sys.getfilesystemencoding() or "utf-8")
+        else:
+            path_ = path
+
+        wd = self.libc().inotify_add_watch(self._fd, path_, self.Mask)
+
+        if wd < 0:
+            error = ctypes.get_errno()
+
+            if error == errno.ENOSPC:
+                logger.warning(
+                    'Cannot watch "%s". Increase fs.inotify.max_user_watches '
+                    'to watch more folders.', path
+                )
+            else:
+                logger.debug('Cannot watch "%s": %s', path, os.strerror(error))
+
+            return False
+
+        self._watches[wd] = path
+        self._paths[path] = wd
+
+        return True
+
+    def removeWatch(self, path):
+        """
+        Stop watching the given folder.
+
+        :type path: str
+        :rtype: None
+        """
+        wd = self._paths.pop(path, None)
+
+        if wd is not None:
+            self._watches.pop(wd, None)
+            self.libc().inotify_rm_watch(self._fd, wd)
+
+    def readEvents(self):
+        """
+        Return the folders that have changed since the last call.
+
+        The second value is True when the kernel has dropped events, so
+        the changed folders are not known.
+
+        :rtype: (set[str], bool)
+        """
+        folders = set()
+        overflow = False
+
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+
+            if not data:
+                break
+
+            offset = 0
+
+            while offset < len(data):
+                wd, mask, cookie, length = self.EventHeader.unpack_from(data, offset)
+                offset += self.EventHeader.size
+
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+
+                path = self._watches.get(wd)
+
+                if path is None:
+                    continue
+
+                if mask & self.IN_IGNORED:
+                    # The folder has been removed or unmounted
+                    del self._watches[wd]
+                    self._paths.pop(path, None)
+
+                # Skip the files that are never items, like the database
+                # folder in the root. Only the name is checked since the
+                # folder is already being watched.
+                elif name and studiolibrary.utils.isIgnoredPath("/" + name):
+                    continue
+
+                folders.add(path)
+
+        return folders, overflow
+
+
+class PollingBackend(object):
+
+    Name = "polling"
+
+    def __init__(self):
+        self._stats = {}
+
+    def close(self):
+        """
+        Remove all the watches.
+
+        :rtype: None
+        """
+        self._stats = {}
+
+    def watchesFiles(self):
+        """
+        Return True if changes to the files in a folder are reported.
+
+        Changing a file doesn't change the mtime of the folder.
+
+        :rtype: bool
+        """
+        return False
+
+    def paths(self):
+        """
+        Return the folders being watched.
+
+        :rtype: set[str]
+        """
+        return set(self._stats)
+
+    @staticmethod
+    def _stat(path):
+        """
+        Return the mtime and inode of the given folder.
+
+        :type path: str
+        :rtype: (float, int) or None
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        return stat.st_mtime, stat.st_ino
+
+    def addWatch(self, path):
+        """
+        Watch the given folder and return True if it's being watched.
+
+        :type path: str
+        :rtype: bool
+        """
+        if path not in self._stats:
+            self._stats[path] = self._stat(path)
+
+        return True
+
+    def removeWatch(self, path):
+        """
+        Stop watching the given folder.
+
+        :type path: str
+        :rtype: None
+        """
+        self._stats.pop(path, None)
+
+    def readEvents(self):
+        """
+        Return the folders that have changed since the last call.
+
+        :rtype: (set[str], bool)
+        """
+        folders = set()
+
+        for path, stat in self._stats.items():
+            stat_ = self._stat(path)
+
+            if stat_ != stat:
+                self._stats[path] = stat_
+                folders.add(path)
+
+        return folders, False
+
+
+class LibraryWatcher(QtCore.QObject):
+
+    # The interval in milliseconds for reading the inotify events
+    ReadInterval = 250
+
+    # The maximum time in seconds to wait for a burst of events to end
+    MaxDelay = 5.0
+
+    changed = QtCore.Signal(object)
+
+    def __init__(self, library, parent=None):
+        """
+        :type library: studiolibrary.Library
+        :type parent: QtCore.QObject or None
+        """
+        QtCore.QObject.__init__(self, parent)
+
+        self._library = library
+        self._backend = None
+        self._folders = set()
+        self._overflow = False
+        self._firstEventTime = None
+        self._lastEventTime = None
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self.poll)
+
+    def library(self):
+        """
+        Return the library being watched.
+
+        :rtype: studiolibrary.Library
+        """
+        return self._library
+
+    def backend(self):
+        """
+        Return the backend used for watching the folders.
+
+        :rtype: InotifyBackend or PollingBackend or None
+        """
+        return self._backend
+
+    def delay(self):
+        """
+        Return the time in seconds to wait for more events before syncing.
+
+        :rtype: float
+        """
+        return studiolibrary.config().get('watchDelay', 500) / 1000.0
+
+    def createBackend(self):
+        """
+        Return the backend set by the "watchBackend" config option.
+
+        The polling backend is used when inotify isn't supported.
+
+        :rtype: InotifyBackend or PollingBackend
+        """
+        name = studiolibrary.config().get('watchBackend', 'auto')
+
+        if name in ("auto", "inotify"):
+            if InotifyBackend.isSupported():
+                try:
+                    return InotifyBackend()
+                except OSError:
+                    logger.exception("Cannot create the inotify watcher")
+
+            if name == "inotify":
+                logger.warning("Cannot use inotify. Polling the folders instead.")
+
+        return PollingBackend()
+
+    def isActive(self):
+        """
+        Return True if the folders are being watched.
+
+        :rtype: bool
+        """
+        return self._backend is not None
+
+    def isDatabaseWatched(self):
+        """
+        Return True if changes to the database files are reported.
+
+        The library doesn't have to check the database on disc when the
+        database folder is being watched.
+
+        :rtype: bool
+        """
+        if not self._backend or not self._backend.watchesFiles():
+            return False
+
+        return self._library.databaseFolder() in self._backend.paths()
+
+    def start(self):
+        """
+        Start watching the folders in the library snapshot.
+
+        :rtype: None
+        """
+        if self._backend:
+            return
+
+        self._backend = self.createBackend()
+        self.updateWatches()
+
+        if self._backend.Name == InotifyBackend.Name:
+            interval = self.ReadInterval
+        else:
+            interval = studiolibrary.config().get('watchPollInterval', 2000)
+
+        self._timer.start(interval)
+
+        logger.debug("Watching the library using %s", self._backend.Name)
+
+    def stop(self):
+        """
+        Stop watching the library and discard any pending events.
+
+        :rtype: None
+        """
+        self._timer.stop()
+
+        if self._backend:
+            self._backend.close()
+            self._backend = None
+
+        self._folders = set()
+        self._overflow = False
+        self._firstEventTime = None
+
+    def updateWatches(self, *args):
+        """
+        Watch the folders in the snapshot and the database folder.
+
+        :rtype: None
+        """
+        if not self._backend:
+            return
+
+        library = self._library
+
+        folders = set(library.snapshot().folders(library.path()))
+        folders.add(library.databaseFolder())
+
+        watched = self._backend.paths()
+
+        for path in watched - folders:
+            self._backend.removeWatch(path)
+
+        for path in folders - watched:
+            self._backend.addWatch(path)
+
+    def poll(self):
+        """
+        Read the events and sync the folders once the events have stopped.
+
+        :rtype: None
+        """
+        if not self._backend:
+            return
+
+        try:
+            folders, overflow = self._backend.readEvents()
+        except (IOError, OSError):
+            logger.exception("Cannot read the watcher events")
+            return
+
+        now = time.time()
+
+        if folders or overflow:
+            if self._firstEventTime is None:
+                self._firstEventTime = now
+
+            self._folders.update(folders)
+            self._overflow = self._overflow or overflow
+            self._lastEventTime = now
+
+        if self._firstEventTime is None:
+            return
+
+        if now - self._lastEventTime >= self.delay() or \
+                now - self._firstEventTime >= self.MaxDelay:
+            self.flush()
+
+    def flush(self):
+        """
+        Sync the folders with pending events.
+
+        :rtype: dict or None
+        """
+        folders = self._folders
+        overflow = self._overflow
+
+        self._folders = set()
+        self._overflow = False
+        self._firstEventTime = None
+
+        library = self._library
+
+        databaseFolder = library.databaseFolder()
+
+        if databaseFolder in folders:
+            folders.discard(databaseFolder)
+            library.checkDirty()
+
+        if overflow:
+            # The changed folders are not known, so only list the
+            # folders that have a different mtime
+            logger.debug("Too many watcher events. Syncing the library.")
+            folders = [library.path()]
+
+        if not folders:
+            return None
+
+        t = time.time()
+
+        paths = library.syncFolders(folders)
+
+        logger.debug("Synced %s folders in %.3fs", len(folders), time.time() - t)
+
+        if any(paths.values()):
+            self.changed.emit(paths)
+
+        return paths
+
+
+def testWatcherBackends():
+    """
+    Test the folder changes are reported by each backend.
+
+    :rtype: None
+    """
+    import shutil
+    import tempfile
+
+    backends = [PollingBackend]
+
+    if InotifyBackend.isSupported():
+        backends.append(InotifyBackend)
+
+    for cls in backends:
+        root = tempfile.mkdtemp()
+
+        try:
+            path = os.path.join(root, "hero.lib")
+            os.mkdir(path)
+
+            backend = cls()
+            assert backend.addWatch(root)
+            assert backend.addWatch(path)
+            assert backend.paths() == set([root, path])
+
+            assert backend.readEvents() == (set(), False)
+
+            os.mkdir(os.path.join(path, "smile.pose"))
+
+            # The polling backend checks the mtime of the folders
+            os.utime(path, (time.time() + 10, time.time() + 10))
+
+            folders, overflow = backend.readEvents()
+            assert path in folders, (cls, folders)
+            assert not overflow
+
+            backend.removeWatch(path)
+            assert backend.paths() == set([root])
+
+            shutil.rmtree(path)
+            folders, overflow = backend.readEvents()
+            assert root in folders, (cls, folders)
+
+            backend.close()
+
+        finally:
+            shutil.rmtree(root)
+
+
+def runTests():
+    """Run all the tests for this file."""
+    testWatcherBackends()
+
+
+if __name__ == "__main__":
+    runTests()
@@ -254,6 +254,9 @@ class LibraryWindow(QtWidgets.QWidget):
 
         library = self.LIBRARY_CLASS(libraryWindow=self)
         library.dataChanged.connect(self.refresh)
+        library.itemsAdded.connect(self._itemsChanged)
+        library.itemsRemoved.connect(self._itemsChanged)
+        library.itemsChanged.connect(self._itemsChanged)
         library.searchTimeFinished.connect(self._searchFinished)
 
         self._sidebarFrame = SidebarFrame(self)
@@ -514,6 +517,9 @@ class LibraryWindow(QtWidgets.QWidget):
         """
         self._library = library
 
+        if self.isDebug():
+            library.setSearchProfileEnabled(True)
+
     def statusWidget(self):
         """
         Return the status widget.
@@ -572,6 +578,9 @@ class LibraryWindow(QtWidgets.QWidget):
         library = self.library()
         library.setPath(path)
 
+        if studiolibrary.config().get("watchLibrary"):
+            library.setWatchEnabled(True)
+
         if not os.path.exists(library.databasePath()):
             library.sync()
 
@@ -692,13 +701,25 @@ class LibraryWindow(QtWidgets.QWidget):
         @studioqt.showWaitCursor
         def _sync():
             elapsedTime = time.time()
-            self.library().sync(percentCallback=self.setProgressBarValue)
+
+            try:
+                counts = self.library().sync(percentCallback=self.setProgressBarValue)
+            except studiolibrary.StoreLockedError as error:
+                # Another session is writing the database, so the sync
+                # can be tried again later
+                self.showErrorMessage(str(error))
+                progressBar.close()
+                return
 
             elapsedTime = time.time() - elapsedTime
 
             msg = "Synced items in {0:.3f} seconds."
             msg = msg.format(elapsedTime)
 
+            if counts:
+                msg += " ({added} added, {removed} removed, {changed} changed)"
+                msg = msg.format(**counts)
+
             self.statusWidget().showInfoMessage(msg)
             self.setProgressBarValue("Done")
 
@@ -734,6 +755,18 @@ class LibraryWindow(QtWidgets.QWidget):
         if self.isRefreshEnabled():
             self.update()
 
+    def _itemsChanged(self, paths):
+        """
+        Triggered when paths have been added, removed or changed.
+
+        The sidebar applies the changes itself, so only the search is
+        run again, which only matches the changed paths.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        self.library().scheduleSearch()
+
     def update(self):
         """Update the library widget and the data. """
         self.refreshSidebar()
@@ -859,6 +892,9 @@ class LibraryWindow(QtWidgets.QWidget):
         :type paths: list[str]
         :rtype: None
         """
+        # Make sure the items are up to date before selecting them
+        self.library().flushSearch()
+
         selection = self.selectedItems()
 
         self.clearPreviewWidget()
@@ -1504,19 +1540,20 @@ class LibraryWindow(QtWidgets.QWidget):
         try:
             self.library().blockSignals(True)
 
-            for item in items:
+            if copy:
+                for item in items:
 
-                path = dst + "/" + item.name()
+                    path = dst + "/" + item.name()
 
-                if force:
-                    path = studiolibrary.generateUniquePath(path)
+                    if force:
+                        path = studiolibrary.generateUniquePath(path)
 
-                if copy:
                     item.copy(path)
-                else:
-                    item.rename(path)
 
-                movedItems.append(item)
+                    movedItems.append(item)
+            else:
+                # Move all the items with a single write to the database
+                movedItems = self.library().moveItems(items, dst, force=force)
 
         except Exception as error:
             self.showExceptionDialog("Move Error", error)
@@ -2382,6 +2419,7 @@ class LibraryWindow(QtWidgets.QWidget):
         """Show how long the current refresh took."""
         itemCount = len(self.library().results())
         elapsedTime = self.library().searchTime()
+        queueTime = self.library().searchQueueTime()
 
         plural = ""
         if itemCount > 1:
@@ -2389,6 +2427,14 @@ class LibraryWindow(QtWidgets.QWidget):
 
         msg = "Found {0} item{1} in {2:.3f} seconds."
         msg = msg.format(itemCount, plural, elapsedTime)
+
+        if queueTime:
+            msg += " ({0:.3f} seconds queued)".format(queueTime)
+
+        profile = self.library().lastSearchProfile()
+        if self.isDebug() and profile:
+            msg += " [{0}]".format(profile.summary())
+
         self.statusWidget().showInfoMessage(msg)
 
         logger.debug(msg)
@@ -2759,6 +2805,12 @@ class LibraryWindow(QtWidgets.QWidget):
         else:
             logger_.setLevel(logging.INFO)
 
+        library = self.library()
+        if library:
+            library.setSearchProfileEnabled(
+                value or studiolibrary.config().get("searchProfile", False)
+            )
+
         self.debugModeChanged.emit(value)
         self.globalSignal.debugModeChanged.emit(self, value)
 
@@ -11,6 +11,7 @@
 # License along with this library. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 import sys
 import json
 import uuid
@@ -25,13 +26,18 @@ import threading
 import collections
 
 from datetime import datetime
+from multiprocessing.pool import ThreadPool
 
 # Use the built-in version of scandir/walk if possible,
 # otherwise use the scandir module version
 try:
-    from scandir import walk
+    from scandir import walk, scandir
 except ImportError:
     from os import walk
+    try:
+        from os import scandir
+    except ImportError:
+        scandir = None
 
 import studiolibrary
 
@@ -66,6 +72,7 @@ __all__ = [
     "movePath",
     "movePaths",
     "listPaths",
+    "listEntries",
     "splitPath",
     "localPath",
     "removePath",
@@ -85,6 +92,7 @@ __all__ = [
     "registerItem",
     "registeredItems",
     "itemFromPath",
+    "itemClassFromPath",
     "itemsFromPaths",
     "itemsFromUrls",
     "findItems",
@@ -98,6 +106,12 @@ logger = logging.getLogger(__name__)
 
 _itemClasses = collections.OrderedDict()
 
+# The item classes by extension, which is created when first used
+_itemDispatchTable = None
+
+# The ignore paths and the function compiled from them
+_ignoreMatcher = (None, None)
+
 
 SHOW_IN_FOLDER_CMD = None
 
@@ -167,8 +181,9 @@ def registerItem(cls):
     :type cls: studiolibrary.LibraryItem
     :rtype: None
     """
-    global _itemClasses
+    global _itemClasses, _itemDispatchTable
     _itemClasses[cls.__name__] = cls
+    _itemDispatchTable = None
 
 
 def registeredItems():
@@ -189,8 +204,86 @@ def clearRegisteredItems():
 
     :rtype: None
     """
-    global _itemClasses
+    global _itemClasses, _itemDispatchTable
     _itemClasses = collections.OrderedDict()
+    _itemDispatchTable = None
+
+
+def itemDispatchTable():
+    """
+    Return the registered item classes by extension.
+
+    The table contains the class for each extension, the classes that
+    match any directory and the classes with a custom match method. The
+    position of each class in the registered order is kept, so the first
+    registered class that matches a path is still used.
+
+    :rtype: (dict, list, list)
+    """
+    global _itemDispatchTable
+
+    if _itemDispatchTable is None:
+        extensions = {}
+        directories = []
+        custom = []
+
+        baseMatch = studiolibrary.LibraryItem.match.__func__
+
+        for position, cls in enumerate(registeredItems()):
+            if cls.match.__func__ is not baseMatch:
+                custom.append((position, cls))
+                continue
+
+            if cls.MatchDirectories:
+                directories.append((position, cls))
+
+            for extension in cls.Extensions:
+                # Extensions with more than one dot cannot be looked up
+                if extension.count(".") != 1 or not extension.startswith("."):
+                    custom.append((position, cls))
+                    break
+
+                extensions.setdefault(extension, (position, cls))
+
+        _itemDispatchTable = (extensions, directories, custom)
+
+    return _itemDispatchTable
+
+
+def itemClassFromPath(path, isDir=None):
+    """
+    Return the registered item class for the given path.
+
+    The class is found by the extension of the path. The disc is only
+    checked if the path doesn't have a registered extension and isDir
+    is None. Classes with a custom match method are always tested.
+
+    :type path: str
+    :type isDir: bool or None
+    :rtype: type[studiolibrary.LibraryItem] or None
+    """
+    extensions, directories, custom = itemDispatchTable()
+
+    name = path[path.rfind("/") + 1:]
+    result = extensions.get(os.path.splitext(name)[1])
+
+    if result is None and directories:
+        if isDir is None:
+            isDir = os.path.isdir(path)
+        if isDir:
+            result = directories[0]
+
+    for position, cls in custom:
+        if result is not None and position > result[0]:
+            break
+
+        if cls.match(path):
+            return cls
+
+    if result is not None:
+        return result[1]
+
+    return None
 
 
 def tempPath(*args):
@@ -225,22 +318,26 @@ def createTempPath(name, clean=True, makedirs=True):
     return path
 
 
-def itemFromPath(path, **kwargs):
+def itemFromPath(path, isDir=None, **kwargs):
     """
     Return a new item instance for the given path.
 
+    The disc isn't checked when isDir is given, such as when the path
+    was found by listing its directory.
+
     :type path: str
+    :type isDir: bool or None
     :rtype: studiolibrary.LibraryItem or None
     """
     path = normPath(path)
 
-    for ignore in studiolibrary.config().get('ignorePaths', []):
-        if ignore in path:
-            return None
+    if isIgnoredPath(path):
+        return None
 
-    for cls in registeredItems():
-        if cls.match(path):
-            return cls(path, **kwargs)
+    cls = itemClassFromPath(path, isDir=isDir)
+
+    if cls:
+        return cls(path, **kwargs)
 
 
 def itemsFromPaths(paths, **kwargs):
@@ -296,49 +393,143 @@ def pathsFromUrls(urls):
         yield path
 
 
-def findItems(path, depth=3, **kwargs):
+def isIgnoredPath(path):
+    """
+    Return True if the given path matches any of the ignore paths.
+
+    The ignore paths are compiled into a single pattern when they change.
+
+    :type path: str
+    :rtype: bool
+    """
+    global _ignoreMatcher
+
+    ignorePaths = tuple(studiolibrary.config().get('ignorePaths', []))
+
+    if _ignoreMatcher[0] != ignorePaths:
+        match = None
+
+        if ignorePaths:
+            pattern = "|".join(re.escape(ignore) for ignore in ignorePaths)
+            match = re.compile(pattern).search
+
+        _ignoreMatcher = (ignorePaths, match)
+
+    match = _ignoreMatcher[1]
+
+    return match is not None and match(path) is not None
+
+
+def findItems(path, depth=3, threads=None, entries=None, **kwargs):
     """
     Find and create items by walking the given path.
 
+    The directories are walked one level at a time and the sibling
+    directories of each level are listed concurrently using a bounded
+    thread pool. The items are yielded as soon as their directory has
+    been listed.
+
+    When a dict is given for entries, it is filled with the snapshot
+    entry of every listed item directory, keyed by the directory path,
+    so the walk can be saved as a snapshot without walking again.
+
     :type path: str
     :type depth: int
+    :type threads: int or None
+    :type entries: dict or None
 
     :rtype: collections.Iterable[studiolibrary.LibraryItem]
     """
     path = normPath(path)
 
-    maxDepth = depth
-    startDepth = path.count(os.path.sep)
+    if threads is None:
+        threads = studiolibrary.config().get('walkThreads', 1)
+
+    def _listDir(dirname):
+        stat = None
 
-    for root, dirs, files in walk(path, followlinks=True):
+        # Stat the directory before listing it, so a change made while
+        # listing invalidates the snapshot entry
+        if entries is not None and dirname in snapshotDirs:
+            try:
+                stat = os.stat(dirname)
+            except OSError:
+                pass
 
-        files.extend(dirs)
+        return stat, listEntries(dirname)
 
-        for filename in files:
-            remove = False
+    pool = None
+    if threads > 1:
+        pool = ThreadPool(threads)
 
-            # Normalise the path for consistent matching
-            path = os.path.join(root, filename)
-            item = itemFromPath(path, **kwargs)
+    level = 0
+    dirs = [path]
+    snapshotDirs = set(dirs)
 
-            if item:
-                # Yield the item that matches/supports the current path
-                yield item
+    try:
+        while dirs:
 
-                # Stop walking the dir if the item doesn't support nested items
-                if not item.EnableNestedItems:
-                    remove = True
+            if pool:
+                results = pool.imap(_listDir, dirs)
+            else:
+                results = (_listDir(dirname) for dirname in dirs)
 
-            if remove and filename in dirs:
-                dirs.remove(filename)
+            walkDirs = []
 
-        if depth == 1:
-            break
+            for root, (stat, names) in zip(dirs, results):
+
+                entry = None
+                if stat is not None:
+                    entry = {
+                        "mtime": stat.st_mtime,
+                        "ino": stat.st_ino,
+                        "dirs": [],
+                        "items": {},
+                    }
+                    entries[root] = entry
+
+                for name, isDir in names:
+
+                    path = root + "/" + name
+                    item = itemFromPath(path, isDir=isDir, **kwargs)
+
+                    if item:
+                        # Yield the item that matches/supports the current path
+                        yield item
+
+                        # Only walk the dir if the item supports nested items
+                        if isDir and item.EnableNestedItems:
+                            walkDirs.append(path)
+
+                        if entry is not None:
+                            try:
+                                entry["items"][name] = os.path.getmtime(path)
+                            except OSError:
+                                continue
+
+                            if isDir and item.EnableNestedItems:
+                                entry["dirs"].append(name)
+                                snapshotDirs.add(path)
 
-        # Stop walking the directory if the maximum depth has been reached
-        currentDepth = root.count(os.path.sep)
-        if (currentDepth - startDepth) >= maxDepth:
-            del dirs[:]
+                    elif isDir and not isIgnoredPath(path):
+                        walkDirs.append(path)
+
+                if entry is not None:
+                    entry["dirs"].sort()
+
+            if depth == 1:
+                break
+
+            # Stop walking the directory if the maximum depth has been reached
+            if level >= depth:
+                break
+
+            level += 1
+            dirs = walkDirs
+
+    finally:
+        if pool:
+            pool.terminate()
 
 
 def findItemsInFolders(folders, depth=3, **kwargs):
@@ -513,6 +704,8 @@ def copyPath(src, dst):
     else:
         shutil.copytree(src, dst)
 
+    studiolibrary.statCache().invalidate(dst)
+
     return dst
 
 
@@ -535,6 +728,10 @@ def movePath(src, dst):
         dst = generateUniquePath(dst)
 
     shutil.move(src, dst)
+
+    studiolibrary.statCache().invalidate(src)
+    studiolibrary.statCache().invalidate(dst)
+
     return dst
 
 
@@ -561,6 +758,9 @@ def movePaths(srcPaths, dst):
         logger.info(u'Moving Content: {0} => {1}'.format(src, dst_))
         shutil.move(src, dst_)
 
+        studiolibrary.statCache().invalidate(src)
+        studiolibrary.statCache().invalidate(dst_)
+
 
 def removePath(path):
     """
@@ -574,6 +774,8 @@ def removePath(path):
     elif os.path.isdir(path):
         shutil.rmtree(path)
 
+    studiolibrary.statCache().invalidate(path)
+
 
 def renamePath(src, dst, extension=None, force=False):
     """
@@ -619,6 +821,9 @@ def renamePath(src, dst, extension=None, force=False):
 
     os.rename(src, dst)
 
+    studiolibrary.statCache().invalidate(src)
+    studiolibrary.statCache().invalidate(dst)
+
     logger.debug(u'Renamed: {0} => {1}'.format(src, dst))
 
     return dst
@@ -703,6 +908,9 @@ def write(path, data):
 
         raise
 
+    finally:
+        studiolibrary.statCache().invalidate(path)
+
 
 def update(data, other):
     """
@@ -1019,6 +1227,37 @@ def listPaths(path):
         yield value
 
 
+def listEntries(path):
+    """
+    Return the names in the given directory and if they are directories.
+
+    This uses the type information returned by scandir when possible to
+    avoid an extra stat call per entry. Symbolic links to directories are
+    treated as directories. Errors are ignored in the same way as os.walk.
+
+    :type path: str
+    :rtype: list[(str, bool)]
+    """
+    entries = []
+
+    try:
+        if scandir:
+            for entry in scandir(path):
+                try:
+                    isDir = entry.is_dir()
+                except OSError:
+                    isDir = False
+                entries.append((entry.name, isDir))
+        else:
+            for name in os.listdir(path):
+                entries.append((name, os.path.isdir(os.path.join(path, name))))
+
+    except OSError:
+        pass
+
+    return entries
+
+
 def generateUniquePath(path, attempts=1000):
     """
     Generate a unique path on disc.
@@ -1430,12 +1669,165 @@ def testRelativePaths():
     assert result == path, msg
 
 
+def testItemClassFromPath():
+    """
+    Test finding the item class by extension without checking the disc.
+
+    :rtype: None
+    """
+    global _itemClasses, _itemDispatchTable
+
+    itemClasses = _itemClasses
+
+    class PoseItem(studiolibrary.LibraryItem):
+        Extensions = [".pose"]
+
+    class FolderItem(studiolibrary.LibraryItem):
+        RegisterOrder = 100
+        MatchDirectories = True
+
+    class CustomItem(studiolibrary.LibraryItem):
+        RegisterOrder = 5
+
+        @classmethod
+        def match(cls, path):
+            return path.endswith("custom.pose")
+
+    try:
+        clearRegisteredItems()
+
+        for cls in [FolderItem, PoseItem, CustomItem]:
+            registerItem(cls)
+
+        assert itemClassFromPath("/library/smile.pose") is PoseItem
+        assert itemClassFromPath("/library/custom.pose") is CustomItem
+        assert itemClassFromPath("/library/faces", isDir=True) is FolderItem
+        assert itemClassFromPath("/library/faces.txt", isDir=False) is None
+
+    finally:
+        _itemClasses = itemClasses
+        _itemDispatchTable = None
+
+    config = studiolibrary.config()
+    ignorePaths = config.get("ignorePaths")
+
+    try:
+        config["ignorePaths"] = ["/.", "/tmp/"]
+        assert isIgnoredPath("/library/.studiolibrary")
+        assert isIgnoredPath("/library/tmp/smile.pose")
+        assert not isIgnoredPath("/library/smile.pose")
+
+        config["ignorePaths"] = []
+        assert not isIgnoredPath("/library/.studiolibrary")
+
+    finally:
+        config["ignorePaths"] = ignorePaths
+
+
+def testFindItems():
+    """
+    Test the items found by findItems are the same as walking with os.walk.
+
+    :rtype: None
+    """
+    global _itemClasses, _itemDispatchTable
+
+    import tempfile
+
+    itemClasses = _itemClasses
+    config = studiolibrary.config()
+    ignorePaths = config.get("ignorePaths")
+
+    class PoseItem(studiolibrary.LibraryItem):
+        Extensions = [".pose"]
+
+    class FolderItem(studiolibrary.LibraryItem):
+        RegisterOrder = 100
+        MatchDirectories = True
+        EnableNestedItems = True
+
+    def _findItems(path, depth):
+        # The walk used before the items were found with scandir
+        startDepth = path.count("/")
+
+        for root, dirs, files in os.walk(path, followlinks=True):
+            for name in files + dirs:
+                item = itemFromPath(os.path.join(root, name))
+
+                if item:
+                    yield item
+
+                    if not item.EnableNestedItems and name in dirs:
+                        dirs.remove(name)
+
+            if depth == 1:
+                break
+
+            if root.count("/") - startDepth >= depth:
+                del dirs[:]
+
+    root = normPath(tempfile.mkdtemp())
+
+    try:
+        clearRegisteredItems()
+
+        for cls in [FolderItem, PoseItem]:
+            registerItem(cls)
+
+        config["ignorePaths"] = ["/."]
+
+        for path in [
+            "anim/walk.pose/nested.pose",
+            "anim/cycles/run.pose",
+            "anim/cycles/fast/sprint.pose",
+            "faces/a/b/c/d/smile.pose",
+            ".studiolibrary/hidden.pose",
+        ]:
+            os.makedirs(root + "/" + path)
+
+        open(root + "/anim/jump.pose", "w").close()
+        open(root + "/anim/notes.txt", "w").close()
+
+        for depth in [1, 2, 3, 4, 6]:
+            expected = sorted(item.path() for item in _findItems(root, depth))
+
+            for threads in [1, 3]:
+                entries = {}
+                items = findItems(root, depth=depth, threads=threads, entries=entries)
+                paths = sorted(item.path() for item in items)
+
+                assert paths == expected, (depth, threads)
+                assert root + "/anim/walk.pose/nested.pose" not in paths
+                assert root + "/.studiolibrary/hidden.pose" not in paths
+
+                # Only the walked item directories have a snapshot entry
+                assert root + "/anim" in entries or depth == 1
+                assert root + "/.studiolibrary" not in entries
+
+        assert sorted(name for name, isDir in listEntries(root + "/anim")) == [
+            "cycles",
+            "jump.pose",
+            "notes.txt",
+            "walk.pose",
+        ]
+        assert dict(listEntries(root + "/anim"))["cycles"] is True
+        assert listEntries(root + "/missing") == []
+
+    finally:
+        _itemClasses = itemClasses
+        _itemDispatchTable = None
+        config["ignorePaths"] = ignorePaths
+        shutil.rmtree(root)
+
+
 def runTests():
     """Run all the tests for this file."""
     testUpdate()
     testSplitPath()
     testFormatPath()
     testRelativePaths()
+    testItemClassFromPath()
+    testFindItems()
 
 
 if __name__ == "__main__":
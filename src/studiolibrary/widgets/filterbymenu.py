@@ -153,12 +153,12 @@ class FilterByMenu(QtWidgets.QMenu):
         else:
             self._settings[name] = checked
 
-        self.dataset().search()
+        self.dataset().scheduleSearch()
 
     def _showAllClicked(self):
         """Triggered when the user clicks the show all action."""
         self.setAllEnabled(True)
-        self.dataset().search()
+        self.dataset().scheduleSearch()
 
     def setAllEnabled(self, enabled):
         """
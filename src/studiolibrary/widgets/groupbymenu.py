@@ -54,7 +54,7 @@ class GroupByMenu(QtWidgets.QMenu):
             value = None
 
         self.dataset().setGroupBy(value)
-        self.dataset().search()
+        self.dataset().scheduleSearch()
 
     def show(self, point=None):
         """
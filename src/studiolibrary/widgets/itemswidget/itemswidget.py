@@ -73,6 +73,7 @@ class ItemsWidget(QtWidgets.QWidget):
         self._isItemTextVisible = True
 
         self._dataset = None
+        self._groupItems = {}
         self._treeWidget = TreeWidget(self)
 
         self._support_drag = self.DEFAULT_SUPPORT_DRAG
@@ -160,13 +161,18 @@ class ItemsWidget(QtWidgets.QWidget):
         results = self.dataset().groupedResults()
 
         items = []
+        groupItems = {}
 
         for group in results:
             if group != "None":
-                groupItem = self.createGroupItem(group)
+                # Reuse the group items so only the changed rows are updated
+                groupItem = self._groupItems.get(group) or self.createGroupItem(group)
+                groupItems[group] = groupItem
                 items.append(groupItem)
             items.extend(results[group])
 
+        self._groupItems = groupItems
+
         self.treeWidget().setItems(items)
 
         if selectedItems:
@@ -382,6 +388,7 @@ class ItemsWidget(QtWidgets.QWidget):
 
         Calls self.treeWidget().clear()
         """
+        self._groupItems = {}
         self.treeWidget().clear()
 
     def refresh(self):
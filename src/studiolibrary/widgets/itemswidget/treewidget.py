@@ -109,10 +109,54 @@ class TreeWidget(ItemViewMixin, QtWidgets.QTreeWidget):
 
     def setItems(self, items):
         selectedItems = self.selectedItems()
-        self.takeTopLevelItems()
-        self.addTopLevelItems(items)
+
+        if not self.updateTopLevelItems(items):
+            self.takeTopLevelItems()
+            self.addTopLevelItems(items)
+
         self.setItemsSelected(selectedItems, True)
 
+    def updateTopLevelItems(self, items):
+        """
+        Remove and insert only the rows that have changed.
+
+        Return False when the order of the existing rows has changed or
+        when most of the rows have changed, so all the rows have to be
+        set again.
+
+        :type items: list[QtWidgets.QTreeWidgetItem]
+        :rtype: bool
+        """
+        count = self.topLevelItemCount()
+
+        if not count:
+            return False
+
+        current = [self.topLevelItem(i) for i in range(count)]
+
+        ids = set(id(item) for item in items)
+        currentIds = set(id(item) for item in current)
+
+        kept = [id(item) for item in current if id(item) in ids]
+
+        if kept != [id(item) for item in items if id(item) in currentIds]:
+            return False
+
+        changes = (count - len(kept)) + (len(items) - len(kept))
+
+        if changes > max(100, len(items) // 4):
+            return False
+
+        for i in reversed(range(count)):
+            if id(current[i]) not in ids:
+                self.takeTopLevelItem(i)
+
+        for i, item in enumerate(items):
+            if id(item) not in currentIds:
+                self.insertTopLevelItem(i, item)
+
+        return True
+
     def setItemsSelected(self, items, value, scrollTo=True):
         """
         Select the given items.
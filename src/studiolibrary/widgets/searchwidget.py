@@ -35,6 +35,7 @@ class SearchWidget(QtWidgets.QLineEdit):
 
         self._dataset = None
         self._spaceOperator = "and"
+        self._fuzzy = studiolibrary.config().get("fuzzySearch", False)
         self._iconPadding = 6
         self._iconButton = QtWidgets.QPushButton(self)
         self._iconButton.clicked.connect(self._iconClicked)
@@ -106,7 +107,7 @@ class SearchWidget(QtWidgets.QLineEdit):
         """Run the search query on the data set."""
         if self.dataset():
             self.dataset().addQuery(self.query())
-            self.dataset().search()
+            self.dataset().scheduleSearch()
         else:
             logger.info("No dataset found the the search widget.")
 
@@ -121,18 +122,14 @@ class SearchWidget(QtWidgets.QLineEdit):
         """
         text = str(self.text())
 
-        filters = []
-        for filter_ in text.split(' '):
-            if filter_.split():
-                filters.append(('*', 'contains', filter_))
-
         uniqueName = 'searchwidget' + str(id(self))
 
-        return {
-            'name': uniqueName,
-            'operator': self.spaceOperator(),
-            'filters': filters
-        }
+        return studiolibrary.parseQuery(
+            text,
+            operator=self.spaceOperator(),
+            name=uniqueName,
+            fuzzy=self.isFuzzy(),
+        )
 
     def updateClearButton(self):
         """
@@ -172,6 +169,23 @@ class SearchWidget(QtWidgets.QLineEdit):
         self._spaceOperator = operator
         self.search()
 
+    def isFuzzy(self):
+        """
+        Return True if the words search the item names for similar names.
+
+        :rtype: bool
+        """
+        return self._fuzzy
+
+    def setFuzzy(self, value):
+        """
+        Set if the words should search the item names for similar names.
+
+        :type value: bool
+        """
+        self._fuzzy = value
+        self.search()
+
     def createSpaceOperatorMenu(self, parent=None):
         """
         Return the menu for changing the space operator.
@@ -225,6 +239,16 @@ class SearchWidget(QtWidgets.QLineEdit):
         subMenu = self.createSpaceOperatorMenu(menu)
         menu.addMenu(subMenu)
 
+        action = QtWidgets.QAction(menu)
+        action.setText("Fuzzy Search")
+        action.setCheckable(True)
+        action.setChecked(self.isFuzzy())
+
+        callback = partial(self.setFuzzy, not self.isFuzzy())
+        action.triggered.connect(callback)
+
+        menu.addAction(action)
+
         point = QtGui.QCursor.pos()
         action = menu.exec_(point)
 
@@ -275,6 +299,7 @@ class SearchWidget(QtWidgets.QLineEdit):
         settings = {
             "text": self.text(),
             "spaceOperator": self.spaceOperator(),
+            "fuzzy": self.isFuzzy(),
         }
         return settings
 
@@ -292,6 +317,10 @@ class SearchWidget(QtWidgets.QLineEdit):
         if spaceOperator:
             self.setSpaceOperator(spaceOperator)
 
+        fuzzy = settings.get("fuzzy")
+        if fuzzy is not None:
+            self.setFuzzy(fuzzy)
+
     def resizeEvent(self, event):
         """
         Reimplemented so the icon maintains the same height as the widget.
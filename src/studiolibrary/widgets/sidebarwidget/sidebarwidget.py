@@ -10,6 +10,7 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library. If not, see <http://www.gnu.org/licenses/>.
 import time
+import bisect
 import logging
 import collections
 import re
@@ -138,6 +139,7 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         super(SidebarWidget, self).__init__(*args)
 
         self._dpi = 1
+        self._root = ""
         self._items = []
         self._index = {}
         self._locked = False
@@ -233,6 +235,99 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         """
         return self._options.get('separator', DEFAULT_SEPARATOR)
 
+    def _itemsAdded(self, paths):
+        """
+        Triggered when paths have been added to the data set.
+
+        Only the items for the added folders are created.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        if not self._index or not self.dataset():
+            return
+
+        data = self._filteredData(paths=paths)
+
+        if not data:
+            return
+
+        separator = self.separator()
+
+        self.blockSignals(True)
+
+        try:
+            # Add the parent folders before the folders below them
+            for path in sorted(data.keys(), key=len):
+                if path not in self._index:
+                    dirname, name = path.rsplit(separator, 1)
+                    parent = self._index.get(dirname)
+
+                    if parent is None:
+                        # The folder is not below any of the items
+                        self.setData(root=self._root)
+                        return
+
+                    self.insertItem(parent, path, name)
+
+                self.setPathSettings(path, data[path])
+        finally:
+            self.blockSignals(False)
+
+    def _itemsRemoved(self, paths):
+        """
+        Triggered when paths have been removed from the data set.
+
+        :type paths: list[str]
+        :rtype: None
+        """
+        for path in paths:
+            item = self._index.get(path)
+
+            if item is None:
+                continue
+
+            prefix = path + self.separator()
+
+            for path_ in list(self._index.keys()):
+                if path_ == path or path_.startswith(prefix):
+                    del self._index[path_]
+
+            parent = item.parent()
+
+            if parent:
+                parent.removeChild(item)
+            else:
+                self.takeTopLevelItem(self.indexOfTopLevelItem(item))
+
+    def insertItem(self, parent, path, text):
+        """
+        Create a new item and insert it in order below the given parent.
+
+        :type parent: SidebarWidgetItem
+        :type path: str
+        :type text: str
+        :rtype: SidebarWidgetItem
+        """
+        separator = self.separator()
+
+        # The items are sorted by name in the same way as createItems
+        names = [
+            parent.child(i).path().rsplit(separator, 1)[-1].lower()
+            for i in range(parent.childCount())
+        ]
+
+        item = SidebarWidgetItem()
+        item.setText(0, unicode(text))
+        item.setPath(path)
+
+        parent.insertChild(bisect.bisect(names, text.lower()), item)
+        self._index[path] = item
+
+        item.update()
+
+        return item
+
     def _dataChanged(self):
         """Triggered when the data set has changed."""
         pass
@@ -259,6 +354,8 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         self._dataset = dataset
         self._options['rootText'] = dataset.projectName()
         self._dataset.dataChanged.connect(self._dataChanged)
+        self._dataset.itemsAdded.connect(self._itemsAdded)
+        self._dataset.itemsRemoved.connect(self._itemsRemoved)
         self.updateFilters(False)
         self._dataChanged()
 
@@ -280,7 +377,7 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         """Run the dataset search."""
         if self.dataset():
             self.dataset().addQuery(self.query())
-            self.dataset().search()
+            self.dataset().scheduleSearch()
         else:
             logger.info('No dataset found for the sidebar widget.')
 
@@ -626,8 +723,10 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         self.setData(*args, **kwargs)
 
 
-    def _filteredData(self):
+    def _filteredData(self, paths=None):
         """Get the list of folders to display using the filters
+
+        Only the given paths are matched when paths is not None.
         
         Returns:
             [type] -- [description]
@@ -664,7 +763,7 @@ class SidebarWidget(QtWidgets.QTreeWidget):
             queries += [self._displayUsersQuery]
 
 
-        items = self.dataset().findItems(queries)
+        items = self.dataset().findItems(queries, paths=paths)
 
         for item in items:
             path = item.path()
@@ -745,6 +844,8 @@ class SidebarWidget(QtWidgets.QTreeWidget):
         if not root:
             root = findRoot(data.keys(), self.separator())
 
+        self._root = root
+
         self.addPaths(data, root=root, split=split)
 
         self.setSettings(settings)
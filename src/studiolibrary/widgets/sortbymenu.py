@@ -53,7 +53,7 @@ class SortByMenu(QtWidgets.QMenu):
 
         value = sortName + ":" + sortOrder
         self.dataset().setSortBy([value])
-        self.dataset().search()
+        self.dataset().scheduleSearch()
 
     def show(self, point=None):
         """
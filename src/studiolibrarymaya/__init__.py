@@ -35,6 +35,9 @@ _resource = None
 _settings = None
 _mayaCloseScriptJob = None
 
+# Share the file times read by the items with the transfer objects
+mutils.setStatCache(studiolibrary.statCache())
+
 
 def readSettings():
     """
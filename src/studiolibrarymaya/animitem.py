@@ -45,6 +45,11 @@ class AnimItem(baseitem.BaseItem):
     MenuName = "Animation"
     MenuIconPath = iconPath
     TypeIconPath = iconPath
+
+    SummaryMetadataKeys = baseitem.BaseItem.SummaryMetadataKeys + [
+        ("startFrame", "startFrame", None),
+        ("endFrame", "endFrame", None),
+    ]
     
 
     def __init__(self, *args, **kwargs):
@@ -62,11 +67,21 @@ class AnimItem(baseitem.BaseItem):
 
     def startFrame(self):
         """Return the start frame for the animation."""
-        return self.transferObject().startFrame()
+        startFrame = self.itemData().get("startFrame")
+
+        if startFrame is None:
+            startFrame = self.transferObject().startFrame()
+
+        return startFrame
 
     def endFrame(self):
         """Return the end frame for the animation."""
-        return self.transferObject().endFrame()
+        endFrame = self.itemData().get("endFrame")
+
+        if endFrame is None:
+            endFrame = self.transferObject().endFrame()
+
+        return endFrame
 
     def imageSequencePath(self):
         """
@@ -57,6 +57,12 @@ class BaseItem(studiolibrary.LibraryItem):
     CreateWidgetClass = basesavewidget.BaseSaveWidget
     PreviewWidgetClass = baseloadwidget.BaseLoadWidget
 
+    # The metadata key, item data field and default copied when syncing
+    SummaryMetadataKeys = [
+        ("user", "owner", ""),
+        ("description", "description", ""),
+    ]
+
     @classmethod
     def showCreateWidget(cls, libraryWindow):
         """
@@ -363,13 +369,74 @@ class BaseItem(studiolibrary.LibraryItem):
         """
         return studiolibrarymaya.settings()
 
+    def summaryMtime(self):
+        """
+        Return the mtime of the transfer file that the summary is read from.
+
+        :raises: OSError
+        :rtype: float
+        """
+        return studiolibrary.statCache().mtime(self.transferPath())
+
+    def createSummaryData(self):
+        """
+        Return the owner, description, object count and namespaces.
+
+        Only the metadata at the top of the transfer file is read, so the
+        info panel and columns don't have to parse all the objects.
+
+        :rtype: dict
+        """
+        try:
+            summary = self.transferClass().summaryFromPath(self.transferPath())
+        except Exception:
+            logger.exception(u'Cannot read the summary for "%s"', self.path())
+            return {}
+
+        metadata = summary["metadata"]
+
+        data = {
+            "objectCount": summary["objectCount"],
+            "namespaces": summary["namespaces"],
+        }
+
+        for key, field, default in self.SummaryMetadataKeys:
+            data[field] = metadata.get(key, default)
+
+        return data
+
+    def createTextData(self):
+        """
+        Return the comment, owner and object names to be searched.
+
+        :rtype: dict
+        """
+        try:
+            transferObject = self.transferClass().fromPath(self.transferPath())
+        except Exception:
+            logger.exception(u'Cannot read the text for "%s"', self.path())
+            return {}
+
+        metadata = transferObject.metadata()
+
+        return {
+            "comment": metadata.get("description", ""),
+            "owner": metadata.get("user", ""),
+            "objects": " ".join(sorted(transferObject.objects() or [])),
+        }
+
     def owner(self):
         """
         Return the user who created this item.
 
         :rtype: str or None
         """
-        return self.transferObject().metadata().get("user", "")
+        owner = self.itemData().get("owner")
+
+        if owner is None:
+            owner = self.transferObject().metadata().get("user", "")
+
+        return owner
 
     def description(self):
         """
@@ -377,7 +444,12 @@ class BaseItem(studiolibrary.LibraryItem):
 
         :rtype: str
         """
-        return self.transferObject().metadata().get("description", "")
+        description = self.itemData().get("description")
+
+        if description is None:
+            description = self.transferObject().metadata().get("description", "")
+
+        return description
 
     def objectCount(self):
         """
@@ -385,7 +457,12 @@ class BaseItem(studiolibrary.LibraryItem):
 
         :rtype: int
         """
-        return self.transferObject().count()
+        count = self.itemData().get("objectCount")
+
+        if count is None:
+            count = self.transferObject().count()
+
+        return count
 
     def contextMenu(self, menu, items=None):
         """